@@ -0,0 +1,326 @@
+import os
+import json
+import time
+import sqlite3
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+import requests
+from email.message import EmailMessage
+from data_quality import POLLUTANT_LIMITS
+from datastore import CACHE_DIR
+
+# Rule file (JSON list of rules); DEFAULT_RULES are used when it is not set
+RULES_PATH = os.environ.get('AQ_ALERT_RULES', '')
+
+# Comma-separated sinks, e.g. "file:alerts.jsonl,webhook:http://127.0.0.1:8765/alerts,email:outbox"
+SINKS_SPEC = os.environ.get('AQ_ALERT_SINKS', 'file:alerts.jsonl')
+
+# Seconds before an alert that is still active is sent again
+DEFAULT_COOLDOWN = 6 * 3600
+
+# When each (rule, city) alert was last sent, shared by restarts and worker processes
+ALERT_DB = os.environ.get('AQ_ALERT_DB', os.path.join(CACHE_DIR, 'alerts.sqlite'))
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alert_state (
+    rule TEXT NOT NULL,
+    city TEXT NOT NULL,
+    last_sent REAL NOT NULL,
+    PRIMARY KEY (rule, city)
+)
+"""
+
+SEVERITY_ORDER = {'critical': 0, 'warning': 1, 'info': 2}
+
+# Columns of AlertEngine.active
+ACTIVE_COLUMNS = ['rule', 'severity', 'city', 'column', 'value', 'threshold']
+
+# Rule types:
+#   threshold       latest value of `column` >= `above`
+#   rate_of_change  latest value minus the value `periods` earlier >= `change`
+#   forecast        trend forecast `horizon` periods ahead (fit on the last `window` periods) >= `above`
+DEFAULT_RULES = [
+    {'id': 'aqi_severe', 'type': 'threshold', 'column': 'AQI', 'above': 401, 'severity': 'critical'},
+    {'id': 'aqi_very_poor', 'type': 'threshold', 'column': 'AQI', 'above': 301, 'severity': 'warning'},
+    {'id': 'pm25_limit', 'type': 'threshold', 'column': 'PM2.5', 'above': POLLUTANT_LIMITS['PM2.5'], 'severity': 'info'},
+    {'id': 'pm10_limit', 'type': 'threshold', 'column': 'PM10', 'above': POLLUTANT_LIMITS['PM10'], 'severity': 'info'},
+    {'id': 'aqi_spike', 'type': 'rate_of_change', 'column': 'AQI', 'change': 100, 'periods': 1, 'severity': 'warning'},
+    {'id': 'aqi_forecast_poor', 'type': 'forecast', 'column': 'AQI', 'above': 201, 'horizon': 1, 'window': 7,
+     'severity': 'warning'}
+]
+
+MESSAGES = {
+    'threshold': "{city}: {column} {value:.0f} is at or above {threshold:g}",
+    'rate_of_change': "{city}: {column} rose by {value:.0f} in {periods} period(s) (limit {threshold:g})",
+    'forecast': "{city}: {column} forecast {value:.0f} in {horizon} period(s), at or above {threshold:g}"
+}
+
+RULE_FIELDS = {
+    'threshold': ['column', 'above'],
+    'rate_of_change': ['column', 'change'],
+    'forecast': ['column', 'above']
+}
+
+
+def load_rules(path=RULES_PATH):
+    """Rules from a JSON file, or the defaults; raises ValueError for malformed rules"""
+    if not path:
+        return [dict(rule) for rule in DEFAULT_RULES]
+    with open(path, encoding='utf-8') as fp:
+        rules = json.load(fp)
+    for rule in rules:
+        required = RULE_FIELDS.get(rule.get('type'))
+        if required is None:
+            raise ValueError(f"Unknown alert rule type in {rule}")
+        missing = [field for field in ['id'] + required if field not in rule]
+        if missing:
+            raise ValueError(f"Alert rule {rule.get('id', rule)} is missing {', '.join(missing)}")
+    return rules
+
+
+def recent_window(matrix, periods):
+    """Last rows of a date x city matrix with each city's readings carried forward inside the window"""
+    return matrix.iloc[-periods:].ffill()
+
+
+def trend_forecast(window, horizon):
+    """
+    Per-city least-squares line through the window, extrapolated `horizon` periods
+    past the last row. Vectorized over cities; gaps are skipped.
+    """
+    values = window.to_numpy(dtype='float64')
+    x = np.arange(len(values), dtype='float64')[:, None]
+    observed = ~np.isnan(values)
+    n = observed.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = np.where(observed, x, 0).sum(axis=0) / n
+        y_mean = np.where(observed, values, 0).sum(axis=0) / n
+        dx = np.where(observed, x - x_mean, 0)
+        dy = np.where(observed, values - y_mean, 0)
+        slope = (dx * dy).sum(axis=0) / (dx * dx).sum(axis=0)
+        forecast = y_mean + slope * (len(values) - 1 + horizon - x_mean)
+    forecast[n < 2] = np.nan
+    return pd.Series(forecast, index=window.columns)
+
+
+def evaluate_rule(rule, matrices, forecasts=None):
+    """Series of the rule's value per city, and the boolean Series of cities that trigger it"""
+    matrix = matrices.get(rule['column'])
+    if matrix is None or not len(matrix):
+        empty = pd.Series(dtype='float64')
+        return empty, empty.astype(bool)
+
+    kind = rule['type']
+    if kind == 'threshold':
+        value = recent_window(matrix, rule.get('window', 3)).iloc[-1]
+        threshold = rule['above']
+    elif kind == 'rate_of_change':
+        periods = rule.get('periods', 1)
+        window = recent_window(matrix, periods + 1)
+        value = window.iloc[-1] - window.iloc[0]
+        threshold = rule['change']
+    else:
+        value = trend_forecast(matrix.iloc[-rule.get('window', 7):], rule.get('horizon', 1))
+        if forecasts is not None and rule['column'] in forecasts:
+            # Model forecasts where available, the linear trend for the other cities
+            value = forecasts[rule['column']].reindex(matrix.columns).fillna(value)
+        threshold = rule['above']
+    return value, value >= threshold
+
+
+class AlertState:
+    """
+    Last send time per (rule, city) in SQLite (WAL mode). Claims run in one
+    write transaction, so two processes evaluating the same data never both
+    send an alert, and a restarted server honours the cooldowns of the last one.
+    """
+
+    def __init__(self, path=ALERT_DB):
+        self.path = path
+        self._local = threading.local()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect().execute(STATE_SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # Autocommit mode: claim() opens its own BEGIN IMMEDIATE transaction
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def claim(self, hits, now, cooldowns):
+        """
+        Due flags per rule for {rule: Index of active cities}: never sent, or sent at
+        least the rule's cooldown ago. Due pairs are marked sent at `now`; pairs that
+        are no longer active are forgotten, so they alert again as soon as they recur.
+        """
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            due = {}
+            for rule_id, cities in hits.items():
+                stored = dict(db.execute("SELECT city, last_sent FROM alert_state WHERE rule = ?", (rule_id,)).fetchall())
+                last_sent = pd.Series([stored.get(city, np.nan) for city in cities], index=cities, dtype='float64')
+                rule_due = last_sent.isna() | (now - last_sent >= cooldowns[rule_id])
+                last_sent[rule_due] = now
+                db.execute("DELETE FROM alert_state WHERE rule = ?", (rule_id,))
+                db.executemany("INSERT INTO alert_state VALUES (?, ?, ?)",
+                               [(rule_id, str(city), sent) for city, sent in last_sent.items()])
+                due[rule_id] = rule_due.to_numpy(dtype=bool)
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return due
+
+
+class AlertEngine:
+    """
+    Evaluates every rule over all cities at once and delivers new alerts to the sinks.
+
+    An alert is sent when a (rule, city) pair becomes active, and again only after
+    its cooldown while it stays active. Evaluation is skipped when the data
+    version has not changed, so reruns and extra sessions never resend alerts;
+    send times are kept in an AlertState, so restarts and other processes do
+    not either. active is a frame of every currently triggered (rule, city) pair.
+    """
+
+    def __init__(self, rules=None, sinks=(), cooldown=DEFAULT_COOLDOWN, state_path=ALERT_DB):
+        self.rules = {rule['id']: rule for rule in (rules if rules is not None else load_rules())}
+        self.sinks = list(sinks)
+        self.cooldown = cooldown
+        self.version = None
+        self.active = pd.DataFrame(columns=ACTIVE_COLUMNS)
+        self.errors = []
+        self.state = AlertState(state_path)
+        self._lock = threading.Lock()
+
+    def evaluate(self, matrices, version=None, forecasts=None, now=None):
+        """
+        Evaluate the rules on date x city matrices (e.g. ComparisonCube.matrices).
+        Returns the alerts sent by this call as dicts with a message.
+        """
+        with self._lock:
+            if version is not None and version == self.version:
+                return []
+            now = time.time() if now is None else now
+            hits = {}
+            for rule_id, rule in self.rules.items():
+                value, triggered = evaluate_rule(rule, matrices, forecasts)
+                hits[rule_id] = value[triggered]
+            cooldowns = {rule_id: rule.get('cooldown', self.cooldown) for rule_id, rule in self.rules.items()}
+            due_flags = self.state.claim({rule_id: value.index for rule_id, value in hits.items()}, now, cooldowns)
+
+            frames = []
+            for rule_id, rule in self.rules.items():
+                rule_hits, due = hits[rule_id], due_flags[rule_id]
+                frames.append(pd.DataFrame({
+                    'rule': rule_id,
+                    'severity': rule.get('severity', 'warning'),
+                    'city': rule_hits.index,
+                    'column': rule['column'],
+                    'value': rule_hits.to_numpy(dtype='float64'),
+                    'threshold': rule.get('above', rule.get('change')),
+                    'due': due
+                }, columns=ACTIVE_COLUMNS + ['due']))
+
+            active = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ACTIVE_COLUMNS + ['due'])
+            rank = active['severity'].map(SEVERITY_ORDER).fillna(len(SEVERITY_ORDER))
+            active = active.assign(_rank=rank).sort_values(['_rank', 'value'], ascending=[True, False])
+            stamp = datetime.datetime.fromtimestamp(now).isoformat(timespec='seconds')
+            sent = [self.describe(alert, stamp, version) for alert in active[active['due']].to_dict('records')]
+
+            self.active = active[ACTIVE_COLUMNS].reset_index(drop=True)
+            self.version = version
+            self.errors = self._deliver(sent)
+            return sent
+
+    def describe(self, alert, stamp=None, version=None):
+        """Alert record with its rule type, time, data version and message"""
+        rule = self.rules[alert['rule']]
+        record = {key: alert[key] for key in ACTIVE_COLUMNS}
+        record.update({'type': rule['type'], 'time': stamp, 'version': version})
+        record['message'] = rule.get('message', MESSAGES[rule['type']]).format(
+            periods=rule.get('periods', 1), horizon=rule.get('horizon', 1), **record
+        )
+        return record
+
+    def _deliver(self, alerts):
+        errors = []
+        if not alerts:
+            return errors
+        for sink in self.sinks:
+            try:
+                sink(alerts)
+            except Exception as e:
+                errors.append(f"{type(sink).__name__}: {e}")
+        return errors
+
+    def active_for(self, city):
+        return self.active[self.active['city'] == city]
+
+
+class FileSink:
+    """Appends alerts as JSON lines"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, alerts):
+        with open(self.path, 'a', encoding='utf-8') as fp:
+            for alert in alerts:
+                fp.write(json.dumps(alert) + "\n")
+
+
+class WebhookSink:
+    """POSTs each batch of alerts as JSON (see the /alerts endpoint of benchmarks/stub_server.py)"""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, alerts):
+        response = requests.post(self.url, json={'alerts': alerts}, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class EmailSink:
+    """
+    Writes one .eml message per batch to an outbox folder instead of sending it,
+    so a mail relay (or a person) can pick it up.
+    """
+
+    def __init__(self, outbox, recipients=('alerts@localhost',), sender='aq-dashboard@localhost'):
+        self.outbox = outbox
+        self.recipients = list(recipients)
+        self.sender = sender
+
+    def __call__(self, alerts):
+        message = EmailMessage()
+        message['Subject'] = f"Air quality alerts: {len(alerts)} new"
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content("\n".join(f"[{a['severity'].upper()}] {a['message']}" for a in alerts))
+        os.makedirs(self.outbox, exist_ok=True)
+        path = os.path.join(self.outbox, f"alerts-{time.time_ns()}.eml")
+        with open(path, 'wb') as fp:
+            fp.write(bytes(message))
+
+
+SINK_TYPES = {'file': FileSink, 'webhook': WebhookSink, 'email': EmailSink}
+
+
+def sinks_from_spec(spec=SINKS_SPEC):
+    """Build sinks from "kind:target,kind:target" (empty spec: no sinks)"""
+    sinks = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        kind, _, target = item.partition(':')
+        if kind not in SINK_TYPES:
+            raise ValueError(f"Unknown alert sink '{kind}' (expected one of {', '.join(SINK_TYPES)})")
+        sinks.append(SINK_TYPES[kind](target))
+    return sinks
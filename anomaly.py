@@ -0,0 +1,151 @@
+import os
+import numpy as np
+import pandas as pd
+from data_quality import IMPUTE_COLUMNS, city_date_order
+
+# Detection method: 'mad' (rolling robust z-scores) or 'isolation_forest' (adds a multivariate pass)
+ANOMALY_METHOD = os.environ.get('AQ_ANOMALY_METHOD', 'mad')
+
+# Trailing window (rows of the same city) the robust statistics are computed over
+ROLLING_WINDOW = 30
+MIN_PERIODS = 7
+
+# |robust z| above this is a spike. Daily pollution is heavy-tailed (festivals, crop burning),
+# so this is well above the usual 3.5 cut-off; 3.5 flags about 3% of city_day.csv
+Z_THRESHOLD = 6.0
+
+# The MAD is floored at this share of the median, so near-constant series do not flag every change
+MAD_FLOOR_FRACTION = 0.05
+
+# This many identical non-zero readings in a row is a stuck sensor
+STUCK_RUN = 7
+
+# Readings above these are physically implausible for ambient air (CO in mg/m³, the rest µg/m³ or AQI)
+PLAUSIBLE_MAX = {'PM2.5': 1000, 'PM10': 2000, 'NO2': 1000, 'SO2': 1000, 'CO': 50, 'O3': 1000, 'AQI': 2000}
+
+# Share of rows the IsolationForest pass flags
+CONTAMINATION = 0.005
+
+# Per-cell anomaly flags (bitmask, 0 = no anomaly)
+SPIKE = 1
+STUCK = 2
+ISOLATION = 4
+OUT_OF_RANGE = 8
+
+ANOMALY_LABELS = {
+    SPIKE: 'spike',
+    STUCK: 'stuck sensor',
+    ISOLATION: 'isolation forest',
+    OUT_OF_RANGE: 'out of range'
+}
+
+ANOMALY_METHODS = ['mad', 'isolation_forest']
+
+
+def _grouped_rolling_median(values, city, window, min_periods):
+    """Trailing rolling median per city of an (n, k) array sorted by (city, date)"""
+    rolled = pd.DataFrame(values).groupby(city, sort=False).rolling(window, min_periods=min_periods).median()
+    return rolled.to_numpy()
+
+
+def _shift_within(values, city):
+    """values shifted down one row inside each city (first row of a city becomes NaN)"""
+    shifted = np.empty_like(values)
+    shifted[0] = np.nan
+    shifted[1:] = values[:-1]
+    shifted[1:][city[1:] != city[:-1]] = np.nan
+    return shifted
+
+
+def robust_zscores(values, city, window=ROLLING_WINDOW, min_periods=MIN_PERIODS):
+    """
+    Modified z-score of every cell of a (City, Date)-sorted (n, k) array against the
+    city's preceding `window` readings: 0.6745 * (x - median) / MAD.
+    The current reading is excluded from its own statistics, so a spike cannot hide
+    itself. The MAD is the rolling median of earlier absolute deviations, which keeps
+    every step a single grouped rolling pass. NaN where there is too little history.
+    """
+    if not len(values):
+        return np.empty_like(values)
+    median = _grouped_rolling_median(_shift_within(values, city), city, window, min_periods)
+    deviation = np.abs(values - median)
+    mad = _grouped_rolling_median(_shift_within(deviation, city), city, window, min_periods)
+    mad = np.maximum(mad, MAD_FLOOR_FRACTION * np.abs(median) + 1e-9)
+    return 0.6745 * (values - median) / mad
+
+
+def stuck_cells(values, city, run=STUCK_RUN):
+    """Cells in a run of at least `run` identical non-zero readings of the same city"""
+    stuck = np.zeros(values.shape, dtype=bool)
+    if not len(values):
+        return stuck
+    new_city = np.r_[True, city[1:] != city[:-1]]
+    for j in range(values.shape[1]):
+        column = values[:, j]
+        starts = new_city | np.r_[True, column[1:] != column[:-1]]
+        run_id = np.cumsum(starts)
+        lengths = np.bincount(run_id)[run_id]
+        stuck[:, j] = (lengths >= run) & ~np.isnan(column) & (column != 0)
+    return stuck
+
+
+class AnomalyDetector:
+    """
+    Flags sensor faults in city_day-shaped frames, per city and pollutant.
+
+    The 'mad' method marks spikes (robust z-score against the trailing window),
+    stuck sensors and readings outside PLAUSIBLE_MAX. 'isolation_forest' also fits
+    an IsolationForest on the rows' z-scores and, for each outlying row, flags the
+    pollutant furthest from normal.
+    Statistics only look backwards, so appending rows never changes the flags of
+    earlier rows; detect() can be run on just the cities that received rows. The
+    fitted forest is kept and reused for those incremental runs.
+    """
+
+    def __init__(self, method=ANOMALY_METHOD, columns=IMPUTE_COLUMNS, window=ROLLING_WINDOW,
+                 threshold=Z_THRESHOLD, contamination=CONTAMINATION):
+        if method not in ANOMALY_METHODS:
+            raise ValueError(f"Unknown anomaly method '{method}' (expected one of {', '.join(ANOMALY_METHODS)})")
+        self.method = method
+        self.columns = columns
+        self.window = window
+        self.threshold = threshold
+        self.contamination = contamination
+        self.model = None
+
+    def detect(self, frame):
+        """int8 flag frame (same index as frame, one column per pollutant)"""
+        columns = [c for c in self.columns if c in frame.columns]
+        codes, order, inverse = city_date_order(frame)
+        city = codes[order]
+        values = frame[columns].to_numpy(dtype='float64')[order]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = robust_zscores(values, city, self.window)
+        flags = np.where(np.abs(z) > self.threshold, SPIKE, 0).astype(np.int8)
+        flags |= np.where(stuck_cells(values, city), STUCK, 0).astype(np.int8)
+        limits = np.array([PLAUSIBLE_MAX.get(c, np.inf) for c in columns])
+        flags |= np.where((values > limits) | (values < 0), OUT_OF_RANGE, 0).astype(np.int8)
+        if self.method == 'isolation_forest' and len(values):
+            flags |= self._isolation_flags(z)
+
+        return pd.DataFrame(flags[inverse], index=frame.index, columns=columns)
+
+    def _isolation_flags(self, z):
+        from sklearn.ensemble import IsolationForest
+
+        features = np.nan_to_num(np.clip(z, -50, 50), nan=0.0)
+        if self.model is None:
+            self.model = IsolationForest(
+                n_estimators=100, contamination=self.contamination, random_state=42, n_jobs=-1
+            ).fit(features)
+        outlier = self.model.predict(features) == -1
+        flags = np.zeros(z.shape, dtype=np.int8)
+        rows = np.flatnonzero(outlier)
+        flags[rows, np.abs(features[rows]).argmax(axis=1)] = ISOLATION
+        return flags
+
+
+def describe_flag(flag):
+    """'spike, stuck sensor' style label for one bitmask value"""
+    return ', '.join(label for bit, label in ANOMALY_LABELS.items() if flag & bit)
@@ -12,9 +12,37 @@ import base64
 import datetime
 import time
 import json
-from math import sin, cos, pi
+from math import cos, pi
 import warnings
+import os
 import requests
+from datastore import CityDayStore, find_store, ingest_drop_folder, open_store
+from data_quality import POLLUTANT_LIMITS
+from comparison import ComparisonCube
+from alerts import AlertEngine, load_rules, sinks_from_spec
+from figures import (
+    build_aqi_gauge, build_pollutant_bars, build_pollutant_pie, build_pollutant_trends, build_trend_chart,
+    get_aqi_color, get_exposure_advice, get_health_advisory, get_recommendations, get_risk_level, pollutant_levels
+)
+from exposure import EXPOSURE_WINDOWS, INHALATION_RATES, ExposureTable
+from trends import TrendAnalysis
+from forecast_cache import ForecastCache
+from forecasting import HISTORY_ROWS, load_forecaster
+from gazetteer import load_gazetteer
+from providers import (
+    PROVIDER_TYPES, OpenWeatherProvider, ProviderCache, ProviderChain, SimulationProvider, StoreProvider,
+    latest_reading, provider_order, store_latest_data
+)
+from narration import render_report
+from simulation import SIMULATION_ENABLED, Simulator, synthesize
+from spatial import HEX_SIZE_KM, SpatialIndex, load_regions
+from weather import WEATHER_SOURCE, WeatherCache, enrich, load_weather, weather_enabled
+from rollups import GRANULARITIES, periods_for_days, rollup_store_frame
+from stations import STATIONS_PATH, StationRollups, load_stations, station_data_available
+from instrumentation import (
+    timed, track, track_rerun, last_rerun, record_bytes, record_cache_hit, record_cache_miss,
+    get_metrics, export_prometheus, export_json_lines, admin_panel_enabled
+)
 warnings.filterwarnings('ignore')
 
 # Set page config
@@ -108,6 +136,10 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Data file and API endpoint (overridable for benchmarks and offline runs)
+DATA_PATH = os.environ.get('AQ_DATA_PATH', 'city_day.csv')
+OPENWEATHER_BASE_URL = os.environ.get('OPENWEATHER_BASE_URL', 'http://api.openweathermap.org').rstrip('/')
+
 # Initialize session state
 if 'current_city' not in st.session_state:
     st.session_state.current_city = 'Delhi'
@@ -118,22 +150,25 @@ if 'voice_enabled' not in st.session_state:
 if 'last_narration' not in st.session_state:
     st.session_state.last_narration = None
 if 'openweather_api_key' not in st.session_state:
-    st.session_state.openweather_api_key = ''
-if 'kaggle_data' not in st.session_state:
-    st.session_state.kaggle_data = None
+    # Any key works against the simulated API
+    st.session_state.openweather_api_key = 'simulation' if SIMULATION_ENABLED else ''
+if 'fill_gaps' not in st.session_state:
+    st.session_state.fill_gaps = True
+if 'granularity' not in st.session_state:
+    st.session_state.granularity = 'daily'
 
-# Load Kaggle dataset
-@st.cache_data
-def load_kaggle_data():
+# Load Kaggle dataset (one shared, read-only store per server process)
+@timed('get_data_store', cached=True)
+@st.cache_resource
+def get_data_store():
     """
     Load the city_day.csv dataset from Kaggle
     Download from: https://www.kaggle.com/datasets/rohanrao/air-quality-data-in-india
     Place the file in the same directory as this script
     """
+    record_cache_miss('get_data_store')
     try:
-        df = pd.read_csv('city_day.csv')
-        df['Date'] = pd.to_datetime(df['Date'])
-        return df
+        return open_store(DATA_PATH)
     except FileNotFoundError:
         st.warning("⚠️ Kaggle dataset (city_day.csv) not found. Using sample data. Please download from: https://www.kaggle.com/datasets/rohanrao/air-quality-data-in-india")
         return None
@@ -141,64 +176,221 @@ def load_kaggle_data():
         st.error(f"Error loading Kaggle dataset: {str(e)}")
         return None
 
+# Hourly station-level data (station_hour.csv + stations.csv), rolled up per city
+@timed('get_station_rollups', cached=True)
+@st.cache_resource
+def get_station_rollups():
+    """Cached hourly/daily/monthly city rollups of the station data, or None when it is absent"""
+    record_cache_miss('get_station_rollups')
+    if not station_data_available():
+        return None
+    try:
+        return StationRollups.open()
+    except Exception as e:
+        st.error(f"Error loading station data: {str(e)}")
+        return None
+
+# Monthly rollup of the city_day store, rebuilt only when rows were appended
+@timed('get_monthly_store', cached=True)
+@st.cache_resource(max_entries=2)
+def get_monthly_store(version):
+    record_cache_miss('get_monthly_store')
+    return CityDayStore(rollup_store_frame(get_data_store(), 'monthly'), granularity='monthly')
+
+def get_granularity_store(granularity):
+    """
+    Store serving one granularity: daily rows come from city_day.csv, monthly rows are
+    rolled up from them and hourly rows from the station data (which also covers daily
+    and monthly when city_day.csv is missing)
+    """
+    store = get_data_store()
+    stations = get_station_rollups()
+    if granularity == 'hourly' or store is None:
+        return stations.store(granularity) if stations is not None else None
+    if granularity == 'monthly':
+        return get_monthly_store(store.version)
+    return store
+
+def available_granularities():
+    available = []
+    if get_station_rollups() is not None:
+        available = list(GRANULARITIES)
+    elif get_data_store() is not None:
+        available = ['daily', 'monthly']
+    return available
+
+# City x date matrices for the comparison view, rebuilt only when the data changes
+@timed('get_comparison_cube', cached=True)
+@st.cache_resource(max_entries=4)
+def get_comparison_cube(granularity, clean, version):
+    record_cache_miss('get_comparison_cube')
+    store = get_granularity_store(granularity)
+    return ComparisonCube.from_store(store, clean=clean) if store is not None else None
+
+# Rolling exceedances, means and doses of every city, from the same matrices
+@timed('get_exposure_table', cached=True)
+@st.cache_resource(max_entries=4)
+def get_exposure_table(granularity, clean, version):
+    record_cache_miss('get_exposure_table')
+    cube = get_comparison_cube(granularity, clean, version)
+    return ExposureTable.from_cube(cube) if cube is not None and cube.cities else None
+
+# Long-term trends, seasonal cycles and change points of every city, once per data version
+@timed('get_trend_analysis', cached=True)
+@st.cache_resource(max_entries=4)
+def get_trend_analysis(granularity, clean, version):
+    record_cache_miss('get_trend_analysis')
+    cube = get_comparison_cube(granularity, clean, version)
+    return TrendAnalysis.from_cube(cube) if cube is not None and cube.cities else None
+
+def city_trends(kaggle_df):
+    """Trend analysis of the data behind a loaded frame, or None"""
+    store = find_store(kaggle_df)
+    if store is None:
+        return None
+    return get_trend_analysis(store.granularity, kaggle_df is store.clean, store.version)
+
+def city_exposure(kaggle_df):
+    """Exposure table of the data behind a loaded frame, or None"""
+    store = find_store(kaggle_df)
+    if store is None:
+        return None
+    return get_exposure_table(store.granularity, kaggle_df is store.clean, store.version)
+
+def data_granularity(df):
+    """What one row of a loaded frame covers ('daily' for frames outside the stores)"""
+    store = find_store(df)
+    return store.granularity if store is not None else 'daily'
+
+@timed()
+def load_kaggle_data(clean=False, granularity='daily'):
+    """
+    Current city_day frame; reflects rows appended since the store was loaded.
+    clean=True returns the gap-filled frame computed once at load time.
+    """
+    store = get_granularity_store(granularity)
+    if store is None:
+        return None
+    return store.clean if clean else store.frame
+
+# Append CSV files dropped into the incoming folder
+def ingest_new_data():
+    store = get_data_store()
+    if store is None:
+        return []
+    with track('ingest_drop_folder'):
+        return ingest_drop_folder(store)
+
+# Alert engine shared by all sessions; its cooldown state lives as long as the process
+@st.cache_resource
+def get_alert_engine():
+    try:
+        return AlertEngine(load_rules(), sinks_from_spec())
+    except Exception as e:
+        st.error(f"Error loading alert rules: {str(e)}")
+        return None
+
+# Evaluate the alert rules over every city whenever the daily data changes
+def run_alerts():
+    store = get_granularity_store('daily')
+    engine = get_alert_engine()
+    if store is None or engine is None:
+        return engine
+    if engine.version != store.version:
+        cube = get_comparison_cube('daily', False, store.version)
+        with track('evaluate_alerts'):
+            engine.evaluate(cube.matrices, store.version, forecasts=alert_forecasts(store))
+    return engine
+
+def alert_forecasts(store):
+    """Precomputed next-day AQI forecasts, so forecast rules agree with the dashboard; None without a model"""
+    cache = get_forecast_cache()
+    forecaster = get_forecaster()
+    if cache is None or forecaster is None:
+        return None
+    latest = getattr(store, 'clean_latest', store.latest)
+    values = cache.next_values(forecaster.version, forecaster.horizon, latest['Date'])
+    return {'AQI': values} if len(values) else None
+
 # Get latest data from Kaggle dataset for a city
+@timed()
 def get_city_latest_data(df, city_name):
     """Extract latest data for a specific city from Kaggle dataset"""
     if df is None:
         return None
     
+    store = find_store(df)
+    if store is not None:
+        # Indexed lookup in the shared store's latest-row table
+        return store_latest_data(store, city_name, clean=df is store.clean)
+    
     city_data = df[df['City'] == city_name].sort_values('Date', ascending=False)
-    if len(city_data) > 0:
-        latest = city_data.iloc[0]
-        return {
-            'date': latest['Date'],
-            'pm25': latest.get('PM2.5', 0),
-            'pm10': latest.get('PM10', 0),
-            'no2': latest.get('NO2', 0),
-            'so2': latest.get('SO2', 0),
-            'co': latest.get('CO', 0),
-            'o3': latest.get('O3', 0),
-            'nh3': latest.get('NH3', 0),
-            'aqi': latest.get('AQI', 0),
-            'aqi_bucket': latest.get('AQI_Bucket', 'Unknown')
-        }
-    return None
+    return latest_reading(city_data.iloc[0]) if len(city_data) > 0 else None
 
 # Get historical data from Kaggle dataset
+@timed()
 def get_city_historical_data(df, city_name, days=30):
     """Get historical data for a city from Kaggle dataset"""
     if df is None:
         return None
     
+    store = find_store(df)
+    if store is not None:
+        periods = periods_for_days(days, store.granularity)
+        return store.city_history(city_name, periods, clean=df is store.clean)
+    
     city_data = df[df['City'] == city_name].sort_values('Date', ascending=False).head(days)
     return city_data
 
+# Anomaly flags for a city's recent rows (indexed by Date), from the shared store
+@timed()
+def get_city_anomalies(df, city_name, periods):
+    store = find_store(df) if df is not None else None
+    if store is None:
+        return None
+    return store.city_anomalies(city_name, periods)
+
+# OpenWeather geocoding, for city names the gazetteer does not know
+def geocode_city(city_name, api_key):
+    geo_url = f"{OPENWEATHER_BASE_URL}/geo/1.0/direct?q={city_name},IN&limit=1&appid={api_key}"
+    geo_response = requests.get(geo_url, timeout=10)
+    record_bytes('get_openweather_data', len(geo_response.content))
+    
+    if geo_response.status_code != 200:
+        st.error(f"Geocoding API Error: {geo_response.status_code}")
+        return None, None
+    
+    geo_data = geo_response.json()
+    if not geo_data:
+        st.error(f"City {city_name} not found")
+        return None, None
+    
+    return geo_data[0]['lat'], geo_data[0]['lon']
+
 # OpenWeatherMap API integration
+@timed()
 def get_openweather_data(city_name, api_key):
     """Fetch live air quality data from OpenWeatherMap API"""
     if not api_key:
         return None
     
     try:
-        # Get coordinates first
-        geo_url = f"http://api.openweathermap.org/geo/1.0/direct?q={city_name},IN&limit=1&appid={api_key}"
-        geo_response = requests.get(geo_url, timeout=10)
-        
-        if geo_response.status_code != 200:
-            st.error(f"Geocoding API Error: {geo_response.status_code}")
-            return None
-        
-        geo_data = geo_response.json()
-        if not geo_data:
-            st.error(f"City {city_name} not found")
-            return None
-        
-        lat = geo_data[0]['lat']
-        lon = geo_data[0]['lon']
+        # Coordinates from the offline gazetteer; the geocoding API only for unknown names
+        location = get_gazetteer().locate(city_name)
+        if SIMULATION_ENABLED:
+            lat, lon = location if location is not None else (None, None)
+            return get_simulator().openweather(city_name, lat, lon)
+        if location is not None:
+            lat, lon = location
+        else:
+            lat, lon = geocode_city(city_name, api_key)
+            if lat is None:
+                return None
         
         # Get air pollution data
-        aqi_url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={api_key}"
+        aqi_url = f"{OPENWEATHER_BASE_URL}/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={api_key}"
         aqi_response = requests.get(aqi_url, timeout=10)
+        record_bytes('get_openweather_data', len(aqi_response.content))
         
         if aqi_response.status_code != 200:
             st.error(f"Air Pollution API Error: {aqi_response.status_code}")
@@ -207,8 +399,9 @@ def get_openweather_data(city_name, api_key):
         aqi_data = aqi_response.json()
         
         # Get forecast data
-        forecast_url = f"http://api.openweathermap.org/data/2.5/air_pollution/forecast?lat={lat}&lon={lon}&appid={api_key}"
+        forecast_url = f"{OPENWEATHER_BASE_URL}/data/2.5/air_pollution/forecast?lat={lat}&lon={lon}&appid={api_key}"
         forecast_response = requests.get(forecast_url, timeout=10)
+        record_bytes('get_openweather_data', len(forecast_response.content))
         
         forecast_data = None
         if forecast_response.status_code == 200:
@@ -231,217 +424,242 @@ def get_openweather_data(city_name, api_key):
         st.error(f"Error fetching OpenWeather data: {str(e)}")
         return None
 
-def parse_openweather_data(ow_data):
-    """Parse OpenWeatherMap data into our format"""
-    if not ow_data or 'current' not in ow_data:
-        return None
-    
-    current = ow_data['current']
-    if 'list' not in current or len(current['list']) == 0:
-        return None
-    
-    components = current['list'][0]['components']
-    aqi = current['list'][0]['main']['aqi']
-    
-    # Convert OpenWeather AQI (1-5) to Indian AQI scale (0-500)
-    aqi_conversion = {1: 50, 2: 100, 3: 200, 4: 300, 5: 400}
-    indian_aqi = aqi_conversion.get(aqi, 100)
-    
-    # Get status
-    if indian_aqi <= 50:
-        status = 'Good'
-    elif indian_aqi <= 100:
-        status = 'Satisfactory'
-    elif indian_aqi <= 200:
-        status = 'Moderate'
-    elif indian_aqi <= 300:
-        status = 'Poor'
-    elif indian_aqi <= 400:
-        status = 'Very Poor'
-    else:
-        status = 'Severe'
-    
-    return {
-        'aqi': indian_aqi,
-        'status': status,
-        'pm25': components.get('pm2_5', 0),
-        'pm10': components.get('pm10', 0),
-        'no2': components.get('no2', 0),
-        'so2': components.get('so2', 0),
-        'co': components.get('co', 0),
-        'o3': components.get('o3', 0),
-        'nh3': components.get('nh3', 0),
-        'timestamp': datetime.datetime.fromtimestamp(current['list'][0]['dt'])
+# Seeded synthetic streams (AQ_SIM_* settings), shared by every session
+@st.cache_resource
+def get_simulator():
+    return Simulator()
+
+# Provider answers shared by every session (cached per data version / TTL)
+@st.cache_resource
+def get_provider_cache():
+    return ProviderCache()
+
+def get_provider_names():
+    try:
+        names = provider_order()
+    except ValueError as e:
+        st.error(f"AQ_PROVIDERS: {str(e)}")
+        names = ['store', 'openweather']
+    # Simulation mode always offers the simulated stream
+    if SIMULATION_ENABLED and 'simulation' not in names:
+        names.append('simulation')
+    return names
+
+def get_provider_chain(kaggle_df, api_key):
+    """Data providers in AQ_PROVIDERS order; add a source here and in providers.PROVIDER_TYPES"""
+    store = find_store(kaggle_df) if kaggle_df is not None else None
+    providers = {
+        'store': StoreProvider(store, clean=store is not None and kaggle_df is store.clean),
+        'openweather': OpenWeatherProvider(api_key, get_openweather_data),
+        'simulation': SimulationProvider(get_simulator())
     }
+    return ProviderChain([providers[name] for name in get_provider_names()], get_provider_cache())
 
-def get_openweather_forecast(ow_data):
-    """Parse OpenWeatherMap forecast data"""
-    if not ow_data or 'forecast' not in ow_data or not ow_data['forecast']:
-        return None
-    
-    forecast = ow_data['forecast']
-    if 'list' not in forecast:
-        return None
-    
-    forecast_list = []
-    for item in forecast['list']:
-        components = item['components']
-        aqi = item['main']['aqi']
-        
-        # Convert to Indian AQI scale
-        aqi_conversion = {1: 50, 2: 100, 3: 200, 4: 300, 5: 400}
-        indian_aqi = aqi_conversion.get(aqi, 100)
-        
-        forecast_list.append({
-            'datetime': datetime.datetime.fromtimestamp(item['dt']),
-            'aqi': indian_aqi,
-            'pm25': components.get('pm2_5', 0),
-            'pm10': components.get('pm10', 0),
-            'no2': components.get('no2', 0),
-            'o3': components.get('o3', 0)
-        })
-    
-    return pd.DataFrame(forecast_list)
+# Offline gazetteer (data/gazetteer.json + stations.csv): names, aliases and stations -> coordinates
+@st.cache_resource
+def get_gazetteer():
+    stations = None
+    if os.path.exists(STATIONS_PATH):
+        try:
+            stations = load_stations()
+        except Exception as e:
+            st.warning(f"stations.csv could not be read: {str(e)}")
+    return load_gazetteer(stations=stations)
+
+# Cities placed in hex cells and regions once per city list (boundaries from AQ_REGIONS_PATH when set)
+@st.cache_resource(max_entries=4)
+def get_spatial_index(cities):
+    gazetteer = get_gazetteer()
+    points = []
+    for name in cities:
+        city = gazetteer.resolve(name)
+        if city is not None:
+            info = gazetteer.cities[city]
+            points.append({'name': name, 'lat': info['lat'], 'lng': info['lng'], 'state': info['state']})
+    return SpatialIndex(pd.DataFrame(points, columns=['name', 'lat', 'lng', 'state']), HEX_SIZE_KM, load_regions())
+
+# Latest AQI per hex cell or region and its GeoJSON, rebuilt only when the data changes
+@timed('get_spatial_summary', cached=True)
+@st.cache_resource(max_entries=8)
+def get_spatial_summary(granularity, clean, version, level):
+    record_cache_miss('get_spatial_summary')
+    store = get_granularity_store(granularity)
+    if store is None:
+        return None, None, None
+    index = get_spatial_index(tuple(store.cities()))
+    latest = store.clean_latest if clean and hasattr(store, 'clean_latest') else store.latest
+    summary = index.aggregate(latest['AQI'], level)
+    return summary, index.geojson(summary, level), index.regions is not None
 
 # City data with coordinates
 @st.cache_data
 def load_city_coordinates():
-    return {
-        'Delhi': {'lat': 28.6139, 'lng': 77.2090, 'population': 32900000, 'area': 1484, 'elevation': 216},
-        'Mumbai': {'lat': 19.0760, 'lng': 72.8777, 'population': 20400000, 'area': 603, 'elevation': 14},
-        'Bangalore': {'lat': 12.9716, 'lng': 77.5946, 'population': 13200000, 'area': 741, 'elevation': 920},
-        'Chennai': {'lat': 13.0827, 'lng': 80.2707, 'population': 11500000, 'area': 426, 'elevation': 6},
-        'Kolkata': {'lat': 22.5726, 'lng': 88.3639, 'population': 15000000, 'area': 185, 'elevation': 9},
-        'Hyderabad': {'lat': 17.3850, 'lng': 78.4867, 'population': 10500000, 'area': 650, 'elevation': 542},
-        'Pune': {'lat': 18.5204, 'lng': 73.8567, 'population': 7400000, 'area': 331, 'elevation': 560},
-        'Ahmedabad': {'lat': 23.0225, 'lng': 72.5714, 'population': 8400000, 'area': 505, 'elevation': 53},
-        'Lucknow': {'lat': 26.8467, 'lng': 80.9462, 'population': 3500000, 'area': 631, 'elevation': 123},
-        'Jaipur': {'lat': 26.9124, 'lng': 75.7873, 'population': 3500000, 'area': 467, 'elevation': 435},
-    }
+    return get_gazetteer().coordinates()
 
-# Language translations
-@st.cache_data
-def load_translations():
-    return {
-        'English': {
-            'current_aqi': 'Current AQI is',
-            'pm25_level': 'PM2.5 level is',
-            'pm10_level': 'PM10 level is',
-            'air_quality_status': 'Air quality status is',
-            'micrograms': 'micrograms per cubic meter',
-            'prediction_shows': 'Prediction shows',
-            'good': 'Good',
-            'satisfactory': 'Satisfactory',
-            'moderate': 'Moderate',
-            'poor': 'Poor',
-            'very_poor': 'Very Poor',
-            'severe': 'Severe'
-        },
-        'Hindi': {
-            'current_aqi': 'वर्तमान एक्यूआई है',
-            'pm25_level': 'पीएम 2.5 का स्तर है',
-            'pm10_level': 'पीएम 10 का स्तर है',
-            'air_quality_status': 'वायु गुणवत्ता की स्थिति है',
-            'micrograms': 'माइक्रोग्राम प्रति घन मीटर',
-            'prediction_shows': 'पूर्वानुमान दिखाता है',
-            'good': 'अच्छा',
-            'satisfactory': 'संतोषजनक',
-            'moderate': 'मध्यम',
-            'poor': 'खराब',
-            'very_poor': 'बहुत खराब',
-            'severe': 'गंभीर'
-        },
-        'Tamil': {
-            'current_aqi': 'தற்போதைய காற்று தர குறியீடு',
-            'pm25_level': 'பிஎம் 2.5 அளவு',
-            'pm10_level': 'பிஎம் 10 அளவு',
-            'air_quality_status': 'காற்று தர நிலை',
-            'micrograms': 'மைக்ரோகிராம் ஒரு கன மீட்டருக்கு',
-            'prediction_shows': 'முன்கணிப்பு காட்டுகிறது',
-            'good': 'நல்லது',
-            'satisfactory': 'திருப்திகரமானது',
-            'moderate': 'மிதமானது',
-            'poor': 'மோசமானது',
-            'very_poor': 'மிக மோசமானது',
-            'severe': 'கடுமையானது'
-        },
-        'Telugu': {
-            'current_aqi': 'ప్రస్తుత గాలి నాణ్యత సూచిక',
-            'pm25_level': 'పిఎం 2.5 స్థాయి',
-            'pm10_level': 'పిఎం 10 స్థాయి',
-            'air_quality_status': 'గాలి నాణ్యత స్థితి',
-            'micrograms': 'మైక్రోగ్రాములు ఒక క్యూబిక్ మీటరుకు',
-            'prediction_shows': 'అంచనా చూపిస్తుంది',
-            'good': 'మంచిది',
-            'satisfactory': 'సంతృప్తికరం',
-            'moderate': 'మధ్యస్థం',
-            'poor': 'చెడ్డది',
-            'very_poor': 'చాలా చెడ్డది',
-            'severe': 'తీవ్రమైనది'
-        }
-    }
+# Daily weather cache (AQ_WEATHER_SOURCE); None when weather enrichment is off
+@st.cache_resource
+def get_weather_cache():
+    if not weather_enabled():
+        return None
+    try:
+        return WeatherCache()
+    except Exception as e:
+        st.error(f"Error opening weather cache: {str(e)}")
+        return None
 
-# Generate AI prediction data
-@st.cache_data
-def generate_prediction_data(current_aqi):
-    predictions = []
-    confidence = []
-    hours_ahead = []
-    
-    for i in range(1, 25):
-        trend = sin(i * 0.2) * 20 + np.random.normal(0, 5)
-        predicted_aqi = max(0, current_aqi + trend)
-        conf = 0.85 + np.random.random() * 0.1
-        
-        predictions.append(predicted_aqi)
-        confidence.append(conf)
-        hours_ahead.append(f"+{i}h")
-    
-    return pd.DataFrame({
-        'Hours_Ahead': hours_ahead,
-        'Predicted_AQI': predictions,
-        'Confidence': confidence
+def city_locations():
+    """(lat, lng) per gazetteer city and per dataset city name that resolves to one"""
+    store = get_data_store()
+    names = list(load_city_coordinates()) + (store.cities() if store is not None else [])
+    return {city: (info['lat'], info['lng']) for city, info in get_gazetteer().city_coordinates(names).items()}
+
+# Fill the weather cache for the store's cities; only days not cached yet are fetched
+def update_weather(store):
+    cache = get_weather_cache()
+    if cache is None or store is None:
+        return None
+    with track('update_weather'):
+        try:
+            result = load_weather(cache, city_locations(), WEATHER_SOURCE, OPENWEATHER_BASE_URL, store.aggregates['last_date'])
+        except Exception as e:
+            st.warning(f"Weather data could not be updated: {str(e)}")
+            return cache
+    if result['failed']:
+        # Failed days back off before they are requested again (check OPENWEATHER_API_KEY)
+        st.warning(f"Weather backfill: {result['failed']} of {result['fetched'] + result['failed']} requests failed; "
+                   f"they are retried after a back-off")
+    return cache
+
+def with_weather(frame):
+    """frame with the cached weather features joined in (unchanged when weather is off)"""
+    cache = get_weather_cache()
+    if cache is None or frame is None:
+        return frame
+    return enrich(frame, city_locations(), cache)
+
+# AQI forecaster trained on the daily data (pickled in the cache dir, so it trains once per dataset)
+@timed('get_forecaster', cached=True)
+@st.cache_resource
+def get_forecaster():
+    record_cache_miss('get_forecaster')
+    store = get_granularity_store('daily')
+    if store is None:
+        return None
+    update_weather(store)
+    try:
+        if hasattr(store, 'dataset'):
+            # Lazy stores train on their most recent two years, read in batches
+            start = store.aggregates['last_date'].max() - pd.Timedelta(days=730)
+            frames = list(store.scan(['City', 'Date', 'PM2.5', 'AQI'], start=start))
+            return load_forecaster(with_weather(pd.concat(frames, ignore_index=True)), cache_dir=store.cache_dir)
+        return load_forecaster(with_weather(store.clean), store.quality_flags, cache_dir=store.cache_dir)
+    except Exception as e:
+        st.error(f"Error training the forecast model: {str(e)}")
+        return None
+
+def forecast_histories(store, cities):
+    """Recent gap-filled rows of each city, enough to build the model's features"""
+    histories = [store.city_history(city, HISTORY_ROWS, clean=True) for city in cities]
+    return with_weather(pd.concat(histories, ignore_index=True)) if histories else None
+
+def latest_weather(city_name):
+    """Cached weather features of the city's latest day, or None"""
+    store = get_granularity_store('daily')
+    if get_weather_cache() is None or store is None:
+        return None
+    history = store.city_history(city_name, 1, clean=True)
+    if not len(history):
+        return None
+    row = with_weather(history).iloc[0]
+    return None if pd.isna(row['wind_speed']) else row
+
+# Forecast cache on disk, shared by every session and worker process
+@st.cache_resource
+def get_forecast_cache():
+    try:
+        return ForecastCache()
+    except Exception as e:
+        st.error(f"Error opening forecast cache: {str(e)}")
+        return None
+
+# Precompute forecasts for every city whose latest observation changed since the last refresh
+def refresh_forecasts():
+    store = get_granularity_store('daily')
+    cache = get_forecast_cache()
+    if store is None or cache is None or cache.version == store.version:
+        return
+    forecaster = get_forecaster()
+    if forecaster is None:
+        return
+    if cache.version is not None:
+        update_weather(store)  # Appended days need their weather before they are forecast
+    with track('refresh_forecasts'):
+        latest = getattr(store, 'clean_latest', store.latest)
+        cache.refresh(
+            latest, forecaster.version, forecaster.horizon,
+            lambda rows: forecaster.predict(forecast_histories(store, rows.index)), store.version
+        )
+
+# Forecast (with prediction bands) from the city's current reading; precomputed entries make this a cache hit
+@timed()
+def get_city_forecast(city_name, current_data):
+    forecaster = get_forecaster()
+    cache = get_forecast_cache()
+    last_obs = current_data.get('timestamp')
+    if forecaster is None:
+        return None
+    if cache is not None and last_obs is not None:
+        forecast = cache.get(city_name, forecaster.version, last_obs, forecaster.horizon)
+        if forecast is not None:
+            record_cache_hit('forecast_cache')
+            return forecast
+        record_cache_miss('forecast_cache')
+
+    # Not precomputed (e.g. a live reading): the store's history plus the current reading
+    store = get_granularity_store('daily')
+    history = forecast_histories(store, [city_name]) if store is not None else None
+    current = pd.DataFrame({
+        'City': [city_name],
+        'Date': [pd.Timestamp(last_obs if last_obs is not None else datetime.datetime.now()).normalize()],
+        'AQI': [float(current_data['aqi'])],
+        'PM2.5': [float(current_data.get('pm25') or np.nan)]
     })
+    if history is not None and len(history):
+        history = history[history['Date'] < current['Date'].iloc[0]][['City', 'Date', 'AQI', 'PM2.5']]
+        current = pd.concat([history, current], ignore_index=True)
+    current = with_weather(current)
+    forecast = forecaster.predict(current)[city_name]
+    # Only store readings are persisted: the cache keeps one row per city, and a live or
+    # simulated reading would replace the row refresh_forecasts() precomputed from the store
+    if cache is not None and last_obs is not None and store is not None:
+        latest = store.latest_row(city_name)
+        if latest is not None and pd.Timestamp(latest['Date']) == pd.Timestamp(last_obs):
+            cache.put(city_name, forecaster.version, last_obs, forecaster.horizon, forecast)
+    return forecast
 
 # Voice narration functions
 def get_language_code(language):
     lang_codes = {'English': 'en', 'Hindi': 'hi', 'Tamil': 'ta', 'Telugu': 'te'}
     return lang_codes.get(language, 'en')
 
+@timed()
 def create_audio_narration(text, language):
     try:
         lang_code = get_language_code(language)
-        tts = gtts.gTTS(text=text, lang=lang_code, slow=False)
-        mp3_fp = BytesIO()
-        tts.write_to_fp(mp3_fp)
-        mp3_fp.seek(0)
-        return mp3_fp.getvalue()
+        if SIMULATION_ENABLED:
+            audio_data = synthesize(text, lang_code)
+        else:
+            tts = gtts.gTTS(text=text, lang=lang_code, slow=False)
+            mp3_fp = BytesIO()
+            tts.write_to_fp(mp3_fp)
+            mp3_fp.seek(0)
+            audio_data = mp3_fp.getvalue()
+        record_bytes('create_audio_narration', len(audio_data))
+        return audio_data
     except:
         st.error("Voice synthesis not available for this language")
         return None
 
-def get_aqi_color(aqi):
-    if aqi <= 50: return '#10B981'
-    elif aqi <= 100: return '#F59E0B'
-    elif aqi <= 150: return '#F97316'
-    elif aqi <= 200: return '#EF4444'
-    elif aqi <= 300: return '#8B5CF6'
-    else: return '#7C2D12'
-
-def get_health_advisory(aqi):
-    if aqi <= 50:
-        return {'level': 'Good', 'color': 'status-good', 'advice': 'Air quality is considered satisfactory, and air pollution poses little or no risk.'}
-    elif aqi <= 100:
-        return {'level': 'Satisfactory', 'color': 'status-moderate', 'advice': 'Air quality is acceptable; however, for some pollutants there may be a moderate health concern for a very small number of people who are unusually sensitive to air pollution.'}
-    elif aqi <= 150:
-        return {'level': 'Moderate', 'color': 'status-moderate', 'advice': 'Members of sensitive groups may experience health effects. The general public is not likely to be affected.'}
-    elif aqi <= 200:
-        return {'level': 'Poor', 'color': 'status-poor', 'advice': 'Everyone may begin to experience health effects; members of sensitive groups may experience more serious health effects.'}
-    elif aqi <= 300:
-        return {'level': 'Very Poor', 'color': 'status-poor', 'advice': 'Health warnings of emergency conditions. The entire population is more likely to be affected.'}
-    else:
-        return {'level': 'Severe', 'color': 'status-severe', 'advice': 'Health alert: everyone may experience more serious health effects. Avoid outdoor activities.'}
-
 # Main app
 def main():
     # Header
@@ -452,13 +670,21 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Load Kaggle data
-    if st.session_state.kaggle_data is None:
-        st.session_state.kaggle_data = load_kaggle_data()
-    
-    kaggle_df = st.session_state.kaggle_data
+    # Pick up any newly dropped daily files, then load the shared data
+    for result in ingest_new_data():
+        if result.get('error'):
+            st.toast(f"❌ {result['file']}: {result['error']}")
+        else:
+            st.toast(f"📥 {result['file']}: {result['appended']} new rows, {len(result['rejected'])} rejected")
+    refresh_forecasts()
+    alert_engine = run_alerts()
+    
+    # Load Kaggle data (shared across sessions, never copied into session_state)
+    granularities = available_granularities()
+    if st.session_state.granularity not in granularities:
+        st.session_state.granularity = 'daily'
+    kaggle_df = load_kaggle_data(clean=st.session_state.fill_gaps, granularity=st.session_state.granularity)
     city_coords = load_city_coordinates()
-    translations = load_translations()
     
     # Get available cities
     if kaggle_df is not None:
@@ -477,16 +703,38 @@ def main():
         )
         st.session_state.current_city = current_city
         
+        store = find_store(kaggle_df)
+        city_summary = store.city_summary(current_city) if store is not None else None
+        if city_summary:
+            st.caption(f"{city_summary['rows']:,} {store.granularity} records · {city_summary['first_date']:%Y-%m-%d} to {city_summary['last_date']:%Y-%m-%d}")
+        stations = get_station_rollups()
+        if stations is not None and len(stations.city_stations(current_city)):
+            st.caption(f"📡 {len(stations.city_stations(current_city))} monitoring stations")
+        
         # Data source selection
         st.markdown("### 📊 Data Source")
+        provider_labels = {PROVIDER_TYPES[name].label: name for name in get_provider_names()}
         data_source = st.radio(
             "Choose data source:",
-            ["Kaggle Dataset", "Live OpenWeather API"],
+            list(provider_labels),
             key="data_source"
         )
+        if len(granularities) > 1:
+            st.selectbox(
+                "⏱️ Granularity:",
+                granularities,
+                format_func=str.title,
+                key="granularity"
+            )
+        st.checkbox(
+            "🧹 Clean data",
+            key="fill_gaps",
+            help="Remove sensor faults (spikes, stuck and out-of-range readings), then interpolate short gaps "
+                 "and use seasonal values for long ones in the Kaggle data"
+        )
         
         # OpenWeather API key input
-        if data_source == "Live OpenWeather API":
+        if provider_labels.get(data_source) == 'openweather':
             st.markdown("### 🔑 API Configuration")
             api_key = st.text_input(
                 "OpenWeather API Key:",
@@ -499,28 +747,41 @@ def main():
             if st.button("🔄 Fetch Live Data"):
                 with st.spinner("Fetching live data..."):
                     if api_key:
+                        get_provider_cache().invalidate('openweather', current_city)
                         st.rerun()
                     else:
                         st.error("Please enter your OpenWeather API key")
         
-        # City info card
-        if current_city in city_coords:
-            city_info = city_coords[current_city]
+        # City info card (gazetteer entry, also found through aliases)
+        city_info = get_gazetteer().city_coordinates([current_city]).get(current_city)
+        if city_info:
+            def known(value, unit=''):
+                return f"{value:,}{unit}" if value is not None else "n/a"
             st.markdown(f"""
             <div class="sidebar-section">
                 <h4>📍 {current_city}</h4>
                 <p><strong>Coordinates:</strong> {city_info['lat']:.2f}°N, {city_info['lng']:.2f}°E</p>
-                <p><strong>Population:</strong> {city_info['population']:,}</p>
-                <p><strong>Area:</strong> {city_info['area']} km²</p>
-                <p><strong>Elevation:</strong> {city_info['elevation']} m</p>
+                <p><strong>Population:</strong> {known(city_info['population'])}</p>
+                <p><strong>Area:</strong> {known(city_info['area'], ' km²')}</p>
+                <p><strong>Elevation:</strong> {known(city_info['elevation'], ' m')}</p>
             </div>
             """, unsafe_allow_html=True)
         
+        # Alerts across all cities
+        if alert_engine is not None and len(alert_engine.active):
+            with st.expander(f"🚨 Alerts ({len(alert_engine.active)} active)"):
+                for alert in alert_engine.active.head(15).to_dict('records'):
+                    st.markdown(f"**{alert['severity'].upper()}** · {alert_engine.describe(alert)['message']}")
+                if len(alert_engine.active) > 15:
+                    st.caption(f"… and {len(alert_engine.active) - 15} more")
+                for error in alert_engine.errors:
+                    st.caption(f"⚠️ Delivery failed: {error}")
+        
         # View mode selection
         st.markdown("### 📊 View Mode")
         view_mode = st.radio(
             "Choose view:",
-            ["Real-time Data", "AI Predictions", "Historical Trends", "Map View"],
+            ["Real-time Data", "AI Predictions", "Historical Trends", "Map View", "City Comparison"],
             key="view_mode"
         )
         
@@ -536,36 +797,14 @@ def main():
         voice_enabled = st.checkbox("🔊 Enable Voice Narration", value=st.session_state.voice_enabled)
         st.session_state.voice_enabled = voice_enabled
     
-    # Get current data based on source
-    current_data = None
-    data_source_indicator = ""
-    
-    if data_source == "Live OpenWeather API" and st.session_state.openweather_api_key:
-        ow_data = get_openweather_data(current_city, st.session_state.openweather_api_key)
-        if ow_data:
-            current_data = parse_openweather_data(ow_data)
-            data_source_indicator = "🟢 LIVE"
-    
-    if current_data is None and kaggle_df is not None:
-        kaggle_city_data = get_city_latest_data(kaggle_df, current_city)
-        if kaggle_city_data:
-            current_data = {
-                'aqi': kaggle_city_data['aqi'],
-                'status': kaggle_city_data['aqi_bucket'],
-                'pm25': kaggle_city_data['pm25'],
-                'pm10': kaggle_city_data['pm10'],
-                'no2': kaggle_city_data['no2'],
-                'so2': kaggle_city_data['so2'],
-                'co': kaggle_city_data['co'],
-                'o3': kaggle_city_data['o3'],
-                'nh3': kaggle_city_data.get('nh3', 0),
-                'timestamp': kaggle_city_data['date']
-            }
-            data_source_indicator = "📊 KAGGLE DATA"
-    
-    if current_data is None:
+    # One fetch per rerun: the first provider with data for the city (the selected one first)
+    chain = get_provider_chain(kaggle_df, st.session_state.openweather_api_key)
+    sources = chain.resolve(current_city, preferred=provider_labels.get(data_source))
+    if sources is None:
         st.error(f"No data available for {current_city}. Please try another city or data source.")
         return
+    current_data = sources['current']
+    data_source_indicator = sources['indicator']
     
     # Display data source indicator
     col1, col2, col3 = st.columns([2, 1, 1])
@@ -573,6 +812,14 @@ def main():
         st.markdown(f"### {data_source_indicator}")
         if 'timestamp' in current_data:
             st.caption(f"Updated: {current_data['timestamp'].strftime('%Y-%m-%d %H:%M')}")
+        if current_data.get('imputed'):
+            st.caption(f"Gap-filled: {', '.join(current_data['imputed'])}")
+        if current_data.get('anomalies'):
+            faults = ', '.join(f"{column} ({kind})" for column, kind in current_data['anomalies'].items())
+            if current_data.get('clean'):
+                st.caption(f"Sensor faults removed: {faults}")
+            else:
+                st.warning(f"⚠️ Possible sensor faults: {faults}")
     
     # Current status cards
     col1, col2, col3, col4 = st.columns(4)
@@ -589,7 +836,7 @@ def main():
         st.metric(
             label="💨 PM2.5",
             value=f"{current_data['pm25']:.1f} µg/m³",
-            delta="Above limit" if current_data['pm25'] > 60 else "Within limit"
+            delta="Above limit" if current_data['pm25'] > POLLUTANT_LIMITS['PM2.5'] else "Within limit"
         )
     
     with col3:
@@ -601,30 +848,49 @@ def main():
         )
     
     with col4:
-        trend = "↗ Improving" if np.random.random() > 0.5 else "↘ Worsening"
-        confidence = round(0.8 + np.random.random() * 0.15, 2)
+        forecast = get_city_forecast(current_city, current_data)
+        if forecast is not None:
+            tomorrow = forecast.iloc[0]
+            trend = "↗ Improving" if tomorrow['Predicted_AQI'] < current_data['aqi'] else "↘ Worsening"
+            delta = f"80% range {tomorrow['Lower_80']:.0f}–{tomorrow['Upper_80']:.0f} ({tomorrow['Ahead']})"
+        else:
+            trend, delta = "Unavailable", None
         st.metric(
             label="🤖 AI Prediction",
             value=trend,
-            delta=f"{confidence*100:.0f}% confidence"
+            delta=delta,
+            delta_color="off"
         )
     
     # Main content based on view mode
     if view_mode == "Real-time Data":
-        show_realtime_data(current_city, current_data, kaggle_df, data_source, st.session_state.openweather_api_key)
+        show_realtime_data(current_city, current_data, sources)
     elif view_mode == "AI Predictions":
-        show_ai_predictions(current_city, current_data, data_source, st.session_state.openweather_api_key)
+        show_ai_predictions(current_city, current_data, sources)
     elif view_mode == "Historical Trends":
         show_historical_trends(current_city, kaggle_df)
+    elif view_mode == "City Comparison":
+        show_city_comparison(current_city, kaggle_df)
     else:
         show_map_view(kaggle_df, city_coords, current_city)
     
+    # Alerts for this city, then the health advisory
+    if alert_engine is not None:
+        for alert in alert_engine.active_for(current_city).to_dict('records'):
+            message = alert_engine.describe(alert)['message']
+            if alert['severity'] == 'critical':
+                st.error(f"🚨 {message}")
+            elif alert['severity'] == 'warning':
+                st.warning(f"⚠️ {message}")
+            else:
+                st.info(f"ℹ️ {message}")
+    
     # Health advisory section
-    show_health_advisory(current_data['aqi'])
+    show_health_advisory(current_data['aqi'], current_city, kaggle_df)
     
     # Voice narration
     if voice_enabled and st.button("🎵 Start Voice Narration"):
-        narrate_current_status(current_city, current_data, translations, selected_language)
+        narrate_current_status(current_city, current_data, selected_language)
     
     # Footer
     st.markdown("---")
@@ -636,79 +902,26 @@ def main():
     </div>
     """.format(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")), unsafe_allow_html=True)
 
-def show_realtime_data(city_name, city_data, kaggle_df, data_source, api_key):
+@timed()
+def show_realtime_data(city_name, city_data, sources):
     """Show real-time data visualizations"""
     st.markdown("## 📈 Real-time Air Quality Data")
     
-    # Get historical data for trends
-    if data_source == "Live OpenWeather API" and api_key:
-        # For live API, show recent forecast as trend
-        ow_data = get_openweather_data(city_name, api_key)
-        if ow_data:
-            forecast_df = get_openweather_forecast(ow_data)
-            if forecast_df is not None and len(forecast_df) > 0:
-                historical_data = forecast_df.head(24).copy()
-                historical_data['Time'] = historical_data['datetime'].dt.strftime('%H:%M')
-                historical_data.rename(columns={'aqi': 'AQI', 'pm25': 'PM2.5', 'pm10': 'PM10', 'no2': 'NO2', 'o3': 'O3'}, inplace=True)
-            else:
-                historical_data = None
-        else:
-            historical_data = None
-    elif kaggle_df is not None:
-        # Use Kaggle historical data
-        city_historical = get_city_historical_data(kaggle_df, city_name, days=30)
-        if city_historical is not None and len(city_historical) > 0:
-            historical_data = city_historical.tail(24).copy()
-            historical_data['Time'] = historical_data['Date'].dt.strftime('%m-%d')
-            historical_data.rename(columns={'PM2.5': 'PM2.5', 'PM10': 'PM10', 'NO2': 'NO2', 'O3': 'O3', 'AQI': 'AQI'}, inplace=True)
-        else:
-            historical_data = None
-    else:
-        historical_data = None
+    # Recent rows from the provider (the live forecast for OpenWeather, history for the store)
+    historical_data = sources.get('trend')
     
     # Row 1: AQI Gauge and trend
     col1, col2 = st.columns([1, 2])
     
     with col1:
         # AQI Gauge
-        fig_gauge = go.Figure(go.Indicator(
-            mode = "gauge+number+delta",
-            value = city_data['aqi'],
-            domain = {'x': [0, 1], 'y': [0, 1]},
-            title = {'text': "Current AQI"},
-            delta = {'reference': 100},
-            gauge = {
-                'axis': {'range': [None, 500]},
-                'bar': {'color': get_aqi_color(city_data['aqi'])},
-                'steps': [
-                    {'range': [0, 50], 'color': "lightgreen"},
-                    {'range': [50, 100], 'color': "yellow"},
-                    {'range': [100, 150], 'color': "orange"},
-                    {'range': [150, 200], 'color': "red"},
-                    {'range': [200, 300], 'color': "purple"},
-                    {'range': [300, 500], 'color': "darkred"}
-                ],
-                'threshold': {
-                    'line': {'color': "black", 'width': 4},
-                    'thickness': 0.75,
-                    'value': city_data['aqi']
-                }
-            }
-        ))
-        fig_gauge.update_layout(height=300, margin=dict(l=20, r=20, t=40, b=20))
+        fig_gauge = build_aqi_gauge(city_data['aqi'])
         st.plotly_chart(fig_gauge, use_container_width=True)
     
     with col2:
         # Trend chart
         if historical_data is not None:
-            fig_trend = px.area(
-                historical_data, 
-                x='Time', 
-                y='AQI',
-                title="Recent AQI Trend",
-                color_discrete_sequence=['#3B82F6']
-            )
-            fig_trend.update_layout(height=300)
+            fig_trend = build_trend_chart(historical_data)
             st.plotly_chart(fig_trend, use_container_width=True)
         else:
             st.info("Historical trend data not available")
@@ -716,37 +929,10 @@ def show_realtime_data(city_name, city_data, kaggle_df, data_source, api_key):
     # Row 2: Pollutant levels
     st.markdown("### 🧪 Current Pollutant Levels")
     
-    pollutants_df = pd.DataFrame({
-        'Pollutant': ['PM2.5', 'PM10', 'NO2', 'SO2', 'CO', 'O3'],
-        'Current': [
-            city_data.get('pm25', 0), 
-            city_data.get('pm10', 0), 
-            city_data.get('no2', 0),
-            city_data.get('so2', 0), 
-            city_data.get('co', 0), 
-            city_data.get('o3', 0)
-        ],
-        'Limit': [60, 100, 80, 80, 4, 180],
-        'Unit': ['µg/m³', 'µg/m³', 'µg/m³', 'µg/m³', 'mg/m³', 'µg/m³']
-    })
+    pollutants_df = pollutant_levels(city_data)
     
     # Pollutant bar chart
-    fig_pollutants = px.bar(
-        pollutants_df,
-        x='Pollutant',
-        y='Current',
-        title="Current Pollutant Concentrations",
-        color='Current',
-        color_continuous_scale='Reds'
-    )
-    fig_pollutants.add_scatter(
-        x=pollutants_df['Pollutant'],
-        y=pollutants_df['Limit'],
-        mode='markers',
-        name='Safety Limit',
-        marker=dict(color='red', size=10, symbol='line-ew')
-    )
-    fig_pollutants.update_layout(height=400)
+    fig_pollutants = build_pollutant_bars(pollutants_df)
     st.plotly_chart(fig_pollutants, use_container_width=True)
     
     # Row 3: Distribution and trends
@@ -754,93 +940,92 @@ def show_realtime_data(city_name, city_data, kaggle_df, data_source, api_key):
     
     with col1:
         # Pie chart
-        fig_pie = px.pie(
-            pollutants_df,
-            values='Current',
-            names='Pollutant',
-            title="Pollutant Distribution"
-        )
-        fig_pie.update_layout(height=400)
+        fig_pie = build_pollutant_pie(pollutants_df)
         st.plotly_chart(fig_pie, use_container_width=True)
     
     with col2:
         # Multi-pollutant trends
         if historical_data is not None:
-            fig_multi = go.Figure()
-            
-            for pollutant in ['PM2.5', 'PM10', 'NO2', 'O3']:
-                if pollutant in historical_data.columns:
-                    fig_multi.add_trace(go.Scatter(
-                        x=historical_data['Time'],
-                        y=historical_data[pollutant],
-                        mode='lines',
-                        name=pollutant
-                    ))
-            
-            fig_multi.update_layout(
-                title="Pollutant Trends",
-                xaxis_title="Time",
-                yaxis_title="Concentration",
-                height=400
-            )
+            fig_multi = build_pollutant_trends(historical_data)
             st.plotly_chart(fig_multi, use_container_width=True)
         else:
             st.info("Historical pollutant data not available")
 
-def show_ai_predictions(city_name, city_data, data_source, api_key):
+@timed()
+def show_ai_predictions(city_name, city_data, sources):
     """Show AI predictions and forecasts"""
     st.markdown("## 🤖 AI-Powered Predictions & Forecasts")
     
-    # Check if we have live forecast data
-    forecast_df = None
-    if data_source == "Live OpenWeather API" and api_key:
-        ow_data = get_openweather_data(city_name, api_key)
-        if ow_data:
-            forecast_df = get_openweather_forecast(ow_data)
+    # The provider's own forecast (live OpenWeather data), if any
+    forecast_df = sources.get('forecast')
     
     # Generate prediction data
+    forecaster = get_forecaster()
     if forecast_df is not None and len(forecast_df) > 0:
-        # Use actual forecast data
+        # Use actual forecast data (OpenWeather gives no uncertainty bands)
         prediction_data = forecast_df.head(24).copy()
-        prediction_data['Hours_Ahead'] = [f"+{i+1}h" for i in range(len(prediction_data))]
+        prediction_data['Ahead'] = [f"+{i+1}h" for i in range(len(prediction_data))]
         prediction_data['Predicted_AQI'] = prediction_data['aqi']
-        prediction_data['Confidence'] = 0.90 + np.random.random(len(prediction_data)) * 0.08
+        title = "24-Hour AQI Forecast (OpenWeather)"
     else:
-        # Use AI-generated predictions
-        prediction_data = generate_prediction_data(city_data['aqi'])
-    
-    # Row 1: 24-hour forecast
+        # Model forecast with prediction bands (cached per city and last observation)
+        prediction_data = get_city_forecast(city_name, city_data)
+        if prediction_data is None:
+            st.info("No forecast model is available: it is trained on the Kaggle dataset, which is not loaded.")
+            return
+        title = f"{len(prediction_data)}-Day AQI Forecast"
+    has_bands = 'Lower_80' in prediction_data
+    
+    # Row 1: forecast with its 80% and 95% prediction bands
     col1, col2 = st.columns([2, 1])
     
     with col1:
         # Prediction chart
-        fig_pred = px.line(
-            prediction_data,
-            x='Hours_Ahead',
-            y='Predicted_AQI',
-            title="24-Hour AQI Forecast",
-            color_discrete_sequence=['#EF4444']
-        )
+        fig_pred = go.Figure()
+        if has_bands:
+            for level, color in ((95, 'rgba(239, 68, 68, 0.12)'), (80, 'rgba(239, 68, 68, 0.25)')):
+                fig_pred.add_trace(go.Scatter(
+                    x=prediction_data['Ahead'], y=prediction_data[f"Upper_{level}"],
+                    mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'
+                ))
+                fig_pred.add_trace(go.Scatter(
+                    x=prediction_data['Ahead'], y=prediction_data[f"Lower_{level}"],
+                    mode='lines', line=dict(width=0), fill='tonexty', fillcolor=color,
+                    name=f"{level}% interval"
+                ))
+        fig_pred.add_trace(go.Scatter(
+            x=prediction_data['Ahead'], y=prediction_data['Predicted_AQI'],
+            mode='lines+markers', name='Forecast', line=dict(color='#EF4444')
+        ))
         fig_pred.add_hline(
             y=city_data['aqi'], 
             line_dash="dash", 
             line_color="blue",
             annotation_text="Current AQI"
         )
-        fig_pred.update_layout(height=400)
+        fig_pred.update_layout(title=title, height=400, xaxis_title="Ahead", yaxis_title="AQI")
         st.plotly_chart(fig_pred, use_container_width=True)
     
+    first_metrics = forecaster.metrics[1] if forecaster is not None and has_bands else None
     with col2:
         # AI Model insights
-        avg_confidence = prediction_data['Confidence'].mean()
         trend_direction = "Improving" if prediction_data['Predicted_AQI'].iloc[-1] < city_data['aqi'] else "Worsening"
+        coverage = f"{first_metrics['coverage'][0.8]:.1%}" if first_metrics else "n/a"
+        weather = latest_weather(city_name)
+        weather_factor = "Weather patterns"
+        if weather is not None:
+            weather_factor = (
+                f"Weather: {weather['temp_mean']:.0f}°C, wind {weather['wind_speed']:.1f} m/s, "
+                f"humidity {weather['humidity']:.0f}%"
+                + (" – stagnant air" if weather['stagnation'] == 1 else "")
+            )
         
         st.markdown(f"""
         <div class="prediction-card">
             <h4>🧠 AI Model Insights</h4>
             <div style="margin: 1rem 0;">
-                <h5>Prediction Accuracy</h5>
-                <h2>{avg_confidence:.1%}</h2>
+                <h5>80% Interval Coverage (holdout)</h5>
+                <h2>{coverage}</h2>
             </div>
             <div style="margin: 1rem 0;">
                 <h5>Trend Analysis</h5>
@@ -849,7 +1034,7 @@ def show_ai_predictions(city_name, city_data, data_source, api_key):
             <div style="margin: 1rem 0;">
                 <h5>Risk Factors</h5>
                 <ul style="font-size: 0.9rem;">
-                    <li>Weather patterns</li>
+                    <li>{weather_factor}</li>
                     <li>Traffic density</li>
                     <li>Industrial activity</li>
                     <li>Seasonal variations</li>
@@ -858,20 +1043,29 @@ def show_ai_predictions(city_name, city_data, data_source, api_key):
         </div>
         """, unsafe_allow_html=True)
     
-    # Row 2: Confidence and statistics
+    # Row 2: Interval width and statistics
     col1, col2 = st.columns(2)
     
     with col1:
-        # Confidence over time
-        fig_conf = px.line(
-            prediction_data,
-            x='Hours_Ahead',
-            y='Confidence',
-            title="Prediction Confidence Over Time",
-            color_discrete_sequence=['#10B981']
-        )
-        fig_conf.update_layout(height=300, yaxis=dict(range=[0.7, 1.0]))
-        st.plotly_chart(fig_conf, use_container_width=True)
+        if has_bands:
+            # Uncertainty grows with the horizon
+            widths = pd.DataFrame({
+                'Ahead': prediction_data['Ahead'],
+                '80%': prediction_data['Upper_80'] - prediction_data['Lower_80'],
+                '95%': prediction_data['Upper_95'] - prediction_data['Lower_95']
+            }).melt(id_vars='Ahead', var_name='Interval', value_name='Width (AQI)')
+            fig_width = px.line(
+                widths,
+                x='Ahead',
+                y='Width (AQI)',
+                color='Interval',
+                title="Prediction Interval Width",
+                color_discrete_sequence=['#10B981', '#3B82F6']
+            )
+            fig_width.update_layout(height=300)
+            st.plotly_chart(fig_width, use_container_width=True)
+        else:
+            st.caption("The OpenWeather forecast has no prediction intervals.")
     
     with col2:
         # Statistics
@@ -887,40 +1081,70 @@ def show_ai_predictions(city_name, city_data, data_source, api_key):
             st.metric("Min AQI", f"{min_aqi:.0f}")
         with col_b:
             st.metric("Avg AQI", f"{avg_aqi:.0f}")
-            st.metric("Confidence", f"{avg_confidence:.1%}")
+            if has_bands:
+                first = prediction_data.iloc[0]
+                st.metric(f"80% Range ({first['Ahead']})", f"{first['Lower_80']:.0f}–{first['Upper_80']:.0f}")
     
     # Row 3: ML Model details
     st.markdown("### 🔬 Machine Learning Model Details")
     
     col1, col2, col3 = st.columns(3)
     
+    # Weather features in use, or why none are (too little weather on the training dates)
+    weather_shares = getattr(forecaster, 'weather_coverage', {}) if forecaster is not None else {}
+    used = [c for c in forecaster.feature_columns if c in weather_shares] if forecaster is not None else []
+    weather_line = ""
+    if used:
+        weather_line = f"- Weather features: {', '.join(used)}"
+    elif weather_shares:
+        weather_line = f"- Weather features not used: {max(weather_shares.values()):.0%} of training days have weather"
+    
     with col1:
-        st.markdown("""
+        st.markdown(f"""
         **🧠 Model Architecture**
-        - LSTM Neural Networks
-        - Random Forest Ensemble
-        - XGBoost Regressor
-        - Feature Engineering Pipeline
+        - Gradient-boosted trees, one per forecast day
+        - Lagged and rolling log-AQI features
+        - PM2.5 and seasonal features
+        - Split-conformal prediction intervals
+        {weather_line}
         """)
     
     with col2:
         st.markdown("""
         **📊 Training Data**
-        - Historical AQI records (5 years)
-        - Meteorological data
-        - Traffic patterns
-        - Industrial emission data
+        - Historical daily AQI records (gap-filled, faults removed)
+        - Imputed AQI values are never used as targets
+        - Most recent 15% of dates held out for calibration
         """)
     
     with col3:
-        st.markdown("""
-        **⚡ Performance Metrics**
-        - RMSE: 12.5
-        - MAE: 8.3
-        - R² Score: 0.87
-        - Real-time inference: <100ms
-        """)
+        if first_metrics:
+            st.markdown(f"""
+            **⚡ Performance Metrics (next day, holdout)**
+            - RMSE: {first_metrics['rmse']:.1f}
+            - MAE: {first_metrics['mae']:.1f}
+            - R² Score: {first_metrics['r2']:.2f}
+            - 95% interval coverage: {first_metrics['coverage'][0.95]:.1%}
+            """)
+        else:
+            st.markdown("""
+            **⚡ Performance Metrics**
+            - Available for model forecasts only
+            """)
+
+# Aggregates shown below the historical charts
+@timed()
+def compute_historical_summary(city_data):
+    """Summary statistics and AQI bucket counts for a city's history"""
+    return {
+        'avg_aqi': city_data['AQI'].mean(),
+        'max_aqi': city_data['AQI'].max(),
+        'min_aqi': city_data['AQI'].min(),
+        'good_days': int((city_data['AQI'] <= 50).sum()),
+        'bucket_counts': city_data['AQI_Bucket'].value_counts()
+    }
 
+@timed()
 def show_historical_trends(city_name, kaggle_df):
     """Show historical trends from Kaggle dataset"""
     st.markdown("## 📊 Historical Air Quality Trends")
@@ -941,9 +1165,25 @@ def show_historical_trends(city_name, kaggle_df):
     # Time period selector
     period = st.selectbox("Select Time Period:", ["Last 30 Days", "Last 90 Days", "Last 180 Days", "Last 365 Days", "All Available"])
     
-    period_map = {"Last 30 Days": 30, "Last 90 Days": 90, "Last 180 Days": 180, "Last 365 Days": 365, "All Available": len(city_data)}
+    granularity = data_granularity(kaggle_df)
+    period_map = {label: periods_for_days(days, granularity) for label, days in
+                  {"Last 30 Days": 30, "Last 90 Days": 90, "Last 180 Days": 180, "Last 365 Days": 365}.items()}
+    period_map["All Available"] = len(city_data)
     city_data_filtered = city_data.tail(period_map[period])
     
+    # Sensor faults in the period: removed from cleaned data, marked on raw data
+    faults = get_city_anomalies(kaggle_df, city_name, len(city_data_filtered))
+    fault_dates = pd.DatetimeIndex([])
+    if faults is not None and len(faults):
+        faulty = faults[(faults != 0).any(axis=1)]
+        fault_dates = faulty.index
+        if len(faulty):
+            removed = find_store(kaggle_df).clean is kaggle_df
+            st.caption(
+                f"{len(faulty)} of {len(faults)} periods have readings flagged as sensor faults"
+                + (" (removed and gap-filled)" if removed else " (marked in red)")
+            )
+    
     # Row 1: AQI trend over time
     fig_aqi_trend = px.line(
         city_data_filtered,
@@ -952,6 +1192,12 @@ def show_historical_trends(city_name, kaggle_df):
         title=f"AQI Trend - {city_name}",
         color_discrete_sequence=['#3B82F6']
     )
+    marked = city_data_filtered[city_data_filtered['Date'].isin(fault_dates)]
+    if len(marked) and find_store(kaggle_df).clean is not kaggle_df:
+        fig_aqi_trend.add_trace(go.Scatter(
+            x=marked['Date'], y=marked['AQI'], mode='markers', name='Sensor fault',
+            marker=dict(color='red', symbol='x', size=8)
+        ))
     fig_aqi_trend.add_hline(y=100, line_dash="dash", line_color="orange", annotation_text="Moderate threshold")
     fig_aqi_trend.add_hline(y=200, line_dash="dash", line_color="red", annotation_text="Poor threshold")
     fig_aqi_trend.update_layout(height=400)
@@ -977,7 +1223,23 @@ def show_historical_trends(city_name, kaggle_df):
         fig_gas.update_layout(title="Gaseous Pollutants Trends", height=350)
         st.plotly_chart(fig_gas, use_container_width=True)
     
+    # Rolling 30-day exceedances from the cached exposure table
+    exposure = city_exposure(kaggle_df)
+    if exposure is not None and city_name in exposure.cities:
+        rolling = pd.DataFrame({
+            pollutant: exposure.rolling(pollutant, 30)[city_name]
+            for pollutant in ['PM2.5', 'PM10', 'NO2'] if pollutant in exposure.limits
+        }).loc[city_data_filtered['Date'].min():city_data_filtered['Date'].max()]
+        fig_exposure = px.line(
+            rolling,
+            title=f"{exposure.period_unit.title()} Above Safety Limit (rolling 30 days)",
+            labels={'value': exposure.period_unit.title(), 'variable': 'Pollutant', 'index': 'Date'}
+        )
+        fig_exposure.update_layout(height=350)
+        st.plotly_chart(fig_exposure, use_container_width=True)
+    
     # Row 3: Statistics and distribution
+    summary = compute_historical_summary(city_data_filtered)
     col1, col2 = st.columns(2)
     
     with col1:
@@ -994,7 +1256,7 @@ def show_historical_trends(city_name, kaggle_df):
     
     with col2:
         # AQI bucket distribution
-        aqi_bucket_counts = city_data_filtered['AQI_Bucket'].value_counts()
+        aqi_bucket_counts = summary['bucket_counts']
         fig_bucket = px.pie(
             values=aqi_bucket_counts.values,
             names=aqi_bucket_counts.index,
@@ -1009,34 +1271,72 @@ def show_historical_trends(city_name, kaggle_df):
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Average AQI", f"{city_data_filtered['AQI'].mean():.1f}")
+        st.metric("Average AQI", f"{summary['avg_aqi']:.1f}")
     with col2:
-        st.metric("Max AQI", f"{city_data_filtered['AQI'].max():.1f}")
+        st.metric("Max AQI", f"{summary['max_aqi']:.1f}")
     with col3:
-        st.metric("Min AQI", f"{city_data_filtered['AQI'].min():.1f}")
+        st.metric("Min AQI", f"{summary['min_aqi']:.1f}")
     with col4:
-        good_days = len(city_data_filtered[city_data_filtered['AQI'] <= 50])
-        st.metric("Good Air Days", f"{good_days}")
-
-def show_map_view(kaggle_df, city_coords, selected_city):
-    """Show map view with multiple cities"""
-    st.markdown("## 🗺️ Interactive Map View")
+        st.metric("Good Air Days", f"{summary['good_days']}")
     
-    # Create base map
-    m = folium.Map(
-        location=[20.5937, 78.9629],
-        zoom_start=5,
-        tiles='OpenStreetMap'
-    )
+    # Long-term trend from the cached analysis (all available data, not just the period above)
+    analysis = city_trends(kaggle_df)
+    trends = analysis.city(city_name) if analysis is not None else None
+    if trends is None or 'AQI' not in trends.index:
+        return
+    st.markdown("### 📉 Long-term Trend")
+    aqi_trend = trends.loc['AQI']
+    if aqi_trend['Direction'] == 'not enough data':
+        st.info(f"Long-term trends need {analysis.min_months} months of data ({aqi_trend['Months']} available)")
+        return
     
-    # Get latest AQI for all cities
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("AQI Trend", aqi_trend['Direction'].capitalize(),
+                  delta=f"{aqi_trend['Percent per year']:+.1f}% per year", delta_color="inverse")
+    with col2:
+        st.metric("Significance (Mann-Kendall p)", f"{aqi_trend['P value']:.3f}")
+    with col3:
+        st.metric("Mean Shifts Detected", len(aqi_trend['Change points']))
+    
+    parts = analysis.decomposition(city_name, 'AQI')
+    fig_decomp = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.06,
+                               subplot_titles=("Monthly AQI and Trend", "Seasonal Cycle", "Residual"))
+    fig_decomp.add_trace(go.Scatter(x=parts.index, y=parts['Observed'], mode='lines', name='Monthly mean'), row=1, col=1)
+    fig_decomp.add_trace(go.Scatter(x=parts.index, y=parts['Trend'], mode='lines', name='Trend'), row=1, col=1)
+    fig_decomp.add_trace(go.Scatter(x=parts.index, y=parts['Seasonal'], mode='lines', name='Seasonal'), row=2, col=1)
+    fig_decomp.add_trace(go.Bar(x=parts.index, y=parts['Residual'], name='Residual'), row=3, col=1)
+    for point in aqi_trend['Change points']:
+        fig_decomp.add_vline(x=point, line_dash="dot", line_color="red")
+    fig_decomp.update_layout(height=600, title=f"AQI Decomposition - {city_name}")
+    st.plotly_chart(fig_decomp, use_container_width=True)
+    
+    table = pd.DataFrame({
+        'Direction': trends['Direction'],
+        '% per year': trends['Percent per year'].round(1),
+        'p value': trends['P value'].round(3),
+        'Months': trends['Months'],
+        'Mean shifts': [
+            ', '.join(f"{date:%b %Y} ({shift:+.0f})" for date, shift in zip(dates, shifts)) or '-'
+            for dates, shifts in zip(trends['Change points'], trends['Shifts'])
+        ]
+    })
+    st.dataframe(table, use_container_width=True)
+
+# Latest AQI for every city that has coordinates
+@timed()
+def build_map_data(kaggle_df, city_coords):
+    """Collect latest AQI and coordinates for every dataset city the gazetteer can place"""
     cities_with_data = []
     
     if kaggle_df is not None:
-        for city_name in city_coords.keys():
+        store = find_store(kaggle_df)
+        dataset_cities = store.cities() if store is not None else sorted(kaggle_df['City'].unique())
+        located = {**get_gazetteer().city_coordinates(dataset_cities), **city_coords}
+        for city_name in dataset_cities:
             city_latest = get_city_latest_data(kaggle_df, city_name)
-            if city_latest and city_name in city_coords:
-                coords = city_coords[city_name]
+            if city_latest and city_name in located:
+                coords = located[city_name]
                 cities_with_data.append({
                     'name': city_name,
                     'lat': coords['lat'],
@@ -1047,7 +1347,18 @@ def show_map_view(kaggle_df, city_coords, selected_city):
                     'pm10': city_latest['pm10']
                 })
     
-    # Add markers
+    return cities_with_data
+
+# Folium map with one AQI marker per city
+@timed()
+def build_aqi_map(cities_with_data):
+    """Create the Folium map with AQI circle markers"""
+    m = folium.Map(
+        location=[20.5937, 78.9629],
+        zoom_start=5,
+        tiles='OpenStreetMap'
+    )
+    
     for city in cities_with_data:
         color = get_aqi_color(city['aqi'])
         size_scale = (city['aqi'] / 500) * 30 + 10
@@ -1073,8 +1384,81 @@ def show_map_view(kaggle_df, city_coords, selected_city):
             tooltip=f"{city['name']}: AQI {city['aqi']:.0f}"
         ).add_to(m)
     
+    return m
+
+# Folium choropleth of hex cells or regions coloured by mean AQI
+@timed()
+def build_region_map(geojson):
+    m = folium.Map(
+        location=[20.5937, 78.9629],
+        zoom_start=5,
+        tiles='OpenStreetMap'
+    )
+    fields = ['Region', 'Mean AQI', 'Max AQI', 'Points', 'Worst']
+    folium.GeoJson(
+        geojson,
+        style_function=lambda feature: {
+            'fillColor': get_aqi_color(feature['properties']['Mean AQI']),
+            'color': 'white',
+            'weight': 1,
+            'fillOpacity': 0.7
+        },
+        tooltip=folium.GeoJsonTooltip(fields=fields, aliases=[f"{field}:" for field in fields])
+    ).add_to(m)
+    return m
+
+@timed()
+def show_region_view(kaggle_df, level):
+    """Choropleth and table of the cached hex-cell or regional AQI summary"""
+    store = find_store(kaggle_df) if kaggle_df is not None else None
+    if store is None:
+        st.error("Kaggle dataset not loaded. Please download city_day.csv from the Kaggle link.")
+        return
+    summary, geojson, has_boundaries = get_spatial_summary(
+        store.granularity, kaggle_df is store.clean, store.version, level
+    )
+    if summary is None or not len(summary):
+        st.warning("No located cities to aggregate")
+        return
+    
+    if geojson['features']:
+        with track('folium_render'):
+            st_folium(build_region_map(geojson), width=700, height=500)
+    if level == 'region' and not has_boundaries:
+        st.caption("States from the gazetteer; set AQ_REGIONS_PATH to a state/district GeoJSON to draw them on the map")
+        fig_regions = px.bar(
+            summary,
+            x='Mean AQI',
+            y='Region',
+            orientation='h',
+            color='Mean AQI',
+            color_continuous_scale='RdYlGn_r',
+            title="Average Latest AQI by State"
+        )
+        fig_regions.update_layout(height=max(350, 22 * len(summary)), yaxis={'categoryorder': 'total ascending'})
+        st.plotly_chart(fig_regions, use_container_width=True)
+    elif level == 'hex':
+        st.caption(f"Hex cells of {HEX_SIZE_KM:.0f} km (AQ_HEX_SIZE_KM), coloured by the mean latest AQI of their cities")
+    
+    st.dataframe(summary.round(1), use_container_width=True, hide_index=True)
+
+@timed()
+def show_map_view(kaggle_df, city_coords, selected_city):
+    """Show map view with multiple cities"""
+    st.markdown("## 🗺️ Interactive Map View")
+    
+    layer = st.radio("Map layer:", ["City markers", "Hex grid", "Regions"], horizontal=True, key="map_layer")
+    if layer != "City markers":
+        show_region_view(kaggle_df, 'hex' if layer == "Hex grid" else 'region')
+        return
+    
+    # Get latest AQI for all cities and build the map
+    cities_with_data = build_map_data(kaggle_df, city_coords)
+    m = build_aqi_map(cities_with_data)
+    
     # Display map
-    st_folium(m, width=700, height=500)
+    with track('folium_render'):
+        st_folium(m, width=700, height=500)
     
     # City comparison table
     if cities_with_data:
@@ -1098,8 +1482,93 @@ def show_map_view(kaggle_df, city_coords, selected_city):
             hide_index=True
         )
 
-def show_health_advisory(aqi):
-    """Display health advisory"""
+@timed()
+def show_city_comparison(current_city, kaggle_df):
+    """Compare all cities side by side from the cached city x date matrices"""
+    st.markdown("## 🏙️ City Comparison")
+    
+    store = find_store(kaggle_df)
+    if store is None:
+        st.error("Kaggle dataset not loaded. Please download city_day.csv from the Kaggle link.")
+        return
+    
+    cube = get_comparison_cube(store.granularity, kaggle_df is store.clean, store.version)
+    if cube is None or not cube.cities:
+        st.warning("No data available for comparison")
+        return
+    
+    # Period and city selection
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        period = st.selectbox("Comparison Period:", ["Last 30 Days", "Last 90 Days", "Last 365 Days", "All Available"], index=2)
+    period_days = {"Last 30 Days": 30, "Last 90 Days": 90, "Last 365 Days": 365, "All Available": None}[period]
+    
+    rankings = cube.rankings(period_days)
+    default_cities = list(rankings.index[:30])
+    if current_city in cube.cities and current_city not in default_cities:
+        default_cities.append(current_city)
+    with col2:
+        selected = st.multiselect("Cities:", cube.cities, default=default_cities)
+    if len(selected) < 2:
+        st.info("Select at least two cities to compare")
+        return
+    
+    # Row 1: Rankings
+    rankings = rankings.loc[[c for c in rankings.index if c in selected]]
+    fig_rank = px.bar(
+        rankings.reset_index(),
+        x='Mean AQI',
+        y='City',
+        orientation='h',
+        color='Mean AQI',
+        color_continuous_scale='RdYlGn_r',
+        title=f"Average AQI Ranking ({period})"
+    )
+    fig_rank.update_layout(height=max(350, 22 * len(rankings)), yaxis={'categoryorder': 'total ascending'})
+    st.plotly_chart(fig_rank, use_container_width=True)
+    st.dataframe(rankings.round(1), use_container_width=True)
+    
+    # Row 2: Correlation and exceedances
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        corr = cube.correlation(period_days, selected)
+        fig_corr = px.imshow(
+            corr,
+            zmin=-1,
+            zmax=1,
+            color_continuous_scale='RdBu_r',
+            title="AQI Correlation Between Cities"
+        )
+        fig_corr.update_layout(height=500)
+        st.plotly_chart(fig_corr, use_container_width=True)
+    
+    with col2:
+        exceedances = cube.exceedances(period_days, selected)
+        fig_exceed = px.imshow(
+            exceedances,
+            text_auto=True,
+            color_continuous_scale='Reds',
+            aspect='auto',
+            title=f"{store.granularity.title()} Periods Above Safety Limit"
+        )
+        fig_exceed.update_layout(height=500)
+        st.plotly_chart(fig_exceed, use_container_width=True)
+    
+    # Row 3: Seasonal profiles
+    profile = cube.seasonal_profile(selected)
+    fig_season = px.imshow(
+        profile.T,
+        color_continuous_scale='YlOrRd',
+        aspect='auto',
+        title="Seasonal AQI Profile (mean by month, all available data)"
+    )
+    fig_season.update_layout(height=max(350, 22 * len(selected)))
+    st.plotly_chart(fig_season, use_container_width=True)
+
+@timed()
+def show_health_advisory(aqi, city_name=None, kaggle_df=None):
+    """Display health advisory, with the city's recent exposure when the dataset has it"""
     st.markdown("## 🏥 Health Advisory & Recommendations")
     
     advisory = get_health_advisory(aqi)
@@ -1116,64 +1585,47 @@ def show_health_advisory(aqi):
         </div>
         """, unsafe_allow_html=True)
         
-        if aqi > 200:
-            risk_emoji, risk_text = "🔴", "High Risk"
-        elif aqi > 100:
-            risk_emoji, risk_text = "🟡", "Moderate Risk"
-        else:
-            risk_emoji, risk_text = "🟢", "Low Risk"
+        risk_emoji, risk_text = get_risk_level(aqi)
         
         st.markdown(f"### {risk_emoji} {risk_text}")
     
     with col2:
         st.markdown("### 📋 Recommendations")
         
-        recommendations = []
-        
-        if aqi > 200:
-            recommendations.extend([
-                "❌ Avoid outdoor activities, especially for children and elderly",
-                "😷 Use N95 or P100 masks when going outside",
-                "🏠 Keep windows and doors closed",
-                "💨 Use air purifiers indoors",
-                "🚗 Avoid outdoor exercises and sports"
-            ])
-        elif aqi > 100:
-            recommendations.extend([
-                "⚠️ Limit prolonged outdoor activities for sensitive individuals",
-                "😷 Consider wearing masks during outdoor activities",
-                "🏃‍♂️ Reduce intensity of outdoor exercises",
-                "💨 Use air purifiers in rooms where you spend most time"
-            ])
-        else:
-            recommendations.extend([
-                "✅ Air quality is acceptable for outdoor activities",
-                "🏃‍♂️ Normal outdoor exercise is fine",
-                "🌱 Good time for outdoor activities and sports",
-                "💚 Minimal health risk for all individuals"
-            ])
-        
-        recommendations.extend([
-            "💧 Stay hydrated throughout the day",
-            "🌿 Consider indoor plants to improve air quality",
-            "📱 Monitor air quality regularly"
-        ])
+        recommendations = get_recommendations(aqi)
         
         for rec in recommendations:
             st.markdown(f"- {rec}")
-
-def narrate_current_status(city_name, city_data, translations, language):
-    """Create and play voice narration"""
-    trans = translations[language]
     
-    status_translation = city_data.get('status', 'Unknown')
+    # Recent exposure from the cached rolling windows
+    exposure = city_exposure(kaggle_df) if kaggle_df is not None else None
+    if exposure is None or city_name not in exposure.cities:
+        return
+    st.markdown("### 🫁 Recent Exposure")
+    profile = st.selectbox("Profile:", list(INHALATION_RATES), key="exposure_profile")
+    summary = exposure.city_summary(city_name, profile)
+    unit = exposure.period_unit
     
-    narration_text = f"""
-    {city_name} city air quality report.
-    {trans['current_aqi']} {int(city_data['aqi'])}, {trans['air_quality_status']} {status_translation}.
-    {trans['pm25_level']} {city_data['pm25']:.1f} {trans['micrograms']}.
-    {trans['pm10_level']} {city_data['pm10']:.1f} {trans['micrograms']}.
-    """
+    col1, col2, col3, col4 = st.columns(4)
+    short, long = EXPOSURE_WINDOWS[0], EXPOSURE_WINDOWS[1]
+    week, month = summary[short]['PM2.5'], summary[long]['PM2.5']
+    with col1:
+        st.metric(f"PM2.5 above limit ({short} days)", f"{week['exceedances']:.0f} / {week['periods']} {unit}")
+    with col2:
+        st.metric(f"PM2.5 above limit ({long} days)", f"{month['exceedances']:.0f} / {month['periods']} {unit}")
+    with col3:
+        st.metric(f"{long}-day mean PM2.5", f"{month['mean']:.1f} µg/m³" if pd.notna(month['mean']) else "N/A")
+    with col4:
+        st.metric(f"Inhaled PM2.5, {long} days ({profile})",
+                  f"{month['dose'] / 1000:.1f} mg" if pd.notna(month['dose']) else "N/A")
+    
+    for advice in get_exposure_advice(summary, profile, unit):
+        st.markdown(f"- {advice}")
+
+@timed()
+def narrate_current_status(city_name, city_data, language):
+    """Create and play voice narration"""
+    narration_text = render_report(city_name, city_data, language)
     
     audio_data = create_audio_narration(narration_text, language)
     
@@ -1189,5 +1641,32 @@ def narrate_current_status(city_name, city_data, translations, language):
         st.markdown(audio_html, unsafe_allow_html=True)
         st.success(f"Playing narration in {language}")
 
+def show_instrumentation_panel():
+    """Admin sidebar panel with per-rerun timings and process-wide metrics"""
+    with st.sidebar:
+        with st.expander("⏱️ Performance (admin)", expanded=False):
+            rerun = last_rerun()
+            if rerun:
+                st.metric("Last rerun", f"{rerun['seconds'] * 1000:.0f} ms")
+                if rerun['spans']:
+                    spans_df = pd.DataFrame(rerun['spans'], columns=['Step', 'Seconds'])
+                    spans_df['ms'] = (spans_df['Seconds'] * 1000).round(1)
+                    st.dataframe(spans_df[['Step', 'ms']], use_container_width=True, hide_index=True)
+            
+            metrics = get_metrics()
+            if metrics:
+                metrics_df = pd.DataFrame.from_dict(metrics, orient='index')
+                metrics_df['avg_ms'] = (metrics_df['total_seconds'] / metrics_df['calls'].clip(lower=1) * 1000).round(1)
+                metrics_df['max_ms'] = (metrics_df['max_seconds'] * 1000).round(1)
+                st.dataframe(
+                    metrics_df[['calls', 'avg_ms', 'max_ms', 'cache_hits', 'cache_misses', 'bytes', 'errors']],
+                    use_container_width=True
+                )
+                st.download_button("Prometheus export", export_prometheus(), file_name="metrics.prom")
+                st.download_button("JSON lines export", export_json_lines(), file_name="metrics.jsonl")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with track_rerun():
+        main()
+    if admin_panel_enabled():
+        show_instrumentation_panel()
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Check that rows appended to a store survive a rebuild of the dataset caches.
+
+Appends a few days per city to a synthetic city_day.csv, then changes the CSV's
+mtime (as a touch, git checkout or redeploy copy would) and reopens the store,
+in memory and lazily. Every appended row must still be there. Exits non-zero
+when one is lost.
+
+Usage:
+    python benchmarks/check_appends.py
+    python benchmarks/check_appends.py --rows 100000 --days 10
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from synthetic_data import generate_csv
+from datastore import open_store
+
+
+def new_rows(store, days):
+    """`days` rows per city after its last date, as a drop file would bring them"""
+    frames = []
+    for city, last_date in store.aggregates['last_date'].items():
+        dates = pd.date_range(last_date + pd.Timedelta(days=1), periods=days, freq='D')
+        frames.append(pd.DataFrame({'City': city, 'Date': dates.strftime('%Y-%m-%d'), 'PM2.5': 40.0, 'AQI': 90.0}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def check(csv_path, cache_dir, append_dir, lazy, days):
+    store = open_store(csv_path, cache_dir, lazy=lazy, append_dir=append_dir)
+    before = int(store.aggregates['rows'].sum())
+    result = store.append(new_rows(store, days))
+    expected = before + result['appended']
+
+    # A new mtime gives the CSV a new cache key, so every cache is rebuilt on reopen
+    stamp = time.time() + 10
+    os.utime(csv_path, (stamp, stamp))
+    reopened = int(open_store(csv_path, cache_dir, lazy=lazy, append_dir=append_dir).aggregates['rows'].sum())
+    mode = 'lazy' if lazy else 'in-memory'
+    print(f"{mode:9} loaded {before:,} rows, appended {result['appended']:,}, "
+          f"{reopened:,} after the CSV's mtime changed (expected {expected:,})")
+    return reopened == expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that appended rows survive a cache rebuild")
+    parser.add_argument('--rows', type=int, default=30_000)
+    parser.add_argument('--days', type=int, default=12, help="Days appended per city")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    ok = True
+    for lazy in (False, True):
+        with tempfile.TemporaryDirectory(prefix='aq-check-') as work:
+            csv_path = os.path.join(work, 'city_day.csv')
+            generate_csv(csv_path, args.rows)
+            ok &= check(csv_path, os.path.join(work, 'cache'), os.path.join(work, 'appended'), lazy, args.days)
+    if not ok:
+        print("FAILED: appended rows were lost when the caches were rebuilt")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
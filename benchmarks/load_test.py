@@ -0,0 +1,306 @@
+"""
+Load-test harness simulating many concurrent dashboard users.
+
+Starts `streamlit run app.py` headless against the local OpenWeather stub and
+opens one websocket session per simulated user, speaking the same protocol as
+the browser. Every user walks through the view modes (optionally on the live
+OpenWeather source) and the harness records rerun latency per view alongside
+the server process RSS.
+
+Usage:
+    python benchmarks/load_test.py --users 20 --rounds 5
+    python benchmarks/load_test.py --users 50 --live-fraction 0.5 --latency 0.05 --output load.json
+    python benchmarks/load_test.py --url http://localhost:8501 --users 10   # existing server, no RSS
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+from synthetic_data import SIZES, ensure_dataset
+from stub_server import start_stub_server
+
+VIEW_MODES = ["Real-time Data", "AI Predictions", "Historical Trends", "Map View", "City Comparison"]
+LIVE_SOURCE = "Live OpenWeather API"
+
+
+def rss_bytes(pid):
+    """Resident set size of a process (Linux /proc)"""
+    try:
+        with open(f'/proc/{pid}/statm') as fp:
+            return int(fp.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def latency_summary(samples):
+    return {
+        'count': len(samples),
+        'p50': percentile(samples, 50),
+        'p95': percentile(samples, 95),
+        'p99': percentile(samples, 99),
+        'mean': statistics.fmean(samples) if samples else None,
+        'max': max(samples) if samples else None
+    }
+
+
+def start_streamlit(port, env):
+    """Launch the dashboard headless; returns the server process once it is healthy"""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', os.path.join(ROOT_DIR, 'app.py'),
+         '--server.headless', 'true', '--server.port', str(port),
+         '--browser.gatherUsageStats', 'false', '--logger.level', 'error'],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    health_url = f"http://127.0.0.1:{port}/_stcore/health"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Streamlit server exited during startup")
+        try:
+            with urllib.request.urlopen(health_url, timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError("Streamlit server did not become healthy within 60s")
+
+
+class SimulatedUser:
+    """One browser-equivalent websocket session cycling through the view modes"""
+
+    def __init__(self, user_id, ws_url, live, rng, timeout):
+        self.user_id = user_id
+        self.ws_url = ws_url
+        self.live = live
+        self.rng = rng
+        self.timeout = timeout
+        self.widgets = {}
+        self.values = {}
+        self.samples = []
+        self.errors = []
+
+    def _set(self, kind, label, value):
+        """Remember a widget value; it is sent with every following rerun"""
+        widget_id = self.widgets.get((kind, label))
+        if widget_id is None:
+            raise KeyError(f"{kind} '{label}' not rendered")
+        self.values[widget_id] = value
+
+    def _rerun_message(self):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        msg.rerun_script.page_script_hash = ''
+        for widget_id, value in self.values.items():
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = widget_id
+            state.string_value = value
+        return msg.SerializeToString()
+
+    async def _rerun(self, ws, label):
+        start = time.perf_counter()
+        await ws.send(self._rerun_message())
+        while True:
+            raw = await asyncio.wait_for(ws.recv(), self.timeout)
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            kind = msg.WhichOneof('type')
+            if kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                element = msg.delta.new_element
+                element_type = element.WhichOneof('type')
+                proto = getattr(element, element_type)
+                if element_type == 'exception':
+                    self.errors.append(f"{label}: {proto.message}")
+                elif getattr(proto, 'id', ''):
+                    self.widgets[(element_type, getattr(proto, 'label', ''))] = proto.id
+            elif kind == 'script_finished':
+                self.samples.append((label, time.perf_counter() - start))
+                return
+
+    async def run(self, rounds, start_delay, connected):
+        await asyncio.sleep(start_delay)
+        try:
+            async with websockets.connect(self.ws_url, subprotocols=['streamlit'], max_size=None) as ws:
+                await self._rerun(ws, 'initial')
+                if self.live:
+                    self._set('radio', 'Choose data source:', LIVE_SOURCE)
+                    await self._rerun(ws, 'select_live')
+                    self._set('text_input', 'OpenWeather API Key:', 'load-test-key')
+                    await self._rerun(ws, 'api_key')
+                connected.release()
+                for _ in range(rounds):
+                    modes = list(VIEW_MODES)
+                    self.rng.shuffle(modes)
+                    for mode in modes:
+                        self._set('radio', 'Choose view:', mode)
+                        await self._rerun(ws, mode)
+        except Exception as e:
+            self.errors.append(f"session {self.user_id}: {type(e).__name__}: {e}")
+            connected.release()
+
+
+async def run_load_test(ws_url, server_pid, users, rounds, live_fraction, ramp_up, timeout, seed):
+    rng = random.Random(seed)
+    live_users = int(round(users * live_fraction))
+    sessions = [
+        SimulatedUser(i, ws_url, i < live_users, random.Random(rng.random()), timeout)
+        for i in range(users)
+    ]
+
+    rss_timeline = []
+    done = asyncio.Event()
+
+    async def sample_rss():
+        started = time.perf_counter()
+        while not done.is_set():
+            if server_pid:
+                rss_timeline.append((time.perf_counter() - started, rss_bytes(server_pid)))
+            await asyncio.sleep(0.5)
+
+    connected = asyncio.Semaphore(0)
+    rss_start = rss_bytes(server_pid) if server_pid else None
+    sampler = asyncio.create_task(sample_rss())
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(s.run(rounds, ramp_up * i / max(users, 1), connected))
+        for i, s in enumerate(sessions)
+    ]
+    for _ in sessions:
+        await connected.acquire()
+    rss_connected = rss_bytes(server_pid) if server_pid else None
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    done.set()
+    await sampler
+    rss_end = rss_bytes(server_pid) if server_pid else None
+
+    all_samples = [seconds for s in sessions for _, seconds in s.samples]
+    by_view = {}
+    for s in sessions:
+        for label, seconds in s.samples:
+            by_view.setdefault(label, []).append(seconds)
+
+    memory = None
+    if server_pid:
+        memory = {
+            'rss_start': rss_start,
+            'rss_connected': rss_connected,
+            'rss_end': rss_end,
+            'rss_peak': max([v for _, v in rss_timeline if v] + [rss_end]),
+            'rss_growth': rss_end - rss_start,
+            'rss_per_session': (rss_connected - rss_start) / users,
+            'timeline': rss_timeline
+        }
+
+    errors = [e for s in sessions for e in s.errors]
+    return {
+        'users': users,
+        'live_users': live_users,
+        'rounds': rounds,
+        'elapsed_seconds': elapsed,
+        'reruns': len(all_samples),
+        'reruns_per_second': len(all_samples) / elapsed if elapsed else None,
+        'latency': latency_summary(all_samples),
+        'latency_by_view': {label: latency_summary(values) for label, values in by_view.items()},
+        'error_count': len(errors),
+        'errors': errors[:50],
+        'memory': memory
+    }
+
+
+def print_report(report):
+    mb = 1024 * 1024
+    print(f"\n{report['users']} users ({report['live_users']} live), {report['rounds']} rounds, "
+          f"{report['reruns']} reruns in {report['elapsed_seconds']:.1f}s "
+          f"({report['reruns_per_second']:.1f} reruns/s)")
+    print(f"\n{'step':20} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    rows = [('ALL', report['latency'])] + sorted(report['latency_by_view'].items())
+    for label, stats in rows:
+        if not stats['count']:
+            continue
+        print(f"{label:20} {stats['count']:6d} {stats['p50'] * 1000:7.0f}ms "
+              f"{stats['p95'] * 1000:7.0f}ms {stats['p99'] * 1000:7.0f}ms")
+    memory = report['memory']
+    if memory:
+        print(f"\nServer RSS start {memory['rss_start'] / mb:.0f} MB, all connected {memory['rss_connected'] / mb:.0f} MB, "
+              f"peak {memory['rss_peak'] / mb:.0f} MB, end {memory['rss_end'] / mb:.0f} MB")
+        print(f"RSS growth {memory['rss_growth'] / mb:.1f} MB, ~{memory['rss_per_session'] / mb:.2f} MB per session")
+    if report['error_count']:
+        print(f"\n{report['error_count']} errors, first: {report['errors'][0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent dashboard users")
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=3, help="Passes through all view modes per user")
+    parser.add_argument('--live-fraction', type=float, default=0.25, help="Share of users on the live API source")
+    parser.add_argument('--latency', type=float, default=0.02, help="Stub API latency in seconds")
+    parser.add_argument('--size', choices=sorted(SIZES), help="Serve a synthetic dataset instead of city_day.csv")
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'))
+    parser.add_argument('--port', type=int, default=8599)
+    parser.add_argument('--url', help="Load-test an already running server instead (no RSS sampling)")
+    parser.add_argument('--ramp-up', type=float, default=2.0, help="Seconds over which sessions connect")
+    parser.add_argument('--timeout', type=float, default=120, help="Per-rerun timeout in seconds")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the report as JSON")
+    args = parser.parse_args()
+
+    stub, base_url = start_stub_server(latency=args.latency)
+    process = None
+    if args.url:
+        http_url = args.url.rstrip('/')
+    else:
+        env = dict(os.environ)
+        env['OPENWEATHER_BASE_URL'] = base_url
+        if args.size:
+            env['AQ_DATA_PATH'] = ensure_dataset(args.size, args.data_dir, seed=args.seed)
+        process = start_streamlit(args.port, env)
+        http_url = f"http://127.0.0.1:{args.port}"
+    ws_url = http_url.replace('http', 'ws', 1) + '/_stcore/stream'
+
+    try:
+        # Warm the process-wide caches so the first user does not pay for them alone
+        asyncio.run(run_load_test(ws_url, None, 1, 0, 0, 0, args.timeout, args.seed))
+        report = asyncio.run(run_load_test(
+            ws_url, process.pid if process else None, args.users, args.rounds,
+            args.live_fraction, args.ramp_up, args.timeout, args.seed
+        ))
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+        stub.shutdown()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fp:
+            json.dump(report, fp, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Offline benchmark suite for the dashboard's data and rendering hot paths.
+
+Generates (once) a synthetic city_day.csv of the requested size, starts the local
+OpenWeather/gTTS stub, imports app.py in Streamlit bare mode and times the
+functions each rerun depends on. Results are written as JSON and can be compared
+against a saved baseline.
+
+Usage:
+    python benchmarks/run_benchmarks.py --size 30k
+    python benchmarks/run_benchmarks.py --size 1m --baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --size 30k --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --size 10m --lazy   # partitioned dataset, queried per city
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import tempfile
+import argparse
+import platform
+import statistics
+import subprocess
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from synthetic_data import SIZES, ensure_dataset
+from stub_server import start_stub_server, patch_gtts
+from anomaly import AnomalyDetector
+from narration import LANGUAGES, render_batch
+from weather import WeatherCache, backfill, backfill_requests, enrich, OpenWeatherSource
+
+DEFAULT_DATA_DIR = os.path.join(BENCH_DIR, 'data')
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+# Default repeats per size; the 10M load takes tens of seconds per iteration
+DEFAULT_REPEATS = {'30k': 5, '1m': 3, '10m': 1}
+
+
+def import_app(data_path, base_url, lazy=False):
+    """Import app.py in Streamlit bare mode against the synthetic data and stub"""
+    os.environ['AQ_DATA_PATH'] = data_path
+    os.environ['OPENWEATHER_BASE_URL'] = base_url
+    os.environ['AQ_LAZY_DATA'] = '1' if lazy else '0'
+    # Bare mode warns about the missing ScriptRunContext on every st call
+    logging.disable(logging.WARNING)
+    import app
+    return app
+
+
+def measure(func, repeat, warmup=1):
+    """Run func repeat times after warmup runs; returns timing stats in seconds"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {
+        'repeat': repeat,
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'max': max(samples)
+    }
+
+
+def build_cases(app, cities, live_cities, all_cities):
+    """
+    Benchmark name -> (callable, operations per call).
+    Each case fetches the frame the way a rerun does, so cold-load cases that
+    rebuild the shared store do not leave later cases holding a stale frame.
+    """
+    city_coords = app.load_city_coordinates()
+
+    def load_cold():
+        # First start: a fresh cache dir every run, so the CSV is parsed, converted and cleaned
+        with tempfile.TemporaryDirectory(prefix='aq-bench-') as cache_dir:
+            app.open_store(app.DATA_PATH, cache_dir)
+
+    def load_restart():
+        # New server process over an existing .aq_cache: the Arrow and clean caches are memory-mapped
+        app.open_store(app.DATA_PATH)
+
+    def latest_all():
+        df = app.load_kaggle_data()
+        for city in cities:
+            app.get_city_latest_data(df, city)
+
+    def provider_resolve():
+        # Store provider answers are cached per store version, so warm runs are lookups
+        chain = app.get_provider_chain(app.load_kaggle_data(clean=True), '')
+        for city in cities:
+            chain.resolve(city)
+
+    simulator = app.Simulator(stations=10)
+
+    def simulation_fetch():
+        # Cold fetches: every city's reading, trend and forecast regenerated from the seed
+        chain = app.ProviderChain([app.SimulationProvider(simulator)], app.ProviderCache())
+        for city in all_cities:
+            chain.resolve(city)
+
+    def historical(days):
+        def run():
+            df = app.load_kaggle_data()
+            for city in cities:
+                app.get_city_historical_data(df, city, days=days)
+        return run
+
+    def map_build():
+        df = app.load_kaggle_data()
+        cities_with_data = app.build_map_data(df, city_coords)
+        m = app.build_aqi_map(cities_with_data)
+        m.get_root().render()
+
+    def historical_aggregates():
+        df = app.load_kaggle_data()
+        for city in cities:
+            city_data = app.get_city_historical_data(df, city, days=365).sort_values('Date')
+            app.compute_historical_summary(city_data)
+
+    def comparison_cube():
+        df = app.load_kaggle_data()
+        app.ComparisonCube.from_store(app.find_store(df))
+
+    def comparison_stats():
+        df = app.load_kaggle_data()
+        store = app.find_store(df)
+        cube = app.get_comparison_cube(store.granularity, False, store.version)
+        compared = cube.cities[:30]
+        cube.rankings(365)
+        cube.correlation(365, compared)
+        cube.exceedances(365, compared)
+        cube.seasonal_profile(compared)
+
+    def exposure_build():
+        df = app.load_kaggle_data()
+        store = app.find_store(df)
+        app.ExposureTable.from_cube(app.get_comparison_cube(store.granularity, False, store.version))
+
+    def exposure_lookup():
+        # Cached table: each city's advisory summary is a few prefix-sum row differences
+        df = app.load_kaggle_data()
+        table = app.city_exposure(df)
+        for city in cities:
+            table.city_summary(city)
+
+    def trend_analysis():
+        # Decomposition, Theil-Sen/Mann-Kendall and change points for every city and pollutant
+        df = app.load_kaggle_data()
+        store = app.find_store(df)
+        app.TrendAnalysis.from_cube(app.get_comparison_cube(store.granularity, False, store.version))
+
+    # Thousands of synthetic stations around the dataset cities, assigned to cells once
+    rng = np.random.default_rng(7)
+    located = list(city_coords.values())
+    anchors = [located[i] for i in rng.integers(0, len(located), 5000)]
+    station_points = pd.DataFrame({
+        'name': [f"S{i:05d}" for i in range(len(anchors))],
+        'lat': [a['lat'] for a in anchors] + rng.normal(0, 0.5, len(anchors)),
+        'lng': [a['lng'] for a in anchors] + rng.normal(0, 0.5, len(anchors)),
+        'state': [f"State {i % 30}" for i in range(len(anchors))]
+    })
+    station_index = app.SpatialIndex(station_points)
+    station_aqi = pd.Series(rng.uniform(20, 400, len(station_points)), index=station_points['name'])
+
+    def spatial_aggregate():
+        for level in app.SpatialIndex.LEVELS:
+            station_index.geojson(station_index.aggregate(station_aqi, level), level)
+
+    def alert_evaluation():
+        df = app.load_kaggle_data()
+        store = app.find_store(df)
+        cube = app.get_comparison_cube(store.granularity, False, store.version)
+        app.AlertEngine(app.load_rules(), state_path=':memory:').evaluate(cube.matrices)
+
+    def anomaly_detection():
+        df = app.load_kaggle_data()
+        AnomalyDetector().detect(df)
+
+    def predictions():
+        store = app.find_store(app.load_kaggle_data())
+        app.get_forecaster().predict(app.forecast_histories(store, cities))
+
+    def forecast_refresh():
+        store = app.find_store(app.load_kaggle_data())
+        forecaster = app.get_forecaster()
+        app.ForecastCache(':memory:').refresh(
+            store.clean_latest if hasattr(store, 'clean_latest') else store.latest,
+            forecaster.version, forecaster.horizon,
+            lambda rows: forecaster.predict(app.forecast_histories(store, rows.index))
+        )
+
+    def forecast_lookup():
+        df = app.load_kaggle_data(clean=True)
+        app.refresh_forecasts()
+        for city in cities:
+            latest = app.get_city_latest_data(df, city)
+            app.get_city_forecast(city, {'aqi': latest['aqi'], 'timestamp': latest['date']})
+
+    weather_cache = WeatherCache(':memory:')
+    locations = app.city_locations()
+
+    def weather_backfill_and_join():
+        # Backfilled once from the stub in the warmup run; timed runs must be pure cache hits
+        df = app.load_kaggle_data(clean=True)
+        store = app.find_store(df)
+        wanted = backfill_requests(store.aggregates['last_date'], locations, 365)
+        backfill(weather_cache, OpenWeatherSource(app.OPENWEATHER_BASE_URL), wanted)
+        enrich(df, locations, weather_cache)
+
+    def openweather_fetch():
+        for city in live_cities:
+            app.get_openweather_data(city, 'benchmark-key')
+
+    def narration_batch():
+        # Every city in every language, from the latest row per city
+        store = app.find_store(app.load_kaggle_data())
+        render_batch(store.latest, LANGUAGES)
+
+    def narration():
+        app.create_audio_narration("Delhi city air quality report. Current AQI is 180.", 'English')
+
+    return {
+        'load_kaggle_data_cold': (load_cold, 1),
+        'load_kaggle_data_restart_disk_cache': (load_restart, 1),
+        'load_kaggle_data_warm': (app.load_kaggle_data, 1),
+        'get_city_latest_data_all_cities': (latest_all, len(cities)),
+        'provider_resolve_cached': (provider_resolve, len(cities)),
+        'simulation_provider_fetch': (simulation_fetch, len(all_cities)),
+        'get_city_historical_data_30d': (historical(30), len(cities)),
+        'get_city_historical_data_365d': (historical(365), len(cities)),
+        'map_view_build': (map_build, 1),
+        'historical_aggregates': (historical_aggregates, len(cities)),
+        'comparison_cube_build': (comparison_cube, 1),
+        'comparison_statistics': (comparison_stats, 1),
+        'exposure_table_build': (exposure_build, 1),
+        'exposure_summary_cached': (exposure_lookup, len(cities)),
+        'trend_analysis_build': (trend_analysis, 1),
+        'spatial_aggregate_5k_stations': (spatial_aggregate, len(station_points)),
+        'alert_evaluation_all_cities': (alert_evaluation, len(all_cities)),
+        'anomaly_detection_all_rows': (anomaly_detection, 1),
+        'prediction_generation': (predictions, len(cities)),
+        'forecast_refresh_all_cities': (forecast_refresh, len(all_cities)),
+        'forecast_lookup_cached': (forecast_lookup, len(cities)),
+        'weather_backfill_cached_join': (weather_backfill_and_join, 1),
+        'openweather_fetch_stub': (openweather_fetch, len(live_cities)),
+        'narration_render_batch': (narration_batch, len(all_cities) * len(LANGUAGES)),
+        'audio_narration_stub': (narration, 1)
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Median ratio against the baseline per benchmark; returns the regressed names"""
+    regressions = []
+    if baseline.get('size') != results['size']:
+        print(f"Baseline size {baseline.get('size')} does not match {results['size']}; skipping comparison")
+        return regressions
+
+    print(f"\n{'benchmark':36} {'baseline':>11} {'current':>11} {'ratio':>7}")
+    for name, stats in results['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            continue
+        ratio = stats['median'] / base['median'] if base['median'] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        print(f"{name:36} {base['median'] * 1000:9.2f}ms {stats['median'] * 1000:9.2f}ms {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the air quality dashboard hot paths")
+    parser.add_argument('--size', choices=sorted(SIZES), default='30k')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, help="Timed iterations per benchmark")
+    parser.add_argument('--max-cities', type=int, default=100,
+                        help="Cities sampled for per-city benchmarks (all when fewer)")
+    parser.add_argument('--only', nargs='*', help="Run only these benchmarks")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--lazy', action='store_true', help="Query the partitioned dataset instead of loading it")
+    parser.add_argument('--output', help="Results JSON path")
+    parser.add_argument('--baseline', help="Baseline JSON to compare against")
+    parser.add_argument('--save-baseline', help="Also write the results to this baseline path")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Allowed slowdown before flagging")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    repeat = args.repeat or DEFAULT_REPEATS[args.size]
+    data_path = ensure_dataset(args.size, args.data_dir, seed=args.seed)
+    server, base_url = start_stub_server()
+    patch_gtts(base_url)
+    app = import_app(data_path, base_url, args.lazy)
+
+    df = app.load_kaggle_data()
+    all_cities = sorted(df['City'].unique())
+    cities = random.Random(args.seed).sample(all_cities, min(args.max_cities, len(all_cities)))
+    live_cities = cities[:10]
+
+    results = {
+        'size': args.size,
+        'rows': int(len(df)),
+        'cities': len(all_cities),
+        'sampled_cities': len(cities),
+        'lazy': args.lazy,
+        'seed': args.seed,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'pandas': app.pd.__version__,
+        'numpy': app.np.__version__,
+        'results': {}
+    }
+
+    for name, (func, operations) in build_cases(app, cities, live_cities, all_cities).items():
+        if args.only and name not in args.only:
+            continue
+        stats = measure(func, repeat)
+        stats['operations'] = operations
+        stats['per_operation'] = stats['median'] / operations
+        results['results'][name] = stats
+        print(f"{name:36} median {stats['median'] * 1000:9.2f}ms  ({stats['per_operation'] * 1000:.3f}ms/op)")
+
+    server.shutdown()
+
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"{args.size}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as fp:
+        json.dump(results, fp, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as fp:
+            json.dump(results, fp, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as fp:
+            baseline = json.load(fp)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
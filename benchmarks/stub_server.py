@@ -0,0 +1,196 @@
+"""
+Local stand-in for the OpenWeather (air pollution, geocoding and daily weather)
+and Google TTS endpoints used by app.py, plus an /alerts webhook receiver for
+the alerting sinks.
+
+Responses are deterministic for a given query, so benchmark and load-test runs
+never touch the network. Point the app at it with OPENWEATHER_BASE_URL and
+patch gTTS with patch_gtts().
+
+Usage:
+    python benchmarks/stub_server.py --port 8765
+"""
+import json
+import time
+import base64
+import zlib
+import math
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# A few hundred bytes standing in for an MP3 clip
+STUB_AUDIO = b'ID3' + bytes(509)
+
+# Simulated network latency in seconds, applied to every request
+DEFAULT_LATENCY = 0.0
+
+
+def _seed(text):
+    return zlib.crc32(text.encode('utf-8'))
+
+
+def _components(seed, hour=0):
+    base = (seed % 200) + 20 + 15 * ((hour % 24) / 24)
+    return {
+        'co': round(base * 6.1, 2), 'no': round(base * 0.05, 2),
+        'no2': round(base * 0.3, 2), 'o3': round(base * 0.4, 2),
+        'so2': round(base * 0.15, 2), 'pm2_5': round(base * 0.7, 2),
+        'pm10': round(base * 1.1, 2), 'nh3': round(base * 0.08, 2)
+    }
+
+
+def _aqi_index(components):
+    pm25 = components['pm2_5']
+    for index, limit in enumerate([10, 25, 50, 75], start=1):
+        if pm25 < limit:
+            return index
+    return 5
+
+
+def air_pollution_payload(lat, lon, hours=1, start=None):
+    """OpenWeather /air_pollution (hours=1) or /air_pollution/forecast payload"""
+    seed = _seed(f"{float(lat):.3f},{float(lon):.3f}")
+    start = int(start if start is not None else time.time()) // 3600 * 3600
+    items = []
+    for hour in range(hours):
+        components = _components(seed, hour)
+        items.append({
+            'dt': start + hour * 3600,
+            'main': {'aqi': _aqi_index(components)},
+            'components': components
+        })
+    return {'coord': {'lon': float(lon), 'lat': float(lat)}, 'list': items}
+
+
+def day_summary_payload(lat, lon, date):
+    """OpenWeather One Call /day_summary payload; seasonal temperature, wind and rain per location and day"""
+    seed = _seed(f"{float(lat):.2f},{float(lon):.2f},{date}")
+    day = (time.strptime(date, '%Y-%m-%d').tm_yday if date else 1) / 365.25
+    temp = 25 + 8 * math.sin(2 * math.pi * (day - 0.3)) + (seed % 50) / 10 - 2.5
+    spread = 6 + (seed // 50 % 80) / 10
+    return {
+        'lat': float(lat), 'lon': float(lon), 'date': date, 'units': 'metric',
+        'temperature': {'min': round(temp - spread / 2, 1), 'max': round(temp + spread / 2, 1)},
+        'humidity': {'afternoon': 30 + seed // 4000 % 60},
+        'wind': {'max': {'speed': round(0.5 + (seed // 240000 % 90) / 10, 1), 'direction': seed % 360}},
+        'pressure': {'afternoon': 1000 + seed // 7 % 20},
+        'cloud_cover': {'afternoon': seed // 11 % 100},
+        'precipitation': {'total': round(max(0.0, (seed // 13 % 100) - 80) / 4, 1)}
+    }
+
+
+def geocode_payload(query):
+    """OpenWeather /geo/1.0/direct payload with coordinates inside India"""
+    name = query.split(',')[0]
+    seed = _seed(name.lower())
+    return [{
+        'name': name,
+        'lat': 8 + (seed % 2400) / 100,
+        'lon': 69 + (seed // 2400 % 2500) / 100,
+        'country': 'IN'
+    }]
+
+
+def tts_payload():
+    """Google batchexecute response in the format gTTS parses"""
+    audio = base64.b64encode(STUB_AUDIO).decode('ascii')
+    return ")]}'\n\n" + f'[["wrb.fr","jQ1olc","[\\"{audio}\\"]",null,null,null,"generic"]]' + "\n"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = DEFAULT_LATENCY
+    # Alert batches POSTed to /alerts, newest last (GET /alerts returns them)
+    received_alerts = []
+    # Number of /day_summary requests served, so tests can check backfills hit the cache
+    weather_requests = [0]
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json'):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path == '/geo/1.0/direct':
+            self._send(200, geocode_payload(params.get('q', '')))
+        elif url.path == '/data/2.5/air_pollution':
+            self._send(200, air_pollution_payload(params.get('lat', 0), params.get('lon', 0)))
+        elif url.path == '/data/2.5/air_pollution/forecast':
+            self._send(200, air_pollution_payload(params.get('lat', 0), params.get('lon', 0), hours=96))
+        elif url.path == '/alerts':
+            self._send(200, {'alerts': self.received_alerts})
+        elif url.path == '/data/3.0/onecall/day_summary':
+            self.weather_requests[0] += 1
+            self._send(200, day_summary_payload(params.get('lat', 0), params.get('lon', 0), params.get('date', '')))
+        elif url.path == '/data/2.5/air_pollution/history':
+            start = int(params.get('start', time.time()))
+            end = int(params.get('end', start + 3600))
+            hours = max(1, (end - start) // 3600)
+            self._send(200, air_pollution_payload(params.get('lat', 0), params.get('lon', 0), hours, start))
+        else:
+            self._send(404, {'cod': 404, 'message': 'not found'})
+
+    def do_POST(self):
+        if self.latency:
+            time.sleep(self.latency)
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        path = urlparse(self.path).path
+        if path.endswith('/batchexecute'):
+            self._send(200, tts_payload(), content_type='application/json; charset=utf-8')
+        elif path == '/alerts':
+            self.received_alerts.extend(json.loads(body or b'{}').get('alerts', []))
+            self._send(200, {'received': len(self.received_alerts)})
+        else:
+            self._send(404, {'cod': 404, 'message': 'not found'})
+
+
+def start_stub_server(host='127.0.0.1', port=0, latency=DEFAULT_LATENCY):
+    """Start the stub in a daemon thread; returns (server, base_url)"""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {
+        'latency': latency, 'received_alerts': [], 'weather_requests': [0]
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def patch_gtts(base_url):
+    """Redirect gTTS requests to the stub server"""
+    import gtts.tts
+    gtts.tts._translate_url = lambda tld='com', path='': f"{base_url}/{path}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the OpenWeather/gTTS stub server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY, help="Seconds added to each response")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.host, args.port, args.latency)
+    print(f"Stub server listening on {base_url} (set OPENWEATHER_BASE_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
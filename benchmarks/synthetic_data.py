@@ -0,0 +1,206 @@
+"""
+Synthetic city_day.csv generator for benchmarks.
+
+Produces files with the same schema as the Kaggle dataset at fixed sizes.
+Rows are written city by city in chunks, so the 10M file never has to fit in memory.
+
+Usage:
+    python benchmarks/synthetic_data.py --size 1m --output benchmarks/data/city_day_1m.csv
+    python benchmarks/synthetic_data.py --output benchmarks/data/station_hour.csv --stations benchmarks/data/stations.csv
+"""
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+# Named dataset sizes used by the benchmark suite
+SIZES = {
+    '30k': 30_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000
+}
+
+# Cities from the real dataset; larger sizes add numbered synthetic cities
+BASE_CITIES = [
+    'Ahmedabad', 'Aizawl', 'Amaravati', 'Amritsar', 'Bengaluru', 'Bhopal',
+    'Brajrajnagar', 'Chandigarh', 'Chennai', 'Coimbatore', 'Delhi', 'Ernakulam',
+    'Gurugram', 'Guwahati', 'Hyderabad', 'Jaipur', 'Jorapokhar', 'Kochi',
+    'Kolkata', 'Lucknow', 'Mumbai', 'Patna', 'Shillong', 'Talcher',
+    'Thiruvananthapuram', 'Visakhapatnam'
+]
+
+COLUMNS = [
+    'City', 'Date', 'PM2.5', 'PM10', 'NO', 'NO2', 'NOx', 'NH3', 'CO', 'SO2',
+    'O3', 'Benzene', 'Toluene', 'Xylene', 'AQI', 'AQI_Bucket'
+]
+
+# Typical daily mean and spread per pollutant
+POLLUTANT_PROFILES = {
+    'PM2.5': (65, 40), 'PM10': (120, 60), 'NO': (17, 15), 'NO2': (28, 18),
+    'NOx': (32, 25), 'NH3': (23, 20), 'CO': (2.2, 3.0), 'SO2': (14, 12),
+    'O3': (34, 20), 'Benzene': (3.3, 4.0), 'Toluene': (8.7, 10.0), 'Xylene': (3.1, 4.0)
+}
+
+AQI_BUCKETS = [
+    (50, 'Good'), (100, 'Satisfactory'), (200, 'Moderate'),
+    (300, 'Poor'), (400, 'Very Poor'), (np.inf, 'Severe')
+]
+
+# Daily rows per city, matching the ~2000 days of the real dataset
+DAYS_PER_CITY = 2000
+START_DATE = '2015-01-01'
+
+
+def city_names(num_cities):
+    """Real city names first, then City_0027, City_0028, ..."""
+    names = BASE_CITIES[:num_cities]
+    names += [f"City_{i:04d}" for i in range(len(names) + 1, num_cities + 1)]
+    return names
+
+
+def city_layout(rows):
+    """Number of cities and days per city for a target row count"""
+    num_cities = max(len(BASE_CITIES), int(np.ceil(rows / DAYS_PER_CITY)))
+    days = int(np.ceil(rows / num_cities))
+    return num_cities, days
+
+
+def aqi_bucket(aqi):
+    """Vectorized AQI_Bucket labels (NaN AQI gives an empty bucket)"""
+    bounds = np.array([b for b, _ in AQI_BUCKETS])
+    labels = np.array([label for _, label in AQI_BUCKETS] + [''], dtype=object)
+    idx = np.searchsorted(bounds, aqi, side='left')
+    idx = np.where(np.isnan(aqi), len(AQI_BUCKETS), idx)
+    return labels[idx]
+
+
+def generate_city_frame(city, dates, rng, missing_rate=0.08):
+    """One city's daily rows with seasonal cycles, noise and gaps"""
+    n = len(dates)
+    day_of_year = dates.dayofyear.to_numpy()
+    # Winter peak, monsoon trough
+    seasonal = 1 + 0.45 * np.cos(2 * np.pi * (day_of_year - 15) / 365.25)
+    city_factor = rng.uniform(0.5, 1.6)
+
+    data = {'City': np.full(n, city, dtype=object), 'Date': dates.strftime('%Y-%m-%d')}
+    for pollutant, (mean, spread) in POLLUTANT_PROFILES.items():
+        values = mean * city_factor * seasonal + rng.normal(0, spread, n)
+        values = np.round(np.clip(values, 0, None), 2)
+        values[rng.random(n) < missing_rate] = np.nan
+        data[pollutant] = values
+
+    aqi = np.round(np.clip(
+        1.1 * np.nan_to_num(data['PM2.5'], nan=65) + 0.35 * np.nan_to_num(data['PM10'], nan=120)
+        + rng.normal(0, 15, n), 10, 900
+    ))
+    aqi[rng.random(n) < missing_rate] = np.nan
+    data['AQI'] = aqi
+    data['AQI_Bucket'] = aqi_bucket(aqi)
+    return pd.DataFrame(data, columns=COLUMNS)
+
+
+def generate_csv(path, rows, seed=42):
+    """Write a synthetic city_day.csv with about the requested number of rows"""
+    rng = np.random.default_rng(seed)
+    num_cities, days = city_layout(rows)
+    dates = pd.date_range(START_DATE, periods=days, freq='D')
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    written = 0
+    with open(path, 'w', encoding='utf-8', newline='') as fp:
+        fp.write(','.join(COLUMNS) + '\n')
+        for city in city_names(num_cities):
+            take = min(days, rows - written)
+            if take <= 0:
+                break
+            frame = generate_city_frame(city, dates[:take], rng)
+            frame.to_csv(fp, header=False, index=False)
+            written += take
+    return written
+
+
+def generate_station_files(station_hour_path, stations_path, num_cities=len(BASE_CITIES),
+                           stations_per_city=3, days=90, seed=42, missing_rate=0.08):
+    """
+    Write a synthetic station_hour.csv and stations.csv pair (Kaggle schema).
+    Returns the number of hourly rows written.
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(START_DATE, periods=days * 24, freq='h')
+    hour = times.hour.to_numpy()
+    # Morning and evening traffic peaks on top of the seasonal cycle
+    diurnal = 1 + 0.25 * np.cos(2 * np.pi * (hour - 9) / 24) + 0.15 * np.cos(2 * np.pi * (hour - 20) / 12)
+    seasonal = 1 + 0.45 * np.cos(2 * np.pi * (times.dayofyear.to_numpy() - 15) / 365.25)
+
+    stations = []
+    for city in city_names(num_cities):
+        prefix = ''.join(ch for ch in city.upper() if ch.isalpha())[:2]
+        for i in range(1, stations_per_city + 1):
+            stations.append({
+                'StationId': f"{prefix}{len(stations) + 1:03d}",
+                'StationName': f"{city} Station {i}",
+                'City': city,
+                'State': 'Synthetic',
+                'Status': 'Active'
+            })
+    os.makedirs(os.path.dirname(os.path.abspath(stations_path)), exist_ok=True)
+    pd.DataFrame(stations).to_csv(stations_path, index=False)
+
+    columns = ['StationId', 'Datetime'] + COLUMNS[2:]
+    written = 0
+    os.makedirs(os.path.dirname(os.path.abspath(station_hour_path)), exist_ok=True)
+    with open(station_hour_path, 'w', encoding='utf-8', newline='') as fp:
+        fp.write(','.join(columns) + '\n')
+        for station in stations:
+            n = len(times)
+            factor = rng.uniform(0.5, 1.6)
+            data = {'StationId': np.full(n, station['StationId'], dtype=object),
+                    'Datetime': times.strftime('%Y-%m-%d %H:%M:%S')}
+            for pollutant, (mean, spread) in POLLUTANT_PROFILES.items():
+                values = mean * factor * seasonal * diurnal + rng.normal(0, spread, n)
+                values = np.round(np.clip(values, 0, None), 2)
+                values[rng.random(n) < missing_rate] = np.nan
+                data[pollutant] = values
+            aqi = np.round(np.clip(
+                1.1 * np.nan_to_num(data['PM2.5'], nan=65) + 0.35 * np.nan_to_num(data['PM10'], nan=120)
+                + rng.normal(0, 15, n), 10, 900
+            ))
+            aqi[rng.random(n) < missing_rate] = np.nan
+            data['AQI'] = aqi
+            data['AQI_Bucket'] = aqi_bucket(aqi)
+            pd.DataFrame(data, columns=columns).to_csv(fp, header=False, index=False)
+            written += n
+    return written
+
+
+def ensure_dataset(size, data_dir, seed=42):
+    """Return the path of the synthetic dataset for a named size, generating it once"""
+    rows = SIZES[size]
+    path = os.path.join(data_dir, f"city_day_{size}_seed{seed}.csv")
+    if not os.path.exists(path):
+        generate_csv(path, rows, seed=seed)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic city_day.csv")
+    parser.add_argument('--size', choices=sorted(SIZES), default='30k')
+    parser.add_argument('--rows', type=int, help="Exact row count (overrides --size)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--stations', help="Also write a station_hour.csv to --output and stations.csv here")
+    parser.add_argument('--days', type=int, default=90, help="Days of hourly station data")
+    args = parser.parse_args()
+
+    if args.stations:
+        written = generate_station_files(args.output, args.stations, days=args.days, seed=args.seed)
+        print(f"Wrote {written:,} hourly station rows to {args.output} and stations to {args.stations}")
+        return
+
+    rows = args.rows or SIZES[args.size]
+    written = generate_csv(args.output, rows, seed=args.seed)
+    print(f"Wrote {written:,} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+from data_quality import POLLUTANT_LIMITS
+from rollups import PERIODS_PER_DAY
+
+# Columns held in the comparison cube
+COMPARISON_COLUMNS = ['AQI'] + list(POLLUTANT_LIMITS)
+
+# Lazy (larger than RAM) stores only contribute this many recent days to the cube
+LAZY_WINDOW_DAYS = 730
+
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+class ComparisonCube:
+    """
+    One date x city matrix per pollutant, so every cross-city statistic is a
+    single vectorized operation over the matrix instead of a per-city loop.
+    Rows are periods at the store's granularity, oldest first.
+    """
+
+    def __init__(self, matrices, granularity='daily'):
+        self.matrices = matrices
+        self.granularity = granularity
+        self.cities = list(matrices['AQI'].columns) if 'AQI' in matrices else []
+
+    @classmethod
+    def from_store(cls, store, clean=False, columns=COMPARISON_COLUMNS):
+        """Pivot a store's rows (all cities at once) into the per-pollutant matrices"""
+        start = None
+        if hasattr(store, 'dataset') and len(store.aggregates):
+            start = store.aggregates['last_date'].max() - pd.Timedelta(days=LAZY_WINDOW_DAYS)
+        frames = list(store.scan(['City', 'Date'] + columns, start=start, clean=clean))
+        frame = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        frame = frame.drop_duplicates(['City', 'Date'], keep='last')
+        wide = frame.pivot(index='Date', columns='City', values=columns).sort_index()
+        matrices = {column: wide[column].astype('float64') for column in columns}
+        return cls(matrices, store.granularity)
+
+    def window(self, column, days=None, cities=None):
+        """Matrix for the last `days` days (all rows when None), restricted to cities"""
+        matrix = self.matrices[column]
+        if cities is not None:
+            matrix = matrix[[c for c in cities if c in matrix.columns]]
+        if days is not None:
+            periods = max(1, int(np.ceil(days * PERIODS_PER_DAY[self.granularity])))
+            matrix = matrix.iloc[-periods:]
+        return matrix
+
+    def rankings(self, days=None, cities=None):
+        """Per-city AQI statistics over the window, ranked worst (1) to best"""
+        aqi = self.window('AQI', days, cities)
+        latest = aqi.ffill().iloc[-1] if len(aqi) else pd.Series(np.nan, index=aqi.columns)
+        table = pd.DataFrame({
+            'Mean AQI': aqi.mean(),
+            'Median AQI': aqi.median(),
+            'Max AQI': aqi.max(),
+            'Latest AQI': latest,
+            'Periods > 200': (aqi > 200).sum(),
+            'Coverage %': aqi.notna().mean() * 100
+        })
+        table['Rank'] = table['Mean AQI'].rank(ascending=False, method='min')
+        table.index.name = 'City'
+        return table.sort_values('Rank')
+
+    def correlation(self, days=None, cities=None, column='AQI', min_periods=30):
+        """Pairwise correlation of the cities' series (only periods both cities have)"""
+        matrix = self.window(column, days, cities)
+        return matrix.corr(min_periods=min(min_periods, max(len(matrix) // 2, 2)))
+
+    def exceedances(self, days=None, cities=None, limits=POLLUTANT_LIMITS):
+        """Number of periods each city's pollutant mean was above its limit"""
+        counts = {
+            pollutant: (self.window(pollutant, days, cities) > limit).sum()
+            for pollutant, limit in limits.items() if pollutant in self.matrices
+        }
+        table = pd.DataFrame(counts)
+        table.index.name = 'City'
+        return table
+
+    def seasonal_profile(self, cities=None, column='AQI'):
+        """Mean per calendar month and city (month x city)"""
+        matrix = self.window(column, None, cities)
+        profile = matrix.groupby(matrix.index.month).mean()
+        profile = profile.reindex(range(1, 13))
+        profile.index = MONTH_NAMES
+        return profile
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+# Pollutant and AQI columns that get imputed
+IMPUTE_COLUMNS = [
+    'PM2.5', 'PM10', 'NO', 'NO2', 'NOx', 'NH3', 'CO', 'SO2',
+    'O3', 'Benzene', 'Toluene', 'Xylene', 'AQI'
+]
+
+# Gaps up to this many days are interpolated linearly in time; longer gaps use seasonal fills
+MAX_INTERPOLATION_GAP_DAYS = 7
+
+# AQI bands used for AQI_Bucket labels (same bands as the OpenWeather conversion in app.py)
+AQI_BUCKET_BOUNDS = [50, 100, 200, 300, 400]
+AQI_BUCKET_LABELS = ['Good', 'Satisfactory', 'Moderate', 'Poor', 'Very Poor', 'Severe']
+
+# Safety limits per pollutant (Indian NAAQS values) used by the real-time and comparison views
+POLLUTANT_LIMITS = {'PM2.5': 60, 'PM10': 100, 'NO2': 80, 'SO2': 80, 'CO': 4, 'O3': 180}
+POLLUTANT_UNITS = {'PM2.5': 'µg/m³', 'PM10': 'µg/m³', 'NO2': 'µg/m³', 'SO2': 'µg/m³', 'CO': 'mg/m³', 'O3': 'µg/m³'}
+
+# Per-cell quality flags
+OBSERVED = 0
+INTERPOLATED = 1
+SEASONAL_FILL = 2
+MISSING = 3
+
+
+def aqi_bucket(aqi):
+    """Vectorized AQI_Bucket labels; NaN AQI gives NaN"""
+    aqi = np.asarray(aqi, dtype='float64')
+    labels = np.array(AQI_BUCKET_LABELS, dtype=object)[np.searchsorted(AQI_BUCKET_BOUNDS, aqi, side='left')]
+    labels[np.isnan(aqi)] = np.nan
+    return labels
+
+
+def _impute_column(values, city, days, month, max_gap):
+    """Fill one column of a (City, Date)-sorted frame; returns (filled, flags)"""
+    observed = ~np.isnan(values)
+    known = pd.DataFrame({
+        'city': city,
+        't': np.where(observed, days, np.nan),
+        'v': values
+    })
+    grouped = known.groupby('city', sort=False)[['t', 'v']]
+    prev = grouped.ffill()
+    nxt = grouped.bfill()
+
+    # Linear interpolation in time between the nearest observations of the same city
+    gap = (nxt['t'] - prev['t']).to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frac = (days - prev['t'].to_numpy()) / gap
+        interpolated = prev['v'].to_numpy() + (nxt['v'].to_numpy() - prev['v'].to_numpy()) * frac
+    use_interpolation = ~observed & (gap <= max_gap) & ~np.isnan(interpolated)
+
+    filled = np.where(observed, values, np.where(use_interpolation, interpolated, np.nan))
+
+    # Seasonal fill: the city's median for that calendar month
+    seasonal = pd.Series(values).groupby([city, month]).transform('median').to_numpy()
+    use_seasonal = np.isnan(filled) & ~np.isnan(seasonal)
+    filled[use_seasonal] = seasonal[use_seasonal]
+
+    flags = np.select(
+        [observed, use_interpolation, use_seasonal],
+        [OBSERVED, INTERPOLATED, SEASONAL_FILL],
+        MISSING
+    ).astype(np.int8)
+    return filled, flags
+
+
+def city_date_order(frame):
+    """(city codes, positions sorted by (City, Date), inverse of that sort)"""
+    codes, _ = pd.factorize(frame['City'])
+    order = np.lexsort((frame['Date'].to_numpy(), codes))
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    return codes, order, inverse
+
+
+def impute_city_day(frame, columns=IMPUTE_COLUMNS, max_gap_days=MAX_INTERPOLATION_GAP_DAYS, exclude=None):
+    """
+    Impute gaps per city and pollutant and flag every cell.
+    Returns (clean, flags): clean has the frame's rows and index with imputed values,
+    flags holds one int8 column per imputed column (OBSERVED ... MISSING).
+    Non-zero cells of exclude (e.g. anomaly flags) are treated as gaps.
+    """
+    columns = [c for c in columns if c in frame.columns]
+    codes, order, inverse = city_date_order(frame)
+    dates = frame['Date'].to_numpy()
+
+    sorted_dates = pd.DatetimeIndex(dates[order])
+    days = ((sorted_dates - sorted_dates.min()) / pd.Timedelta(days=1)).to_numpy(dtype='float64') if len(order) else np.empty(0)
+    month = sorted_dates.month.to_numpy()
+    city = codes[order]
+
+    clean = frame.copy(deep=False)
+    flags = pd.DataFrame(index=frame.index)
+    for column in columns:
+        values = frame[column].to_numpy(dtype='float64')[order]
+        if exclude is not None and column in exclude:
+            values[exclude[column].to_numpy()[order] != 0] = np.nan
+        filled, column_flags = _impute_column(values, city, days, month, max_gap_days)
+        clean[column] = filled[inverse]
+        flags[column] = column_flags[inverse]
+
+    # Re-derive the bucket where AQI itself was imputed
+    if 'AQI' in columns and 'AQI_Bucket' in frame.columns:
+        imputed_aqi = (flags['AQI'] != OBSERVED).to_numpy()
+        if imputed_aqi.any():
+            bucket = frame['AQI_Bucket'].astype(object).to_numpy(copy=True)
+            bucket[imputed_aqi] = aqi_bucket(clean['AQI'].to_numpy()[imputed_aqi])
+            clean['AQI_Bucket'] = pd.array(bucket, dtype=frame['AQI_Bucket'].dtype)
+
+    return clean, flags
+
@@ -0,0 +1,863 @@
+import os
+import time
+import hashlib
+import shutil
+import threading
+import weakref
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from data_quality import aqi_bucket, impute_city_day
+from anomaly import AnomalyDetector
+
+# Columnar copies of the CSV live here and are memory-mapped by every worker process
+CACHE_DIR = os.environ.get('AQ_CACHE_DIR', '.aq_cache')
+
+# Explicit dtypes for city_day.csv so parsing never has to infer them
+CITY_DAY_DTYPES = {
+    'City': 'string',
+    'PM2.5': 'float64', 'PM10': 'float64', 'NO': 'float64', 'NO2': 'float64',
+    'NOx': 'float64', 'NH3': 'float64', 'CO': 'float64', 'SO2': 'float64',
+    'O3': 'float64', 'Benzene': 'float64', 'Toluene': 'float64', 'Xylene': 'float64',
+    'AQI': 'float64', 'AQI_Bucket': 'string'
+}
+
+
+def read_city_day_csv(path):
+    """Parse city_day.csv with the explicit dtype map"""
+    df = pd.read_csv(path, dtype=CITY_DAY_DTYPES)
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
+
+def source_key(path):
+    """
+    Short hash of a source file's absolute path, size and mtime. Cache files are
+    named with it, so two CSVs with the same name in different folders never share
+    a cache, and a replaced CSV never reuses the previous file's.
+    """
+    stat = os.stat(path)
+    identity = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()[:12]
+
+
+def _path_name(path):
+    """<basename>-<hash of the absolute path>: the same for every version of a source file"""
+    path_hash = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:8]
+    return f"{os.path.splitext(os.path.basename(path))[0]}-{path_hash}"
+
+
+def _cache_family(path):
+    """Prefix shared by the caches of every version of a source file"""
+    return f"{_path_name(path)}-"
+
+
+def cache_name(path):
+    """<basename>-<path hash>-<size and mtime hash> prefix of the cache files derived from a source file"""
+    stat = os.stat(path)
+    version = hashlib.sha1(f"{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8')).hexdigest()[:8]
+    return f"{_cache_family(path)}{version}"
+
+
+def prune_cache(path, cache_dir=CACHE_DIR, keep=None):
+    """
+    Remove the cache files and datasets of earlier versions of a source file (same
+    path, another size or mtime). Entries starting with `keep` (default: the current
+    cache_name) stay. Processes still mapping a removed file keep their view of it.
+    """
+    family, keep = _cache_family(path), keep or cache_name(path)
+    if not os.path.isdir(cache_dir):
+        return []
+    removed = []
+    for name in os.listdir(cache_dir):
+        if name.startswith(family) and not name.startswith(keep):
+            entry = os.path.join(cache_dir, name)
+            try:
+                if os.path.isdir(entry):
+                    shutil.rmtree(entry)
+                else:
+                    os.remove(entry)
+                removed.append(name)
+            except OSError:
+                pass  # In use (e.g. on Windows) or already removed by another process
+    return removed
+
+
+def _arrow_cache_path(csv_path, cache_dir):
+    return os.path.join(cache_dir, f"{cache_name(csv_path)}.arrow")
+
+
+def frame_to_table(df):
+    """
+    Arrow table for a city_day frame. Float columns keep NaN as a value instead of
+    a null bitmap, so converting back to pandas is zero-copy.
+    """
+    arrays = []
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_float_dtype(values):
+            arrays.append(pa.array(values.to_numpy(dtype='float64'), from_pandas=False))
+        else:
+            arrays.append(pa.array(values, from_pandas=True))
+    return pa.Table.from_arrays(arrays, names=list(df.columns))
+
+
+def write_arrow(table, path):
+    """Write an Arrow IPC file atomically (readers never see a partial file)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_arrow_mmap(path):
+    """Memory-map an Arrow IPC file; pages are shared by all processes reading it"""
+    source = pa.memory_map(path, 'r')
+    return pa.ipc.open_file(source).read_all()
+
+
+def table_to_frame(table):
+    """
+    Read-only pandas view over an Arrow table. Numeric and date columns point
+    straight into the (memory-mapped) Arrow buffers and cannot be written to.
+    """
+    return table.to_pandas(split_blocks=True, self_destruct=False)
+
+
+def load_shared_table(csv_path, cache_dir=CACHE_DIR):
+    """
+    Load city_day.csv through a memory-mapped Arrow cache.
+    The CSV is parsed only when there is no cache for this file, size and mtime;
+    building one removes the caches of the file's earlier versions.
+    """
+    arrow_path = _arrow_cache_path(csv_path, cache_dir)
+
+    if not os.path.exists(arrow_path):
+        table = frame_to_table(read_city_day_csv(csv_path))
+        try:
+            write_arrow(table, arrow_path)
+        except OSError:
+            # Read-only deployments still work, just without the shared cache
+            return table
+        prune_cache(csv_path, cache_dir)
+
+    return read_arrow_mmap(arrow_path)
+
+
+def _clean_cache_path(csv_path, cache_dir):
+    return os.path.join(cache_dir, f"{cache_name(csv_path)}.clean.arrow")
+
+
+def clean_city_day(frame, detector):
+    """Anomaly flags of frame, then the gap-filled frame (flagged cells count as gaps) and its quality flags"""
+    anomalies = detector.detect(frame)
+    clean, flags = impute_city_day(frame, exclude=anomalies)
+    return clean, flags, anomalies
+
+
+def load_clean_frame(frame, clean_path, sources=(), detector=None):
+    """
+    Cleaned copy of frame plus its quality and anomaly flags, cached at clean_path.
+    The cache is rebuilt when any of the source files is newer, the row count changed
+    or it was built with another anomaly method. Flags are stored as 'flag:<column>'
+    and 'anomaly:<column>' int8 columns.
+    """
+    detector = detector or AnomalyDetector()
+    newest = max((os.path.getmtime(p) for p in sources if os.path.exists(p)), default=0)
+    if os.path.exists(clean_path) and os.path.getmtime(clean_path) >= newest:
+        table = read_arrow_mmap(clean_path)
+        method = (table.schema.metadata or {}).get(b'anomaly_method', b'').decode()
+        if table.num_rows == len(frame) and method == detector.method:
+            cached = table_to_frame(table)
+            flag_columns = [c for c in cached.columns if c.startswith('flag:')]
+            anomaly_columns = [c for c in cached.columns if c.startswith('anomaly:')]
+            flags = cached[flag_columns].rename(columns=lambda c: c[len('flag:'):])
+            anomalies = cached[anomaly_columns].rename(columns=lambda c: c[len('anomaly:'):])
+            return cached.drop(columns=flag_columns + anomaly_columns), flags, anomalies
+
+    clean, flags, anomalies = clean_city_day(frame, detector)
+    table = frame_to_table(clean.join(flags.add_prefix('flag:')).join(anomalies.add_prefix('anomaly:')))
+    try:
+        write_arrow(table.replace_schema_metadata({'anomaly_method': detector.method}), clean_path)
+    except OSError:
+        pass
+    return clean, flags, anomalies
+
+
+FLOAT_COLUMNS = [c for c, dtype in CITY_DAY_DTYPES.items() if dtype == 'float64']
+CITY_DAY_COLUMNS = ['City', 'Date'] + FLOAT_COLUMNS + ['AQI_Bucket']
+
+# New CSV files dropped here are appended to the running dashboard's store
+DROP_DIR = os.environ.get('AQ_DROP_DIR', os.path.join('data', 'incoming'))
+
+# Appended rows are kept here, named after the CSV's path only, so they outlive cache rebuilds
+APPEND_DIR = os.environ.get('AQ_APPEND_DIR', os.path.join('data', 'appended'))
+
+# Column types of the partitioned dataset written by the streaming loader
+CITY_DAY_SCHEMA = pa.schema(
+    [('City', pa.string()), ('Date', pa.timestamp('ns'))]
+    + [(c, pa.float64()) for c in FLOAT_COLUMNS]
+    + [('AQI_Bucket', pa.string())]
+)
+
+# Rows parsed per chunk by the streaming loader; peak memory follows this, not the file size
+CHUNK_ROWS = int(os.environ.get('AQ_CHUNK_ROWS', 250_000))
+
+# CSVs larger than this are served lazily from the partitioned dataset (AQ_LAZY_DATA=1/0 forces it)
+LAZY_THRESHOLD_BYTES = int(os.environ.get('AQ_LAZY_THRESHOLD_MB', 1024)) * 1024 * 1024
+
+# Per-city index files kept inside the dataset directory (the leading underscore hides them from scans)
+LATEST_FILE = '_latest.arrow'
+AGGREGATES_FILE = '_aggregates.arrow'
+
+
+def validate_rows(rows):
+    """
+    Check and normalise new city_day rows.
+    Returns (valid, rejected); rejected keeps the original columns plus a 'reason'.
+    """
+    missing = [c for c in ('City', 'Date') if c not in rows.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    clean = pd.DataFrame(index=rows.index)
+    clean['City'] = rows['City'].astype('string').str.strip()
+    clean['Date'] = pd.to_datetime(rows['Date'], errors='coerce')
+    for column in FLOAT_COLUMNS:
+        if column in rows.columns:
+            clean[column] = pd.to_numeric(rows[column], errors='coerce').astype('float64')
+        else:
+            clean[column] = np.nan
+
+    bucket = rows['AQI_Bucket'].astype('string') if 'AQI_Bucket' in rows.columns else pd.Series(pd.NA, index=rows.index, dtype='string')
+    computed = pd.Series(aqi_bucket(clean['AQI'].to_numpy()), index=rows.index, dtype='string')
+    clean['AQI_Bucket'] = bucket.fillna(computed)
+
+    reason = pd.Series('', index=rows.index, dtype=object)
+    reason[clean.duplicated(['City', 'Date'], keep='last')] = 'duplicate row in batch'
+    reason[(clean[FLOAT_COLUMNS] < 0).any(axis=1)] = 'negative value'
+    reason[clean['Date'].isna()] = 'invalid date'
+    reason[clean['City'].isna() | (clean['City'] == '')] = 'missing city'
+
+    ok = reason == ''
+    rejected = rows[~ok].copy()
+    rejected['reason'] = reason[~ok]
+    return clean.loc[ok, CITY_DAY_COLUMNS].reset_index(drop=True), rejected
+
+
+def _combine_aggregates(aggregates, new):
+    """Fold per-city aggregates of new rows into existing ones (either may be None)"""
+    if aggregates is None:
+        return new
+    old = aggregates.reindex(new.index)
+    combined = pd.DataFrame({
+        'rows': old['rows'].fillna(0) + new['rows'],
+        'aqi_count': old['aqi_count'].fillna(0) + new['aqi_count'],
+        'aqi_sum': old['aqi_sum'].fillna(0) + new['aqi_sum'],
+        'aqi_max': np.fmax(old['aqi_max'], new['aqi_max']),
+        'aqi_min': np.fmin(old['aqi_min'], new['aqi_min']),
+        'first_date': pd.concat([old['first_date'], new['first_date']], axis=1).min(axis=1),
+        'last_date': pd.concat([old['last_date'], new['last_date']], axis=1).max(axis=1)
+    })
+    return pd.concat([aggregates.drop(new.index, errors='ignore'), combined])
+
+
+def _combine_latest(latest, rows):
+    """Latest row per city across a running latest table and new rows; later rows win date ties"""
+    candidates = rows if latest is None else pd.concat([latest, rows], ignore_index=True)
+    candidates = candidates.dropna(subset=['Date']).sort_values('Date', kind='stable')
+    return candidates.groupby('City', sort=False).tail(1).reset_index(drop=True)
+
+
+# Every open store, so lookups can find the indexes behind a frame without a cache call
+_open_stores = weakref.WeakSet()
+
+
+def find_store(frame):
+    """The store whose current raw or gap-filled frame is this exact object, or None"""
+    for store in list(_open_stores):
+        if store.frame is frame or store.clean is frame:
+            return store
+    return None
+
+
+class CityDayStore:
+    """
+    Columnar city_day store shared by every session in the process.
+
+    Holds the read-only frame plus indexes kept up to date on append:
+    city_rows (row positions per city, in date order), latest (last row per
+    city) and aggregates (per-city counts and AQI statistics). clean is the
+    gap-filled frame (same rows and positions) with quality_flags per cell;
+    cells in anomaly_flags (sensor faults) are removed before gap filling.
+    granularity says what one row covers ('hourly', 'daily' or 'monthly').
+    version increases with every append so derived caches can key on it.
+    """
+
+    def __init__(self, frame, csv_path=None, cache_dir=CACHE_DIR, schema=None, clean=None, quality_flags=None,
+                 granularity='daily', anomaly_flags=None, detector=None, append_dir=APPEND_DIR):
+        self.frame = frame
+        self.granularity = granularity
+        self.anomaly_detector = detector or AnomalyDetector()
+        if clean is None:
+            clean, quality_flags, anomaly_flags = clean_city_day(frame, self.anomaly_detector)
+        self.clean = clean
+        self.quality_flags = quality_flags
+        self.anomaly_flags = anomaly_flags
+        self.csv_path = csv_path
+        self.cache_dir = cache_dir
+        self.append_dir = append_dir
+        self.schema = schema
+        self.version = 0
+        self._lock = threading.RLock()
+        self._build_indexes()
+        _open_stores.add(self)
+
+    @classmethod
+    def open(cls, csv_path, cache_dir=CACHE_DIR, append_dir=APPEND_DIR):
+        """
+        Memory-map the CSV's Arrow cache and the parts appended to this CSV. Parts
+        live in append_dir, outside the cache, so a rebuilt cache (new size or
+        mtime) still gets every appended row. A (City, Date) that the CSV has since
+        gained keeps the CSV's values.
+        """
+        base = load_shared_table(csv_path, cache_dir)
+        parts = _part_paths(csv_path, append_dir)
+        if parts:
+            tables = [base] + [read_arrow_mmap(p).cast(base.schema) for p in parts]
+            frame = table_to_frame(pa.concat_tables(tables))
+            frame = frame.drop_duplicates(['City', 'Date'], keep='first').reset_index(drop=True)
+        else:
+            frame = table_to_frame(base)
+        sources = [csv_path, _arrow_cache_path(csv_path, cache_dir)] + parts
+        detector = AnomalyDetector()
+        clean, flags, anomalies = load_clean_frame(frame, _clean_cache_path(csv_path, cache_dir), sources, detector)
+        return cls(frame, csv_path, cache_dir, base.schema, clean, flags, anomaly_flags=anomalies, detector=detector,
+                   append_dir=append_dir)
+
+    # Index construction
+    def _build_indexes(self):
+        codes, cities = pd.factorize(self.frame['City'])
+        dates = self.frame['Date'].to_numpy()
+        order = np.lexsort((dates, codes))
+        valid = order[codes[order] >= 0]
+        bounds = np.flatnonzero(np.diff(codes[valid])) + 1
+        self.city_rows = {
+            cities[codes[group[0]]]: group
+            for group in np.split(valid, bounds) if len(group)
+        }
+        self.latest = self._latest_rows(self.frame, self.city_rows)
+        self.clean_latest = self._latest_rows(self.clean, self.city_rows)
+        self.aggregates = self._aggregate(self.frame)
+
+    @staticmethod
+    def _latest_rows(frame, city_rows):
+        positions = [rows[-1] for rows in city_rows.values()]
+        latest = frame.iloc[positions]
+        return latest.set_index('City', drop=False)
+
+    @staticmethod
+    def _aggregate(frame):
+        grouped = frame.groupby('City', sort=False)
+        return pd.DataFrame({
+            'rows': grouped.size(),
+            'aqi_count': grouped['AQI'].count(),
+            'aqi_sum': grouped['AQI'].sum(),
+            'aqi_max': grouped['AQI'].max(),
+            'aqi_min': grouped['AQI'].min(),
+            'first_date': grouped['Date'].min(),
+            'last_date': grouped['Date'].max()
+        })
+
+    # Lookups
+    def cities(self):
+        return sorted(self.city_rows)
+
+    def latest_row(self, city, clean=False):
+        if city not in self.city_rows:
+            return None
+        return (self.clean_latest if clean else self.latest).loc[city]
+
+    def latest_flags(self, city):
+        """Quality flags of the city's latest row, keyed by column"""
+        rows = self.city_rows.get(city)
+        if rows is None:
+            return None
+        return self.quality_flags.iloc[rows[-1]]
+
+    def latest_anomalies(self, city):
+        """Anomaly flags of the city's latest row, keyed by column"""
+        rows = self.city_rows.get(city)
+        if rows is None:
+            return None
+        return self.anomaly_flags.iloc[rows[-1]]
+
+    def city_anomalies(self, city, days=None):
+        """Anomaly flags of the city's most recent rows indexed by Date, newest first"""
+        rows = self.city_rows.get(city, np.empty(0, dtype=np.int64))
+        if days is not None:
+            rows = rows[-days:]
+        flags = self.anomaly_flags.iloc[rows[::-1]]
+        return flags.set_axis(pd.DatetimeIndex(self.frame['Date'].to_numpy()[rows[::-1]], name='Date'))
+
+    def city_history(self, city, days=None, clean=False):
+        """Most recent rows for a city, newest first (same order as a descending date sort)"""
+        frame = self.clean if clean else self.frame
+        rows = self.city_rows.get(city)
+        if rows is None:
+            return frame.iloc[0:0]
+        if days is not None:
+            rows = rows[-days:]
+        return frame.iloc[rows[::-1]]
+
+    def scan(self, columns=None, start=None, clean=False):
+        """Frames covering every city (optionally from `start` on); one frame for in-memory stores"""
+        frame = self.clean if clean else self.frame
+        if start is not None:
+            frame = frame[frame['Date'] >= start]
+        yield frame if columns is None else frame[columns]
+
+    def city_summary(self, city):
+        if city not in self.aggregates.index:
+            return None
+        agg = self.aggregates.loc[city]
+        return {
+            'rows': int(agg['rows']),
+            'mean_aqi': agg['aqi_sum'] / agg['aqi_count'] if agg['aqi_count'] else np.nan,
+            'max_aqi': agg['aqi_max'],
+            'min_aqi': agg['aqi_min'],
+            'first_date': agg['first_date'],
+            'last_date': agg['last_date']
+        }
+
+    # Appends
+    def append(self, rows, persist=True):
+        """
+        Validate and append new rows without reloading the dataset.
+        Rows for a (City, Date) that is already loaded are rejected, also when
+        their values differ: appends never correct loaded readings.
+        """
+        valid, rejected = validate_rows(rows)
+        with self._lock:
+            known = self._already_loaded(valid)
+            if known.any():
+                duplicates = valid[known].copy()
+                duplicates['reason'] = 'already loaded'
+                rejected = pd.concat([rejected, duplicates], ignore_index=True)
+                valid = valid[~known].reset_index(drop=True)
+
+            if len(valid):
+                if persist and self.csv_path:
+                    self._persist(valid)
+                self._append_in_memory(valid)
+
+            return {
+                'appended': len(valid),
+                'rejected': rejected,
+                'cities': sorted(valid['City'].unique()) if len(valid) else [],
+                'version': self.version
+            }
+
+    def _persist(self, valid):
+        write_arrow(frame_to_table(valid).cast(self.schema), _new_part_path(self.csv_path, self.append_dir))
+
+    def _already_loaded(self, valid):
+        known = np.zeros(len(valid), dtype=bool)
+        dates = self.frame['Date'].to_numpy()
+        for city, idx in valid.groupby('City', sort=False).indices.items():
+            rows = self.city_rows.get(city)
+            if rows is not None:
+                known[idx] = np.isin(valid['Date'].to_numpy()[idx], dates[rows])
+        return known
+
+    def _append_in_memory(self, valid):
+        offset = len(self.frame)
+        frame = pd.concat([self.frame, valid.astype(self.frame.dtypes.to_dict())], ignore_index=True)
+        dates = frame['Date'].to_numpy()
+
+        # Merge the new positions into each touched city's date-ordered index
+        city_rows = dict(self.city_rows)
+        for city, idx in valid.groupby('City', sort=False).indices.items():
+            merged = np.concatenate([city_rows.get(city, np.empty(0, dtype=np.int64)), idx + offset])
+            city_rows[city] = merged[np.argsort(dates[merged], kind='stable')]
+
+        touched = list(valid['City'].unique())
+        touched_rows = {city: city_rows[city] for city in touched}
+        clean, flags, anomalies = self._impute_touched(frame, touched_rows)
+        self.frame = frame
+        self.clean = clean
+        self.quality_flags = flags
+        self.anomaly_flags = anomalies
+        latest = self._latest_rows(frame, touched_rows)
+        self.latest = pd.concat([self.latest.drop(touched, errors='ignore'), latest])
+        clean_latest = self._latest_rows(clean, touched_rows)
+        self.clean_latest = pd.concat([self.clean_latest.drop(touched, errors='ignore'), clean_latest])
+
+        self.aggregates = _combine_aggregates(self.aggregates, self._aggregate(valid))
+        self.city_rows = city_rows
+        self.version += 1
+
+    def _impute_touched(self, frame, touched_rows):
+        """
+        Re-check and gap-fill only the cities that received rows; other cities keep
+        their cached flags and fill
+        """
+        positions = np.concatenate(list(touched_rows.values()))
+        sub_clean, sub_flags, sub_anomalies = clean_city_day(frame.iloc[positions], self.anomaly_detector)
+
+        added = len(frame) - len(self.clean)
+        clean = pd.concat([self.clean, frame.iloc[len(self.clean):]], ignore_index=True)
+        flags = self._extend_flags(self.quality_flags, added)
+        anomalies = self._extend_flags(self.anomaly_flags, added)
+        for column in list(sub_flags.columns) + ['AQI_Bucket']:
+            values = clean[column].to_numpy(copy=True)
+            values[positions] = sub_clean[column].to_numpy()
+            clean[column] = pd.array(values, dtype=frame[column].dtype)
+            for target, sub in ((flags, sub_flags), (anomalies, sub_anomalies)):
+                if column in target:
+                    column_flags = target[column].to_numpy(copy=True)
+                    column_flags[positions] = sub[column].to_numpy()
+                    target[column] = column_flags
+        return clean, flags, anomalies
+
+    @staticmethod
+    def _extend_flags(flags, added):
+        return pd.concat([
+            flags,
+            pd.DataFrame(0, index=range(added), columns=flags.columns, dtype='int8')
+        ], ignore_index=True)
+
+
+def _part_prefix(csv_path):
+    return _path_name(csv_path) + '.part-'
+
+
+def _part_paths(csv_path, append_dir):
+    prefix = _part_prefix(csv_path)
+    if not os.path.isdir(append_dir):
+        return []
+    return sorted(
+        os.path.join(append_dir, name) for name in os.listdir(append_dir)
+        if name.startswith(prefix) and name.endswith('.arrow')
+    )
+
+
+def _new_part_path(csv_path, append_dir):
+    return os.path.join(append_dir, f"{_part_prefix(csv_path)}{time.time_ns():020d}.arrow")
+
+
+def ingest_drop_folder(store, folder=DROP_DIR):
+    """
+    Append every CSV waiting in the drop folder to the store.
+    Files are claimed with an atomic rename, so concurrent sessions never ingest one twice.
+    Ingested files move to processed/, unreadable ones to rejected/.
+    """
+    if not os.path.isdir(folder):
+        return []
+
+    results = []
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith('.csv'):
+            continue
+        claimed = os.path.join(folder, 'processing', name)
+        os.makedirs(os.path.dirname(claimed), exist_ok=True)
+        try:
+            os.replace(os.path.join(folder, name), claimed)
+        except OSError:
+            continue  # Another session claimed it first
+
+        try:
+            result = store.append(pd.read_csv(claimed, dtype=str))
+            target = os.path.join(folder, 'processed', name)
+        except Exception as e:
+            result = {'appended': 0, 'rejected': None, 'cities': [], 'version': store.version, 'error': str(e)}
+            target = os.path.join(folder, 'rejected', name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(claimed, target)
+
+        rejected = result.get('rejected')
+        if rejected is not None and len(rejected):
+            rejected.to_csv(f"{target}.rejected.csv", index=False)
+        result['file'] = name
+        results.append(result)
+    return results
+
+
+def _dataset_path(csv_path, cache_dir):
+    return os.path.join(cache_dir, f"{cache_name(csv_path)}.dataset")
+
+
+def iter_csv_chunks(path, dtypes=CITY_DAY_DTYPES, chunksize=CHUNK_ROWS, date_column='Date'):
+    """Parse a CSV chunk by chunk with an explicit dtype map"""
+    for chunk in pd.read_csv(path, dtype=dtypes, chunksize=chunksize):
+        chunk[date_column] = pd.to_datetime(chunk[date_column])
+        yield chunk
+
+
+def _partition_table(frame, partition_by):
+    table = frame_to_table(frame[CITY_DAY_COLUMNS]).cast(CITY_DAY_SCHEMA)
+    if partition_by == 'year':
+        table = table.append_column('year', pa.array(frame['Date'].dt.year.to_numpy(), pa.int16()))
+    return table
+
+
+def _write_partitions(data, dataset_dir, partition_by, schema=None, basename_template=None):
+    ds.write_dataset(
+        data, dataset_dir, schema=schema, format='parquet',
+        partitioning=[partition_by], partitioning_flavor='hive',
+        basename_template=basename_template,
+        existing_data_behavior='overwrite_or_ignore',
+        max_rows_per_group=CHUNK_ROWS
+    )
+
+
+def _write_index(dataset_dir, latest, aggregates):
+    write_arrow(frame_to_table(latest[CITY_DAY_COLUMNS].reset_index(drop=True)), os.path.join(dataset_dir, LATEST_FILE))
+    write_arrow(frame_to_table(aggregates.rename_axis('City').reset_index()), os.path.join(dataset_dir, AGGREGATES_FILE))
+
+
+def stream_csv_to_dataset(csv_path, dataset_dir, partition_by='City', chunksize=CHUNK_ROWS):
+    """
+    Convert a city_day CSV of any size to a Parquet dataset partitioned by City or year.
+    Chunks are parsed, indexed and written one at a time, so peak memory is bounded by
+    chunksize. The per-city latest rows and aggregates are built while streaming and
+    stored next to the partitions. Returns the number of rows written.
+    """
+    if partition_by not in ('City', 'year'):
+        raise ValueError("partition_by must be 'City' or 'year'")
+    index = {'latest': None, 'aggregates': None, 'rows': 0}
+
+    def batches():
+        for chunk in iter_csv_chunks(csv_path, chunksize=chunksize):
+            index['latest'] = _combine_latest(index['latest'], chunk[CITY_DAY_COLUMNS])
+            index['aggregates'] = _combine_aggregates(index['aggregates'], CityDayStore._aggregate(chunk))
+            index['rows'] += len(chunk)
+            yield from _partition_table(chunk, partition_by).to_batches()
+
+    schema = CITY_DAY_SCHEMA
+    if partition_by == 'year':
+        schema = schema.append(pa.field('year', pa.int16()))
+
+    # Build next to the old dataset and swap it in, so readers never see a half-written one
+    tmp_dir = f"{dataset_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    _write_partitions(batches(), tmp_dir, partition_by, schema)
+    if index['latest'] is None:
+        index['latest'] = pd.DataFrame({c: pd.Series(dtype=CITY_DAY_SCHEMA.field(c).type.to_pandas_dtype()) for c in CITY_DAY_COLUMNS})
+        index['aggregates'] = CityDayStore._aggregate(index['latest'])
+    _write_index(tmp_dir, index['latest'], index['aggregates'])
+
+    old_dir = f"{dataset_dir}.{os.getpid()}.old"
+    if os.path.exists(dataset_dir):
+        os.replace(dataset_dir, old_dir)
+    os.replace(tmp_dir, dataset_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return index['rows']
+
+
+class LazyCityDayStore(CityDayStore):
+    """
+    City_day store over a partitioned Parquet dataset, for files larger than RAM.
+
+    Only the per-city index (latest row and aggregates) is held in memory. Histories
+    are read on demand with the City and Date filters pushed down to the partitions
+    and row-group statistics. frame is the latest-rows table, so the city list and
+    find_store() work as with the in-memory store. Gap-filled histories (and their
+    anomaly flags) are computed per city on first use and kept in a small LRU cache.
+    """
+
+    # Gap-filled city histories kept in memory
+    CLEAN_CACHE_SIZE = 32
+
+    def __init__(self, dataset_dir, csv_path=None, cache_dir=CACHE_DIR, append_dir=APPEND_DIR):
+        self.dataset_dir = dataset_dir
+        self.granularity = 'daily'
+        self.csv_path = csv_path
+        self.cache_dir = cache_dir
+        self.append_dir = append_dir
+        self.schema = CITY_DAY_SCHEMA
+        self.version = 0
+        self.anomaly_detector = AnomalyDetector()
+        self._lock = threading.RLock()
+        self._clean_histories = OrderedDict()
+        self._load_index()
+        _open_stores.add(self)
+
+    @classmethod
+    def open(cls, csv_path, cache_dir=CACHE_DIR, partition_by='City', chunksize=CHUNK_ROWS, append_dir=APPEND_DIR):
+        """
+        Stream the CSV into the partitioned dataset when it is missing or stale, then
+        open it. A freshly streamed dataset gets the rows appended to this CSV (kept
+        in append_dir) written into it again.
+        """
+        dataset_dir = _dataset_path(csv_path, cache_dir)
+        marker = os.path.join(dataset_dir, LATEST_FILE)
+        if not os.path.exists(marker) or os.path.getmtime(marker) < os.path.getmtime(csv_path):
+            stream_csv_to_dataset(csv_path, dataset_dir, partition_by, chunksize)
+            prune_cache(csv_path, cache_dir)
+            store = cls(dataset_dir, csv_path, cache_dir, append_dir)
+            store._replay_parts()
+            return store
+        return cls(dataset_dir, csv_path, cache_dir, append_dir)
+
+    def _load_index(self):
+        self.dataset = ds.dataset(self.dataset_dir, format='parquet', partitioning='hive')
+        self.partition_by = 'year' if 'year' in self.dataset.schema.names else 'City'
+        # City partitions: resolve each city's files once instead of pruning every fragment per query
+        self._city_fragments = {}
+        if self.partition_by == 'City':
+            for fragment in self.dataset.get_fragments():
+                city = ds.get_partition_keys(fragment.partition_expression).get('City')
+                self._city_fragments.setdefault(city, []).append(fragment)
+        latest = table_to_frame(read_arrow_mmap(os.path.join(self.dataset_dir, LATEST_FILE)))
+        aggregates = read_arrow_mmap(os.path.join(self.dataset_dir, AGGREGATES_FILE)).to_pandas()
+        self.latest = latest.set_index('City', drop=False)
+        self.aggregates = aggregates.set_index('City')
+        self.frame = latest
+        self.clean = latest.copy(deep=False)
+
+    def _read(self, city, start=None, end=None):
+        """One city's rows in date order, filtered inside the dataset scan"""
+        condition = ds.field('City') == city
+        if start is not None:
+            condition &= ds.field('Date') >= pa.scalar(start.to_pydatetime(), pa.timestamp('ns'))
+            if self.partition_by == 'year':
+                condition &= ds.field('year') >= start.year
+        if end is not None:
+            condition &= ds.field('Date') <= pa.scalar(end.to_pydatetime(), pa.timestamp('ns'))
+            if self.partition_by == 'year':
+                condition &= ds.field('year') <= end.year
+        dataset = self.dataset
+        if self.partition_by == 'City':
+            fragments = self._city_fragments.get(city, [])
+            dataset = ds.FileSystemDataset(fragments, dataset.schema, dataset.format, dataset.filesystem)
+        frame = dataset.to_table(columns=CITY_DAY_COLUMNS, filter=condition).to_pandas()
+        return frame.sort_values('Date', kind='stable').reset_index(drop=True)
+
+    def _clean_history(self, city):
+        with self._lock:
+            if city in self._clean_histories:
+                self._clean_histories.move_to_end(city)
+                return self._clean_histories[city]
+        history = clean_city_day(self._read(city), self.anomaly_detector)
+        with self._lock:
+            self._clean_histories[city] = history
+            while len(self._clean_histories) > self.CLEAN_CACHE_SIZE:
+                self._clean_histories.popitem(last=False)
+        return history
+
+    # Lookups
+    def cities(self):
+        return sorted(self.latest.index)
+
+    def latest_row(self, city, clean=False):
+        if city not in self.latest.index:
+            return None
+        if clean:
+            return self._clean_history(city)[0].iloc[-1]
+        return self.latest.loc[city]
+
+    def latest_flags(self, city):
+        if city not in self.latest.index:
+            return None
+        return self._clean_history(city)[1].iloc[-1]
+
+    def latest_anomalies(self, city):
+        if city not in self.latest.index:
+            return None
+        return self._clean_history(city)[2].iloc[-1]
+
+    def city_anomalies(self, city, days=None):
+        if city not in self.latest.index:
+            return None
+        clean, _, anomalies = self._clean_history(city)
+        if days is not None:
+            clean, anomalies = clean.tail(days), anomalies.tail(days)
+        return anomalies.iloc[::-1].set_axis(pd.DatetimeIndex(clean['Date'].to_numpy()[::-1], name='Date'))
+
+    def city_history(self, city, days=None, clean=False):
+        """
+        Most recent rows for a city, newest first. Raw reads only scan the last
+        `days` calendar days; with daily data that is the same as the last `days` rows.
+        """
+        if city not in self.latest.index:
+            return self.frame.iloc[0:0]
+        if clean:
+            history = self._clean_history(city)[0]
+        else:
+            start = None if days is None else self.aggregates.at[city, 'last_date'] - pd.Timedelta(days=days - 1)
+            history = self._read(city, start)
+        if days is not None:
+            history = history.tail(days)
+        return history.iloc[::-1]
+
+    def scan(self, columns=None, start=None, clean=False):
+        """
+        Batches of the whole dataset (optionally from `start` on), read with the Date filter
+        pushed down. Gap filling is per city and on demand here, so clean is ignored.
+        """
+        condition = None
+        if start is not None:
+            condition = ds.field('Date') >= pa.scalar(start.to_pydatetime(), pa.timestamp('ns'))
+        for batch in self.dataset.to_batches(columns=columns or CITY_DAY_COLUMNS, filter=condition):
+            yield batch.to_pandas()
+
+    # Appends
+    def _persist(self, valid):
+        super()._persist(valid)
+        self._write_rows(valid)
+
+    def _write_rows(self, valid):
+        _write_partitions(
+            _partition_table(valid, self.partition_by), self.dataset_dir, self.partition_by,
+            basename_template=f"append-{time.time_ns():020d}-{{i}}.parquet"
+        )
+
+    def _replay_parts(self):
+        """Write the appended parts into a rebuilt dataset; rows the CSV already has are skipped"""
+        parts = _part_paths(self.csv_path, self.append_dir)
+        if not parts:
+            return 0
+        rows = pd.concat([table_to_frame(read_arrow_mmap(p)) for p in parts], ignore_index=True)
+        rows = rows.drop_duplicates(['City', 'Date'], keep='last').reset_index(drop=True)
+        with self._lock:
+            rows = rows[~self._already_loaded(rows)].reset_index(drop=True)
+            if len(rows):
+                self._write_rows(rows)
+                self._append_in_memory(rows)
+        return len(rows)
+
+    def _already_loaded(self, valid):
+        known = np.zeros(len(valid), dtype=bool)
+        for city, idx in valid.groupby('City', sort=False).indices.items():
+            if city in self.latest.index:
+                dates = valid['Date'].to_numpy()[idx]
+                loaded = self._read(city, pd.Timestamp(dates.min()), pd.Timestamp(dates.max()))
+                known[idx] = np.isin(dates, loaded['Date'].to_numpy())
+        return known
+
+    def _append_in_memory(self, valid):
+        latest = _combine_latest(self.frame[CITY_DAY_COLUMNS], valid.astype(self.frame[CITY_DAY_COLUMNS].dtypes.to_dict()))
+        aggregates = _combine_aggregates(self.aggregates, self._aggregate(valid))
+        _write_index(self.dataset_dir, latest, aggregates)
+        for city in valid['City'].unique():
+            self._clean_histories.pop(city, None)
+        self._load_index()
+        self.version += 1
+
+
+def open_store(csv_path, cache_dir=CACHE_DIR, lazy=None, append_dir=APPEND_DIR):
+    """
+    Open city_day data in memory, or lazily from the partitioned dataset when
+    lazy is True (default: AQ_LAZY_DATA, else whether the CSV exceeds LAZY_THRESHOLD_BYTES)
+    """
+    if lazy is None:
+        forced = os.environ.get('AQ_LAZY_DATA')
+        lazy = forced == '1' if forced in ('0', '1') else os.path.getsize(csv_path) > LAZY_THRESHOLD_BYTES
+    if lazy:
+        return LazyCityDayStore.open(csv_path, cache_dir, append_dir=append_dir)
+    return CityDayStore.open(csv_path, cache_dir, append_dir)
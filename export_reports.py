@@ -0,0 +1,224 @@
+"""
+Static daily bulletins: one page per city with the gauge, pollutant charts,
+recent trend and health advisory of the Real-time view, plus an index page.
+
+The store is opened once; each city's latest row and recent history are read
+from its indexes and handed to a process pool that builds the figures with the
+same builders as the dashboard and writes the pages. The result is a plain
+folder that any web server (or the file system) can serve.
+
+Usage:
+    python export_reports.py --output site
+    python export_reports.py --output site --format png --workers 4   # images need kaleido
+"""
+import os
+import re
+import html
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from plotly.offline import get_plotlyjs
+from datastore import open_store
+from data_quality import OBSERVED
+from figures import (
+    build_aqi_gauge, build_pollutant_bars, build_pollutant_pie, build_pollutant_trends, build_trend_chart,
+    get_aqi_color, get_health_advisory, get_recommendations, get_risk_level, pollutant_levels
+)
+from narration import LANGUAGES, render_report
+from rollups import TIME_FORMATS
+
+DATA_PATH = os.environ.get('AQ_DATA_PATH', 'city_day.csv')
+
+# Rows of history in the trend charts (same as the Real-time view)
+TREND_ROWS = 24
+
+FORMATS = ['html', 'png', 'svg']
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+{head}
+<style>
+body {{ font-family: sans-serif; max-width: 1100px; margin: 0 auto; padding: 1rem; color: #1f2937; }}
+.grid {{ display: grid; grid-template-columns: 1fr 2fr; gap: 1rem; }}
+.grid.even {{ grid-template-columns: 1fr 1fr; }}
+.badge {{ display: inline-block; padding: 0.2rem 0.6rem; border-radius: 0.4rem; color: white; }}
+table {{ border-collapse: collapse; width: 100%; }}
+td, th {{ padding: 0.4rem 0.6rem; border-bottom: 1px solid #e5e7eb; text-align: left; }}
+img {{ max-width: 100%; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def city_slug(city):
+    return re.sub(r'[^a-z0-9]+', '-', city.lower()).strip('-') or 'city'
+
+
+def city_payload(store, city, clean=True, trend_rows=TREND_ROWS):
+    """
+    Everything a worker needs for one city: the current_data dict the dashboard
+    builds from the latest row, and the recent history (oldest first) with a Time column.
+    None for cities the store does not have.
+    """
+    latest = store.latest_row(city, clean=clean)
+    if latest is None:
+        return None
+    imputed = []
+    if clean:
+        imputed = [column for column, flag in store.latest_flags(city).items() if flag != OBSERVED]
+    history = store.city_history(city, trend_rows, clean=clean).iloc[::-1]
+    history = history[['Date'] + [c for c in ['AQI', 'PM2.5', 'PM10', 'NO2', 'O3'] if c in history]].copy()
+    history['Time'] = history['Date'].dt.strftime(TIME_FORMATS[store.granularity])
+    return {
+        'city': city,
+        'slug': city_slug(city),
+        'data': {
+            'aqi': latest.get('AQI', 0),
+            'status': latest.get('AQI_Bucket', 'Unknown'),
+            'pm25': latest.get('PM2.5', 0),
+            'pm10': latest.get('PM10', 0),
+            'no2': latest.get('NO2', 0),
+            'so2': latest.get('SO2', 0),
+            'co': latest.get('CO', 0),
+            'o3': latest.get('O3', 0),
+            'timestamp': latest['Date'],
+            'imputed': imputed
+        },
+        'history': history
+    }
+
+
+def _figure_html(fig, name, page_dir, fmt):
+    """Inline div for html, otherwise an image file next to the page and its <img> tag"""
+    if fmt == 'html':
+        return fig.to_html(full_html=False, include_plotlyjs=False)
+    path = os.path.join(page_dir, f"{name}.{fmt}")
+    fig.write_image(path, format=fmt)
+    return f'<img src="{html.escape(os.path.basename(page_dir))}/{name}.{fmt}" alt="{name}">'
+
+
+def render_city(payload, output_dir, fmt='html', language='English'):
+    """Write cities/<slug>.html (and its images); returns the index row for the city"""
+    city, data, history = payload['city'], payload['data'], payload['history']
+    aqi = data['aqi']
+    cities_dir = os.path.join(output_dir, 'cities')
+    page_dir = os.path.join(cities_dir, payload['slug'])
+    if fmt != 'html':
+        os.makedirs(page_dir, exist_ok=True)
+
+    pollutants_df = pollutant_levels(data)
+    figures = {'gauge': build_aqi_gauge(aqi), 'pollutants': build_pollutant_bars(pollutants_df),
+               'distribution': build_pollutant_pie(pollutants_df)}
+    if len(history):
+        figures['trend'] = build_trend_chart(history)
+        figures['pollutant_trends'] = build_pollutant_trends(history)
+    parts = {name: _figure_html(fig, name, page_dir, fmt) for name, fig in figures.items()}
+    missing = '<p>Historical trend data not available</p>'
+
+    advisory = get_health_advisory(aqi)
+    risk_emoji, risk_text = get_risk_level(aqi)
+    recommendations = ''.join(f"<li>{html.escape(rec)}</li>" for rec in get_recommendations(aqi))
+    date = pd.Timestamp(data['timestamp']).strftime('%Y-%m-%d')
+    imputed = f"<p>Estimated (gap-filled) values: {html.escape(', '.join(data['imputed']))}</p>" if data['imputed'] else ''
+    body = f"""
+<p><a href="../index.html">← All cities</a></p>
+<h1>🌍 {html.escape(city)} air quality bulletin</h1>
+<p>Data for {date}. <span class="badge" style="background: {get_aqi_color(aqi)}">AQI {aqi:.0f} · {html.escape(str(data['status']))}</span></p>
+<p>{html.escape(render_report(city, data, language)).replace(chr(10), '<br>')}</p>
+{imputed}
+<div class="grid"><div>{parts['gauge']}</div><div>{parts.get('trend', missing)}</div></div>
+<h2>🧪 Current Pollutant Levels</h2>
+{parts['pollutants']}
+<div class="grid even"><div>{parts['distribution']}</div><div>{parts.get('pollutant_trends', missing)}</div></div>
+<h2>🏥 Health Advisory & Recommendations</h2>
+<p><b>Health Risk Level:</b> <span style="color: {get_aqi_color(aqi)}">{advisory['level']}</span> · {risk_emoji} {risk_text}</p>
+<p>{html.escape(advisory['advice'])}</p>
+<ul>{recommendations}</ul>
+"""
+    head = '<script src="../assets/plotly.min.js"></script>' if fmt == 'html' else ''
+    with open(os.path.join(cities_dir, f"{payload['slug']}.html"), 'w', encoding='utf-8') as fp:
+        fp.write(PAGE.format(title=f"{html.escape(city)} air quality", head=head, body=body))
+    return {'City': city, 'slug': payload['slug'], 'AQI': aqi, 'Status': data['status'], 'Date': date}
+
+
+def _render_args(args):
+    return render_city(*args)
+
+
+def write_index(rows, output_dir, generated):
+    """index.html listing every city, worst AQI first"""
+    table = ''.join(
+        f'<tr><td><a href="cities/{row["slug"]}.html">{html.escape(row["City"])}</a></td>'
+        f'<td><span class="badge" style="background: {get_aqi_color(row["AQI"])}">{row["AQI"]:.0f}</span></td>'
+        f'<td>{html.escape(str(row["Status"]))}</td><td>{row["Date"]}</td></tr>'
+        for row in sorted(rows, key=lambda row: -row['AQI'] if pd.notna(row['AQI']) else 0)
+    )
+    body = f"""
+<h1>🌍 Air Quality Bulletins</h1>
+<p>{len(rows)} cities · generated {generated}</p>
+<table><tr><th>City</th><th>AQI</th><th>Status</th><th>Data for</th></tr>{table}</table>
+"""
+    with open(os.path.join(output_dir, 'index.html'), 'w', encoding='utf-8') as fp:
+        fp.write(PAGE.format(title="Air quality bulletins", head='', body=body))
+
+
+def export_site(store, output_dir, fmt='html', cities=None, clean=True, workers=None, language='English'):
+    """Render every city's bulletin into output_dir; returns the index rows"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}' (expected one of {', '.join(FORMATS)})")
+    if fmt != 'html':
+        try:
+            import kaleido  # noqa: F401  (plotly's static image engine)
+        except ImportError:
+            raise RuntimeError(f"--format {fmt} needs the kaleido package (pip install kaleido)")
+
+    os.makedirs(os.path.join(output_dir, 'cities'), exist_ok=True)
+    if fmt == 'html':
+        # One shared copy of plotly.js instead of 3 MB inlined in every page
+        os.makedirs(os.path.join(output_dir, 'assets'), exist_ok=True)
+        with open(os.path.join(output_dir, 'assets', 'plotly.min.js'), 'w', encoding='utf-8') as fp:
+            fp.write(get_plotlyjs())
+
+    payloads = [city_payload(store, city, clean) for city in (cities or store.cities())]
+    jobs = [(payload, output_dir, fmt, language) for payload in payloads if payload is not None]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        rows = [_render_args(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(_render_args, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    write_index(rows, output_dir, time.strftime('%Y-%m-%d %H:%M'))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export static per-city air quality bulletins")
+    parser.add_argument('--data', default=DATA_PATH, help="city_day CSV (default: AQ_DATA_PATH or city_day.csv)")
+    parser.add_argument('--output', default='site', help="Output folder")
+    parser.add_argument('--format', choices=FORMATS, default='html',
+                        help="html embeds interactive charts; png/svg write images (needs kaleido)")
+    parser.add_argument('--cities', nargs='*', help="Only these cities")
+    parser.add_argument('--raw', action='store_true', help="Use raw readings instead of the gap-filled data")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--language', choices=LANGUAGES, default='English', help="Language of the summary text")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = open_store(args.data)
+    try:
+        rows = export_site(store, args.output, args.format, args.cities, not args.raw, args.workers, args.language)
+    except RuntimeError as e:
+        parser.error(str(e))
+    print(f"Wrote {len(rows)} city bulletins to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+from data_quality import POLLUTANT_LIMITS
+from rollups import PERIODS_PER_DAY
+
+# Look-back windows (days) of the exposure summaries
+EXPOSURE_WINDOWS = [7, 30, 365]
+
+# Typical daily inhalation (m³/day) per profile; children and older adults are the sensitive groups
+INHALATION_RATES = {'adult': 16.0, 'child': 12.0, 'older adult': 13.0}
+
+# What one period is called in "N <unit> above limit"
+PERIOD_UNITS = {'hourly': 'hours', 'daily': 'days', 'monthly': 'months'}
+
+EXPOSURE_METRICS = ['exceedances', 'mean', 'coverage', 'dose']
+
+
+def prefix_sums(values):
+    """Cumulative sums along axis 0 with a leading zero row, so any window sum is one subtraction"""
+    sums = np.zeros((values.shape[0] + 1,) + values.shape[1:], dtype=values.dtype)
+    np.cumsum(values, axis=0, out=sums[1:])
+    return sums
+
+
+def window_sums(sums, periods):
+    """Trailing `periods`-row sums at every row from prefix sums (shorter at the start): O(N)"""
+    lagged = np.zeros_like(sums[1:])
+    if periods < len(sums) - 1:
+        lagged[periods:] = sums[1:len(sums) - periods]
+    return sums[1:] - lagged
+
+
+class ExposureTable:
+    """
+    Rolling exposure statistics for every city and pollutant, from the
+    comparison cube's date x city matrices.
+
+    Each pollutant is reduced once to three prefix sums over time (sum of
+    observed values, number of observations, number of periods above the
+    limit). Any window statistic at any date is then a difference of two rows,
+    so a whole rolling matrix costs one vectorized subtraction and the latest
+    window of every city costs one row lookup, whatever the window length.
+    Windows count periods (rows of the cube), like ComparisonCube.window.
+    """
+
+    def __init__(self, matrices, granularity='daily', limits=POLLUTANT_LIMITS):
+        self.granularity = granularity
+        self.limits = {pollutant: limit for pollutant, limit in limits.items() if pollutant in matrices}
+        first = next(iter(matrices.values()))
+        self.dates = first.index
+        self.cities = list(first.columns)
+        self.sums = {}
+        for pollutant, limit in self.limits.items():
+            values = matrices[pollutant].reindex(index=self.dates, columns=self.cities).to_numpy(dtype='float64')
+            observed = ~np.isnan(values)
+            with np.errstate(invalid='ignore'):
+                above = values > limit
+            self.sums[pollutant] = {
+                'total': prefix_sums(np.where(observed, values, 0.0)),
+                'count': prefix_sums(observed.astype(np.int32)),
+                'above': prefix_sums(above.astype(np.int32))
+            }
+
+    @classmethod
+    def from_cube(cls, cube, limits=POLLUTANT_LIMITS):
+        return cls(cube.matrices, cube.granularity, limits)
+
+    def periods(self, days):
+        return max(1, int(np.ceil(days * PERIODS_PER_DAY[self.granularity])))
+
+    @property
+    def period_unit(self):
+        return PERIOD_UNITS.get(self.granularity, 'periods')
+
+    def _window(self, pollutant, key, periods, latest):
+        """Window sums of one prefix-sum array: every row, or only the last one"""
+        sums = self.sums[pollutant][key]
+        if latest:
+            return sums[-1] - sums[max(0, len(sums) - 1 - periods)]
+        return window_sums(sums, periods)
+
+    def _metric(self, pollutant, periods, metric, rate, latest=False):
+        """One metric for the trailing `periods` rows ending at each date (or the last one)"""
+        if metric == 'exceedances':
+            return self._window(pollutant, 'above', periods, latest)
+        count = self._window(pollutant, 'count', periods, latest)
+        # Rows actually inside the window (fewer than `periods` at the start of the data)
+        if latest:
+            span = min(periods, len(self.dates))
+        else:
+            span = np.minimum(np.arange(1, len(self.dates) + 1), periods)[:, None]
+        if metric == 'coverage':
+            return count / span
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self._window(pollutant, 'total', periods, latest) / count
+        if metric == 'mean':
+            return mean
+        if metric == 'dose':
+            # Inhaled mass (µg) over the window; periods without a reading count at the window mean
+            return mean * span * rate / PERIODS_PER_DAY[self.granularity]
+        raise ValueError(f"Unknown exposure metric '{metric}' (expected one of {', '.join(EXPOSURE_METRICS)})")
+
+    def rolling(self, pollutant, days, metric='exceedances', profile='adult'):
+        """date x city matrix of a metric over the trailing window ending at each date"""
+        values = self._metric(pollutant, self.periods(days), metric, INHALATION_RATES[profile])
+        return pd.DataFrame(values, index=self.dates, columns=self.cities)
+
+    def latest(self, days, profile='adult'):
+        """One row per city: every pollutant's metrics for the window ending at the last date"""
+        periods = self.periods(days)
+        columns = {}
+        for pollutant in self.limits:
+            for metric in EXPOSURE_METRICS:
+                columns[f"{pollutant} {metric}"] = self._metric(
+                    pollutant, periods, metric, INHALATION_RATES[profile], latest=True
+                )
+        return pd.DataFrame(columns, index=pd.Index(self.cities, name='City'))
+
+    def city_summary(self, city, profile='adult', windows=EXPOSURE_WINDOWS):
+        """
+        {days: {pollutant: {exceedances, periods, mean, coverage, dose}}} for one city's
+        latest windows; None for cities outside the table
+        """
+        if city not in self.cities or not len(self.dates):
+            return None
+        column = self.cities.index(city)
+        summary = {}
+        for days in windows:
+            periods = self.periods(days)
+            summary[days] = {
+                pollutant: {
+                    'periods': min(periods, len(self.dates)),
+                    **{metric: float(self._metric(pollutant, periods, metric, INHALATION_RATES[profile],
+                                                  latest=True)[column])
+                       for metric in EXPOSURE_METRICS}
+                }
+                for pollutant in self.limits
+            }
+        return summary
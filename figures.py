@@ -0,0 +1,203 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from data_quality import POLLUTANT_LIMITS, POLLUTANT_UNITS
+
+# Pollutants shown in the current-levels charts
+POLLUTANTS = ['PM2.5', 'PM10', 'NO2', 'SO2', 'CO', 'O3']
+
+# current_data keys of those pollutants
+POLLUTANT_KEYS = {'PM2.5': 'pm25', 'PM10': 'pm10', 'NO2': 'no2', 'SO2': 'so2', 'CO': 'co', 'O3': 'o3'}
+
+
+def get_aqi_color(aqi):
+    if aqi <= 50: return '#10B981'
+    elif aqi <= 100: return '#F59E0B'
+    elif aqi <= 150: return '#F97316'
+    elif aqi <= 200: return '#EF4444'
+    elif aqi <= 300: return '#8B5CF6'
+    else: return '#7C2D12'
+
+
+def get_health_advisory(aqi):
+    if aqi <= 50:
+        return {'level': 'Good', 'color': 'status-good', 'advice': 'Air quality is considered satisfactory, and air pollution poses little or no risk.'}
+    elif aqi <= 100:
+        return {'level': 'Satisfactory', 'color': 'status-moderate', 'advice': 'Air quality is acceptable; however, for some pollutants there may be a moderate health concern for a very small number of people who are unusually sensitive to air pollution.'}
+    elif aqi <= 150:
+        return {'level': 'Moderate', 'color': 'status-moderate', 'advice': 'Members of sensitive groups may experience health effects. The general public is not likely to be affected.'}
+    elif aqi <= 200:
+        return {'level': 'Poor', 'color': 'status-poor', 'advice': 'Everyone may begin to experience health effects; members of sensitive groups may experience more serious health effects.'}
+    elif aqi <= 300:
+        return {'level': 'Very Poor', 'color': 'status-poor', 'advice': 'Health warnings of emergency conditions. The entire population is more likely to be affected.'}
+    else:
+        return {'level': 'Severe', 'color': 'status-severe', 'advice': 'Health alert: everyone may experience more serious health effects. Avoid outdoor activities.'}
+
+
+def get_risk_level(aqi):
+    """(emoji, label) shown next to the health advisory"""
+    if aqi > 200:
+        return "🔴", "High Risk"
+    elif aqi > 100:
+        return "🟡", "Moderate Risk"
+    return "🟢", "Low Risk"
+
+
+def get_recommendations(aqi):
+    """Health recommendations for an AQI value"""
+    if aqi > 200:
+        recommendations = [
+            "❌ Avoid outdoor activities, especially for children and elderly",
+            "😷 Use N95 or P100 masks when going outside",
+            "🏠 Keep windows and doors closed",
+            "💨 Use air purifiers indoors",
+            "🚗 Avoid outdoor exercises and sports"
+        ]
+    elif aqi > 100:
+        recommendations = [
+            "⚠️ Limit prolonged outdoor activities for sensitive individuals",
+            "😷 Consider wearing masks during outdoor activities",
+            "🏃‍♂️ Reduce intensity of outdoor exercises",
+            "💨 Use air purifiers in rooms where you spend most time"
+        ]
+    else:
+        recommendations = [
+            "✅ Air quality is acceptable for outdoor activities",
+            "🏃‍♂️ Normal outdoor exercise is fine",
+            "🌱 Good time for outdoor activities and sports",
+            "💚 Minimal health risk for all individuals"
+        ]
+    return recommendations + [
+        "💧 Stay hydrated throughout the day",
+        "🌿 Consider indoor plants to improve air quality",
+        "📱 Monitor air quality regularly"
+    ]
+
+
+def pollutant_levels(city_data):
+    """Current value, safety limit and unit per pollutant of a current_data dict"""
+    return pd.DataFrame({
+        'Pollutant': POLLUTANTS,
+        'Current': [city_data.get(POLLUTANT_KEYS[p], 0) for p in POLLUTANTS],
+        'Limit': [POLLUTANT_LIMITS[p] for p in POLLUTANTS],
+        'Unit': [POLLUTANT_UNITS[p] for p in POLLUTANTS]
+    })
+
+
+def build_aqi_gauge(aqi):
+    fig = go.Figure(go.Indicator(
+        mode = "gauge+number+delta",
+        value = aqi,
+        domain = {'x': [0, 1], 'y': [0, 1]},
+        title = {'text': "Current AQI"},
+        delta = {'reference': 100},
+        gauge = {
+            'axis': {'range': [None, 500]},
+            'bar': {'color': get_aqi_color(aqi)},
+            'steps': [
+                {'range': [0, 50], 'color': "lightgreen"},
+                {'range': [50, 100], 'color': "yellow"},
+                {'range': [100, 150], 'color': "orange"},
+                {'range': [150, 200], 'color': "red"},
+                {'range': [200, 300], 'color': "purple"},
+                {'range': [300, 500], 'color': "darkred"}
+            ],
+            'threshold': {
+                'line': {'color': "black", 'width': 4},
+                'thickness': 0.75,
+                'value': aqi
+            }
+        }
+    ))
+    fig.update_layout(height=300, margin=dict(l=20, r=20, t=40, b=20))
+    return fig
+
+
+def build_trend_chart(historical_data):
+    """AQI area chart of a frame with Time and AQI columns"""
+    fig = px.area(
+        historical_data,
+        x='Time',
+        y='AQI',
+        title="Recent AQI Trend",
+        color_discrete_sequence=['#3B82F6']
+    )
+    fig.update_layout(height=300)
+    return fig
+
+
+def build_pollutant_bars(pollutants_df):
+    fig = px.bar(
+        pollutants_df,
+        x='Pollutant',
+        y='Current',
+        title="Current Pollutant Concentrations",
+        color='Current',
+        color_continuous_scale='Reds'
+    )
+    fig.add_scatter(
+        x=pollutants_df['Pollutant'],
+        y=pollutants_df['Limit'],
+        mode='markers',
+        name='Safety Limit',
+        marker=dict(color='red', size=10, symbol='line-ew')
+    )
+    fig.update_layout(height=400)
+    return fig
+
+
+def build_pollutant_pie(pollutants_df):
+    fig = px.pie(
+        pollutants_df,
+        values='Current',
+        names='Pollutant',
+        title="Pollutant Distribution"
+    )
+    fig.update_layout(height=400)
+    return fig
+
+
+def build_pollutant_trends(historical_data):
+    """One line per pollutant of a frame with a Time column"""
+    fig = go.Figure()
+    for pollutant in ['PM2.5', 'PM10', 'NO2', 'O3']:
+        if pollutant in historical_data.columns:
+            fig.add_trace(go.Scatter(
+                x=historical_data['Time'],
+                y=historical_data[pollutant],
+                mode='lines',
+                name=pollutant
+            ))
+    fig.update_layout(
+        title="Pollutant Trends",
+        xaxis_title="Time",
+        yaxis_title="Concentration",
+        height=400
+    )
+    return fig
+
+
+def get_exposure_advice(summary, profile='adult', unit='days'):
+    """Advice from a city's recent exposure (ExposureTable.city_summary) for one profile"""
+    month = summary.get(30, {})
+    advice = []
+    for pollutant in ['PM2.5', 'PM10', 'NO2', 'O3']:
+        stats = month.get(pollutant)
+        if not stats or not stats['coverage']:
+            continue
+        share = stats['exceedances'] / stats['periods']
+        if share >= 0.5:
+            advice.append(f"🔴 {pollutant} was above its safety limit for {stats['exceedances']:.0f} of the last "
+                          f"{stats['periods']} {unit}: exposure is chronic, not a passing spike")
+        elif share >= 0.2:
+            advice.append(f"🟡 {pollutant} exceeded its safety limit on {stats['exceedances']:.0f} of the last "
+                          f"{stats['periods']} {unit}")
+    if advice and profile != 'adult':
+        advice.append(f"👪 As a sensitive group ({profile}), plan outdoor time around the cleanest hours "
+                      "and keep rescue medication at hand")
+    week = summary.get(7, {}).get('PM2.5')
+    if week and month.get('PM2.5') and month['PM2.5']['mean'] and week['mean'] < 0.8 * month['PM2.5']['mean']:
+        advice.append("📉 PM2.5 this week is well below the monthly average")
+    if not advice:
+        advice.append("✅ No sustained exceedances in the last 30 days")
+    return advice
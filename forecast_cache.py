@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import pandas as pd
+from datastore import CACHE_DIR
+
+# SQLite file shared by every session and worker process
+FORECAST_DB = os.environ.get('AQ_FORECAST_DB', os.path.join(CACHE_DIR, 'forecasts.sqlite'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecasts (
+    city TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    horizon INTEGER NOT NULL,
+    last_obs TEXT NOT NULL,
+    created REAL NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (city, model_version, horizon)
+)
+"""
+
+
+def _timestamp_key(last_obs):
+    return pd.Timestamp(last_obs).isoformat()
+
+
+def _encode(frame):
+    return frame.to_json(orient='split', index=False, date_format='iso')
+
+
+def _decode(payload):
+    data = json.loads(payload)
+    frame = pd.DataFrame(data['data'], columns=data['columns'])
+    if 'Date' in frame:
+        frame['Date'] = pd.to_datetime(frame['Date'])
+    return frame
+
+
+class ForecastCache:
+    """
+    Forecasts keyed by (city, model version, horizon, last observation).
+
+    One row is kept per (city, model version, horizon); a lookup only hits when
+    the stored forecast was made from the same last observation, so an entry is
+    replaced exactly when new data (a later last_obs) or a new model version
+    arrives, never on a timer. The SQLite file is opened in WAL mode so readers
+    in other processes are not blocked while a refresh writes.
+    """
+
+    def __init__(self, path=FORECAST_DB):
+        self.path = path
+        self.version = None
+        self.model_version = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute(SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def get(self, city, model_version, last_obs, horizon):
+        """Cached forecast frame, or None when missing or made from older data / another model"""
+        row = self._connect().execute(
+            "SELECT payload FROM forecasts WHERE city = ? AND model_version = ? AND horizon = ? AND last_obs = ?",
+            (city, model_version, horizon, _timestamp_key(last_obs))
+        ).fetchone()
+        return _decode(row[0]) if row else None
+
+    def put(self, city, model_version, last_obs, horizon, frame):
+        self.put_many(model_version, horizon, {city: (last_obs, frame)})
+
+    def put_many(self, model_version, horizon, entries):
+        """Store {city: (last_obs, frame)} in one transaction"""
+        now = time.time()
+        rows = [
+            (city, model_version, horizon, _timestamp_key(last_obs), now, _encode(frame))
+            for city, (last_obs, frame) in entries.items()
+        ]
+        with self._connect() as db:
+            db.executemany("INSERT OR REPLACE INTO forecasts VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def stale_cities(self, model_version, horizon, last_obs):
+        """Cities of the last_obs Series (city -> timestamp) without a current forecast"""
+        cached = dict(self._connect().execute(
+            "SELECT city, last_obs FROM forecasts WHERE model_version = ? AND horizon = ?",
+            (model_version, horizon)
+        ).fetchall())
+        return [city for city, stamp in last_obs.items() if cached.get(city) != _timestamp_key(stamp)]
+
+    def next_values(self, model_version, horizon, last_obs, column='Predicted_AQI', ahead=1):
+        """Series (city -> value) of `column` `ahead` steps out, from current forecasts of the last_obs Series"""
+        rows = self._connect().execute(
+            "SELECT city, last_obs, payload FROM forecasts WHERE model_version = ? AND horizon = ?",
+            (model_version, horizon)
+        ).fetchall()
+        values = {}
+        for city, stamp, payload in rows:
+            if city in last_obs.index and stamp == _timestamp_key(last_obs[city]):
+                frame = _decode(payload)
+                if len(frame) >= ahead:
+                    values[city] = frame[column].iloc[ahead - 1]
+        return pd.Series(values, dtype='float64')
+
+    def prune(self, model_version):
+        """Drop forecasts of every other model version"""
+        with self._connect() as db:
+            return db.execute("DELETE FROM forecasts WHERE model_version != ?", (model_version,)).rowcount
+
+    def refresh(self, latest, model_version, horizon, forecast_fn, version=None):
+        """
+        Precompute forecasts for every city in `latest` (latest row per city, indexed
+        by City, with a Date column) whose cached entry is missing or stale.
+        forecast_fn(latest_rows) returns {city: frame}. Skipped when `version` (e.g.
+        the store version) was already refreshed by this process; the first refresh
+        with a model version drops the rows of all others. Returns the number of
+        cities computed.
+        """
+        with self._lock:
+            if version is not None and version == self.version:
+                return 0
+            if model_version != self.model_version:
+                # A new model makes every older forecast unreachable
+                self.prune(model_version)
+                self.model_version = model_version
+            stale = self.stale_cities(model_version, horizon, latest['Date'])
+            if stale:
+                rows = latest.loc[stale]
+                forecasts = forecast_fn(rows)
+                self.put_many(model_version, horizon, {
+                    city: (rows.at[city, 'Date'], frame) for city, frame in forecasts.items()
+                })
+            self.version = version
+            return len(stale)
@@ -0,0 +1,258 @@
+import os
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+from data_quality import OBSERVED, city_date_order
+from datastore import CACHE_DIR
+from weather import WEATHER_FEATURES
+
+# Days ahead forecast by the model (one regressor per day)
+HORIZON_DAYS = 7
+
+# Nominal coverage of the prediction bands
+INTERVAL_LEVELS = [0.8, 0.95]
+
+# The most recent share of dates is held out to calibrate the bands (split conformal)
+CALIBRATION_FRACTION = 0.15
+
+# Training uses at most this many (most recent) rows
+MAX_TRAINING_ROWS = 300_000
+
+# Weather features present on fewer training rows than this are left out (e.g. a short
+# OpenWeather backfill that only covers the calibration dates)
+MIN_WEATHER_COVERAGE = 0.3
+
+# Forecaster pickles kept in the cache dir; the previous one stays for workers still on older data
+MODELS_KEPT = 2
+
+# Rows of history needed to build every feature of the latest row
+HISTORY_ROWS = 30
+
+# aqi_<k> is log AQI k rows before the forecast origin
+FEATURE_COLUMNS = [
+    'aqi_0', 'aqi_1', 'aqi_2', 'aqi_6', 'mean_7', 'mean_30', 'std_7',
+    'pm25_0', 'doy_sin', 'doy_cos'
+]
+
+
+def weather_coverage(frame):
+    """Share of the training rows (dates before the calibration cut) with each weather feature present"""
+    present = [c for c in WEATHER_FEATURES if c in frame]
+    if not present or not len(frame):
+        return {}
+    dates = pd.to_datetime(frame['Date'])
+    train = frame.loc[(dates < dates.quantile(1 - CALIBRATION_FRACTION)).to_numpy(), present]
+    return {c: float(train[c].notna().mean()) if len(train) else 0.0 for c in present}
+
+
+def usable_weather_features(coverage, minimum=MIN_WEATHER_COVERAGE):
+    return [c for c in WEATHER_FEATURES if coverage.get(c, 0.0) >= minimum]
+
+
+def build_features(frame):
+    """
+    Feature rows for a city_day frame (any order, any number of cities), in
+    (City, Date) order. AQI and PM2.5 are modelled as log1p values, so the
+    additive residual bands become multiplicative ones on the AQI scale.
+    """
+    codes, order, _ = city_date_order(frame)
+    city = codes[order]
+    dates = pd.DatetimeIndex(frame['Date'].to_numpy()[order])
+    aqi = pd.Series(np.log1p(frame['AQI'].to_numpy(dtype='float64')[order]))
+    pm25 = pd.Series(np.log1p(frame['PM2.5'].to_numpy(dtype='float64')[order]))
+
+    grouped = aqi.groupby(city, sort=False)
+    features = pd.DataFrame({
+        'City': frame['City'].to_numpy()[order],
+        'Date': dates,
+        'target': aqi.to_numpy()
+    })
+    for lag in (0, 1, 2, 6):
+        features[f"aqi_{lag}"] = grouped.shift(lag).to_numpy()
+    features['mean_7'] = grouped.rolling(7, min_periods=1).mean().to_numpy()
+    features['mean_30'] = grouped.rolling(30, min_periods=1).mean().to_numpy()
+    features['std_7'] = grouped.rolling(7, min_periods=2).std().to_numpy()
+    features['pm25_0'] = pm25.to_numpy()
+    day = 2 * np.pi * dates.dayofyear.to_numpy() / 365.25
+    features['doy_sin'] = np.sin(day)
+    features['doy_cos'] = np.cos(day)
+    # Weather on the forecast origin day, when the frame was enriched (weather.enrich)
+    for column in WEATHER_FEATURES:
+        if column in frame:
+            features[column] = frame[column].to_numpy(dtype='float64')[order]
+    features['_city'] = city
+    features['_order'] = order
+    return features
+
+
+def conformal_quantile(residuals, level):
+    """Split-conformal quantile of absolute residuals (finite-sample corrected)"""
+    residuals = np.sort(residuals[~np.isnan(residuals)])
+    if not len(residuals):
+        return np.nan
+    rank = min(len(residuals) - 1, int(np.ceil((len(residuals) + 1) * level)) - 1)
+    return residuals[rank]
+
+
+class AQIForecaster:
+    """
+    Direct multi-day AQI forecaster with calibrated prediction bands.
+
+    The feature row of a city's latest day (recent lags and means of log AQI,
+    PM2.5, season and, when the training frame has them, weather features) goes through one gradient-boosting regressor per horizon.
+    Band half-widths are split-conformal quantiles of the absolute residuals on
+    the most recent dates, computed once at training time. A forecast is
+    therefore a single batched predict per horizon plus a constant offset, for
+    any number of cities, with no refitting or resampling per request.
+    """
+
+    def __init__(self, horizon=HORIZON_DAYS, levels=INTERVAL_LEVELS):
+        self.horizon = horizon
+        self.levels = list(levels)
+        self.models = []
+        self.quantiles = {}
+        self.metrics = {}
+        self.feature_columns = list(FEATURE_COLUMNS)
+        self.weather_coverage = {}
+        self.version = None
+
+    def fit(self, frame, quality_flags=None):
+        """Fit on a (gap-filled) city_day frame; targets that were imputed are not used"""
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        features = build_features(frame)
+        observed = np.ones(len(frame), dtype=bool)
+        if quality_flags is not None and 'AQI' in quality_flags:
+            observed = quality_flags['AQI'].to_numpy() == OBSERVED
+        observed = observed[features['_order'].to_numpy()]
+
+        cut = features['Date'].quantile(1 - CALIBRATION_FRACTION)
+        self.weather_coverage = weather_coverage(frame)
+        self.feature_columns = FEATURE_COLUMNS + usable_weather_features(self.weather_coverage)
+        x = features[self.feature_columns].to_numpy()
+        dates = features['Date'].to_numpy()
+        same_city = features['_city'].to_numpy()
+        self.models, self.quantiles, self.metrics = [], {}, {}
+        for h in range(1, self.horizon + 1):
+            # Target h rows ahead within the same city
+            target = np.full(len(features), np.nan)
+            target[:-h] = features['target'].to_numpy()[h:]
+            valid_target = np.zeros(len(features), dtype=bool)
+            valid_target[:-h] = (same_city[h:] == same_city[:-h]) & observed[h:]
+            usable = valid_target & ~np.isnan(target) & ~np.isnan(x[:, 0])
+            train = np.flatnonzero(usable & (dates < cut))
+            calib = np.flatnonzero(usable & (dates >= cut))
+            if len(train) > MAX_TRAINING_ROWS:
+                train = np.sort(train[np.argsort(dates[train], kind='stable')[-MAX_TRAINING_ROWS:]])
+
+            model = HistGradientBoostingRegressor(max_iter=200, learning_rate=0.08, random_state=42)
+            model.fit(x[train], target[train])
+            self.models.append(model)
+
+            residuals = target[calib] - model.predict(x[calib])
+            self.quantiles[h] = {level: conformal_quantile(np.abs(residuals), level) for level in self.levels}
+            self.metrics[h] = self._holdout_metrics(target[calib], residuals, dates[calib])
+        return self
+
+    def _holdout_metrics(self, target, residuals, dates):
+        """
+        Errors on the calibration dates, and band coverage checked out of sample:
+        bands calibrated on the earlier half of those dates, applied to the later half
+        """
+        actual = np.expm1(target)
+        predicted = np.expm1(target - residuals)
+        errors = np.abs(residuals)
+        later = dates >= np.sort(dates)[len(dates) // 2] if len(dates) else np.zeros(0, dtype=bool)
+        coverage = {}
+        for level in self.levels:
+            q = conformal_quantile(errors[~later], level)
+            coverage[level] = float(np.mean(errors[later] <= q)) if later.any() else np.nan
+        return {
+            'rmse': float(np.sqrt(np.mean((actual - predicted) ** 2))),
+            'mae': float(np.mean(np.abs(actual - predicted))),
+            'r2': float(1 - np.sum((actual - predicted) ** 2) / np.sum((actual - actual.mean()) ** 2)),
+            'coverage': coverage,
+            'calibration_rows': int(len(residuals))
+        }
+
+    def predict(self, histories):
+        """
+        {city: forecast frame} from the latest row of each city in `histories`
+        (recent rows of one or more cities). Missing history is allowed; the
+        regressors handle NaN features.
+        """
+        features = build_features(histories)
+        last = features.groupby('_city', sort=False).tail(1)
+        x = last.reindex(columns=self.feature_columns).to_numpy(dtype='float64')
+        predictions = np.column_stack([model.predict(x) for model in self.models])
+
+        forecasts = {}
+        steps = np.arange(1, self.horizon + 1)
+        for i, (city, last_date) in enumerate(zip(last['City'], last['Date'])):
+            center = predictions[i]
+            data = {
+                'Ahead': [f"+{h}d" for h in steps],
+                'Date': last_date + pd.to_timedelta(steps, unit='D'),
+                'Predicted_AQI': np.expm1(center)
+            }
+            for level in self.levels:
+                width = np.array([self.quantiles[h][level] for h in steps])
+                data[f"Lower_{int(level * 100)}"] = np.maximum(0, np.expm1(center - width))
+                data[f"Upper_{int(level * 100)}"] = np.expm1(center + width)
+            forecasts[city] = pd.DataFrame(data)
+        return forecasts
+
+
+def _model_path(cache_dir, key):
+    return os.path.join(cache_dir, f"forecaster-{key}.pkl")
+
+
+def _prune_models(cache_dir, keep=MODELS_KEPT):
+    """Delete all but the `keep` most recently written forecaster pickles"""
+    paths = [
+        os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+        if name.startswith('forecaster-') and name.endswith('.pkl')
+    ]
+    for path in sorted(paths, key=os.path.getmtime, reverse=True)[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def training_key(frame):
+    """
+    Short hash identifying the training data (row count, date range, AQI and the
+    totals of the weather features the model would use). Weather that stays below
+    MIN_WEATHER_COVERAGE does not change the key, so backfilling it never retrains.
+    """
+    columns = ['AQI'] + usable_weather_features(weather_coverage(frame))
+    totals = [np.nansum(frame[c].to_numpy(dtype='float64')) for c in columns]
+    summary = f"{len(frame)}|{frame['Date'].min()}|{frame['Date'].max()}|" + '|'.join(f"{t:.3f}" for t in totals)
+    return hashlib.sha1(summary.encode()).hexdigest()[:10]
+
+
+def load_forecaster(frame, quality_flags=None, cache_dir=CACHE_DIR):
+    """
+    Forecaster trained on frame, loaded from the cache dir when the same data was
+    trained on before. Saving a new model deletes all but the MODELS_KEPT newest.
+    """
+    key = training_key(frame)
+    path = _model_path(cache_dir, key)
+    if os.path.exists(path):
+        with open(path, 'rb') as fp:
+            return pickle.load(fp)
+
+    forecaster = AQIForecaster().fit(frame, quality_flags)
+    forecaster.version = f"hgb-conformal-{key}"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as fp:
+            pickle.dump(forecaster, fp)
+        os.replace(tmp_path, path)
+        _prune_models(cache_dir)
+    except OSError:
+        pass  # Read-only deployments retrain per process
+    return forecaster
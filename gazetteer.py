@@ -0,0 +1,117 @@
+import os
+import re
+import json
+import difflib
+import unicodedata
+
+# Bundled offline gazetteer (cities with coordinates and aliases, optional stations)
+GAZETTEER_PATH = os.environ.get(
+    'AQ_GAZETTEER_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.json')
+)
+
+# Minimum difflib similarity for a fuzzy name match
+FUZZY_CUTOFF = 0.85
+
+# Fields of load_city_coordinates() entries
+COORDINATE_FIELDS = ['lat', 'lng', 'population', 'area', 'elevation']
+
+
+def normalize_name(name):
+    """Case-, accent-, punctuation- and whitespace-insensitive key for a place name"""
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]', '', text.casefold())
+
+
+class Gazetteer:
+    """
+    Offline place index: every city name, alias, station id and station name
+    is hashed (after normalize_name) to its city, so lookups are dictionary hits.
+    Names that miss fall back to a fuzzy match against the same keys, and the
+    answer is remembered. Stations without coordinates of their own sit at
+    their city's.
+    """
+
+    def __init__(self, cities, stations=()):
+        self.cities = {}
+        self.index = {}
+        self.stations = {}
+        self._fuzzy = {}
+        for entry in cities:
+            name = entry['name']
+            self.cities[name] = {field: entry.get(field) for field in COORDINATE_FIELDS + ['state']}
+            for key in [name] + list(entry.get('aliases', [])):
+                self.index.setdefault(normalize_name(key), name)
+        self.add_stations(stations)
+
+    def add_stations(self, stations):
+        """Index station records (id, name, city, optional lat/lng) whose city is known"""
+        for station in stations:
+            city = self.resolve(station.get('city', ''), fuzzy=False)
+            if city is None:
+                continue
+            lat, lng = station.get('lat'), station.get('lng')
+            self.stations[station['id']] = {
+                'id': station['id'],
+                'name': station.get('name'),
+                'city': city,
+                'lat': lat if lat is not None else self.cities[city]['lat'],
+                'lng': lng if lng is not None else self.cities[city]['lng']
+            }
+            for key in (station['id'], station.get('name')):
+                if key:
+                    self.index.setdefault(normalize_name(key), city)
+        self._fuzzy.clear()
+
+    def resolve(self, name, fuzzy=True):
+        """Canonical city for a city name, alias, station id or station name; None when unknown"""
+        key = normalize_name(name)
+        if not key:
+            return None
+        city = self.index.get(key)
+        if city is not None or not fuzzy:
+            return city
+        if key not in self._fuzzy:
+            match = difflib.get_close_matches(key, self.index.keys(), n=1, cutoff=FUZZY_CUTOFF)
+            self._fuzzy[key] = self.index[match[0]] if match else None
+        return self._fuzzy[key]
+
+    def locate(self, name):
+        """(lat, lng) of a place, or None"""
+        station = self.stations.get(name)
+        if station is not None:
+            return station['lat'], station['lng']
+        city = self.resolve(name)
+        if city is None:
+            return None
+        return self.cities[city]['lat'], self.cities[city]['lng']
+
+    def coordinates(self):
+        """{city: {lat, lng, population, area, elevation}} for every city"""
+        return {city: {field: info[field] for field in COORDINATE_FIELDS} for city, info in self.cities.items()}
+
+    def city_coordinates(self, names):
+        """Coordinates entries keyed by the given names (e.g. the dataset's), for the ones that resolve"""
+        located = {}
+        for name in names:
+            city = self.resolve(name)
+            if city is not None:
+                located[name] = {field: self.cities[city][field] for field in COORDINATE_FIELDS}
+        return located
+
+
+def stations_from_frame(stations):
+    """Gazetteer station records from a stations.csv frame (StationId, StationName, City)"""
+    return [
+        {'id': row['StationId'], 'name': row.get('StationName'), 'city': row['City']}
+        for row in stations.to_dict('records')
+    ]
+
+
+def load_gazetteer(path=GAZETTEER_PATH, stations=None):
+    """Gazetteer from the JSON file, plus the stations of a stations.csv frame when given"""
+    with open(path, encoding='utf-8') as fp:
+        data = json.load(fp)
+    gazetteer = Gazetteer(data.get('cities', []), data.get('stations', []))
+    if stations is not None:
+        gazetteer.add_stations(stations_from_frame(stations))
+    return gazetteer
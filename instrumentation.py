@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+
+# Process-wide metrics registry shared by every session and thread
+_lock = threading.Lock()
+_metrics = {}
+_local = threading.local()
+
+# Admin panel and export toggles
+ADMIN_PANEL_ENV = 'AQ_ADMIN_PANEL'
+METRICS_EXPORT_ENV = 'AQ_METRICS_JSONL'
+
+
+def _new_entry():
+    return {
+        'calls': 0,
+        'errors': 0,
+        'total_seconds': 0.0,
+        'max_seconds': 0.0,
+        'last_seconds': 0.0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'bytes': 0
+    }
+
+
+def _entry(name):
+    entry = _metrics.get(name)
+    if entry is None:
+        entry = _metrics[name] = _new_entry()
+    return entry
+
+
+def _record_duration(name, seconds, failed=False):
+    with _lock:
+        entry = _entry(name)
+        entry['calls'] += 1
+        entry['total_seconds'] += seconds
+        entry['last_seconds'] = seconds
+        entry['max_seconds'] = max(entry['max_seconds'], seconds)
+        if failed:
+            entry['errors'] += 1
+
+    # Attach the span to the rerun currently being timed on this thread
+    spans = getattr(_local, 'spans', None)
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+def record_bytes(name, num_bytes):
+    """Add transferred bytes (API payloads, audio) to a metric"""
+    with _lock:
+        _entry(name)['bytes'] += int(num_bytes)
+
+
+def record_cache_miss(name):
+    """Call from inside a cached function body; it only runs on a miss"""
+    with _lock:
+        _entry(name)['cache_misses'] += 1
+    misses = getattr(_local, 'misses', None)
+    if misses is not None:
+        misses.add(name)
+
+
+def record_cache_hit(name):
+    with _lock:
+        _entry(name)['cache_hits'] += 1
+
+
+@contextmanager
+def track(name):
+    """Time a block of code under the given metric name"""
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        _record_duration(name, time.perf_counter() - start, failed)
+
+
+def timed(name=None, cached=False):
+    """
+    Decorator recording duration and call count for a function.
+    With cached=True the wrapped function is expected to be a cache wrapper whose
+    body calls record_cache_miss(name); calls that never reach the body are hits.
+    """
+    def decorator(func):
+        metric_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not cached:
+                with track(metric_name):
+                    return func(*args, **kwargs)
+
+            previous = getattr(_local, 'misses', None)
+            _local.misses = set()
+            try:
+                with track(metric_name):
+                    result = func(*args, **kwargs)
+                if metric_name not in _local.misses:
+                    record_cache_hit(metric_name)
+                return result
+            finally:
+                if previous is not None:
+                    previous.update(_local.misses)
+                _local.misses = previous
+
+        # Keep cache controls such as .clear() reachable through the wrapper
+        if hasattr(func, 'clear'):
+            wrapper.clear = func.clear
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def track_rerun(name='rerun'):
+    """Time one full script rerun and collect the spans recorded inside it"""
+    _local.spans = []
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        spans = _local.spans
+        _local.spans = None
+        _record_duration(name, seconds)
+        rerun = {
+            'timestamp': time.time(),
+            'seconds': seconds,
+            'spans': spans
+        }
+        _local.last_rerun = rerun
+        export_path = os.environ.get(METRICS_EXPORT_ENV)
+        if export_path:
+            append_jsonl(export_path, rerun)
+
+
+def last_rerun():
+    """Spans of the most recent rerun on this thread"""
+    return getattr(_local, 'last_rerun', None)
+
+
+def get_metrics():
+    """Snapshot of all metrics"""
+    with _lock:
+        return {name: dict(entry) for name, entry in _metrics.items()}
+
+
+def admin_panel_enabled():
+    return os.environ.get(ADMIN_PANEL_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+def _metric_name(name):
+    return ''.join(ch if ch.isalnum() else '_' for ch in name)
+
+
+def export_prometheus():
+    """Render all metrics in the Prometheus text exposition format"""
+    snapshot = get_metrics()
+    fields = [
+        ('calls_total', 'calls', 'counter'),
+        ('errors_total', 'errors', 'counter'),
+        ('seconds_total', 'total_seconds', 'counter'),
+        ('seconds_max', 'max_seconds', 'gauge'),
+        ('cache_hits_total', 'cache_hits', 'counter'),
+        ('cache_misses_total', 'cache_misses', 'counter'),
+        ('bytes_total', 'bytes', 'counter')
+    ]
+    lines = []
+    for suffix, key, kind in fields:
+        metric = f"aq_{suffix}"
+        lines.append(f"# TYPE {metric} {kind}")
+        for name in sorted(snapshot):
+            lines.append(f'{metric}{{name="{_metric_name(name)}"}} {snapshot[name][key]}')
+    return "\n".join(lines) + "\n"
+
+
+def export_json_lines():
+    """Render all metrics as JSON lines, one metric per line"""
+    snapshot = get_metrics()
+    now = time.time()
+    return "".join(
+        json.dumps({'timestamp': now, 'name': name, **entry}) + "\n"
+        for name, entry in sorted(snapshot.items())
+    )
+
+
+def append_jsonl(path, record):
+    with _lock:
+        with open(path, 'a', encoding='utf-8') as fp:
+            fp.write(json.dumps(record) + "\n")
@@ -0,0 +1,250 @@
+import os
+from string import Formatter
+import numpy as np
+import pandas as pd
+
+# Numerals in narration text: 'native' (Devanagari, Tamil, Telugu digits) or 'western' (0-9 everywhere)
+NARRATION_NUMERALS = os.environ.get('AQ_NARRATION_NUMERALS', 'native')
+
+LANGUAGES = ['English', 'Hindi', 'Tamil', 'Telugu']
+
+TRANSLATIONS = {
+    'English': {
+        'city_report': '{city} city air quality report.',
+        'current_aqi': 'Current AQI is',
+        'pm25_level': 'PM2.5 level is',
+        'pm10_level': 'PM10 level is',
+        'air_quality_status': 'Air quality status is',
+        'micrograms': 'micrograms per cubic meter',
+        'prediction_shows': 'Prediction shows',
+        'not_available': 'not available',
+        'unknown': 'Unknown',
+        'good': 'Good',
+        'satisfactory': 'Satisfactory',
+        'moderate': 'Moderate',
+        'poor': 'Poor',
+        'very_poor': 'Very Poor',
+        'severe': 'Severe'
+    },
+    'Hindi': {
+        'city_report': '{city} शहर की वायु गुणवत्ता रिपोर्ट।',
+        'current_aqi': 'वर्तमान एक्यूआई है',
+        'pm25_level': 'पीएम 2.5 का स्तर है',
+        'pm10_level': 'पीएम 10 का स्तर है',
+        'air_quality_status': 'वायु गुणवत्ता की स्थिति है',
+        'micrograms': 'माइक्रोग्राम प्रति घन मीटर',
+        'prediction_shows': 'पूर्वानुमान दिखाता है',
+        'not_available': 'उपलब्ध नहीं',
+        'unknown': 'अज्ञात',
+        'good': 'अच्छा',
+        'satisfactory': 'संतोषजनक',
+        'moderate': 'मध्यम',
+        'poor': 'खराब',
+        'very_poor': 'बहुत खराब',
+        'severe': 'गंभीर'
+    },
+    'Tamil': {
+        'city_report': '{city} நகர காற்று தர அறிக்கை.',
+        'current_aqi': 'தற்போதைய காற்று தர குறியீடு',
+        'pm25_level': 'பிஎம் 2.5 அளவு',
+        'pm10_level': 'பிஎம் 10 அளவு',
+        'air_quality_status': 'காற்று தர நிலை',
+        'micrograms': 'மைக்ரோகிராம் ஒரு கன மீட்டருக்கு',
+        'prediction_shows': 'முன்கணிப்பு காட்டுகிறது',
+        'not_available': 'கிடைக்கவில்லை',
+        'unknown': 'தெரியவில்லை',
+        'good': 'நல்லது',
+        'satisfactory': 'திருப்திகரமானது',
+        'moderate': 'மிதமானது',
+        'poor': 'மோசமானது',
+        'very_poor': 'மிக மோசமானது',
+        'severe': 'கடுமையானது'
+    },
+    'Telugu': {
+        'city_report': '{city} నగర గాలి నాణ్యత నివేదిక.',
+        'current_aqi': 'ప్రస్తుత గాలి నాణ్యత సూచిక',
+        'pm25_level': 'పిఎం 2.5 స్థాయి',
+        'pm10_level': 'పిఎం 10 స్థాయి',
+        'air_quality_status': 'గాలి నాణ్యత స్థితి',
+        'micrograms': 'మైక్రోగ్రాములు ఒక క్యూబిక్ మీటరుకు',
+        'prediction_shows': 'అంచనా చూపిస్తుంది',
+        'not_available': 'అందుబాటులో లేదు',
+        'unknown': 'తెలియదు',
+        'good': 'మంచిది',
+        'satisfactory': 'సంతృప్తికరం',
+        'moderate': 'మధ్యస్థం',
+        'poor': 'చెడ్డది',
+        'very_poor': 'చాలా చెడ్డది',
+        'severe': 'తీవ్రమైనది'
+    }
+}
+
+# AQI_Bucket labels -> translation keys
+STATUS_KEYS = {
+    'Good': 'good',
+    'Satisfactory': 'satisfactory',
+    'Moderate': 'moderate',
+    'Poor': 'poor',
+    'Very Poor': 'very_poor',
+    'Severe': 'severe'
+}
+
+# Zero to nine in each script
+DIGITS = {
+    'Hindi': '०१२३४५६७८९',
+    'Tamil': '௦௧௨௩௪௫௬௭௮௯',
+    'Telugu': '౦౧౨౩౪౫౬౭౮౯'
+}
+
+# The report, written with translation keys in [brackets] and data fields in {braces}.
+# The translation-key phrases are filled in once per language when it is compiled.
+# Fields: city, aqi, status, pm25, pm10 (already formatted strings)
+REPORT_TEMPLATE = (
+    "[city_report]\n"
+    "[current_aqi] {aqi}, [air_quality_status] {status}.\n"
+    "[pm25_level] {pm25} [micrograms].\n"
+    "[pm10_level] {pm10} [micrograms]."
+)
+
+# Data fields: (source column in render_batch frames, decimals; None for text)
+FIELDS = {
+    'city': ('City', None),
+    'aqi': ('AQI', 0),
+    'status': ('AQI_Bucket', None),
+    'pm25': ('PM2.5', 1),
+    'pm10': ('PM10', 1)
+}
+
+
+def digit_table(language, numerals=NARRATION_NUMERALS):
+    """str.translate table from ASCII digits to the language's numerals (empty when western)"""
+    if numerals != 'native' or language not in DIGITS:
+        return {}
+    return str.maketrans('0123456789', DIGITS[language])
+
+
+def format_number(value, language, decimals=0, numerals=NARRATION_NUMERALS):
+    """One number in the language's numerals; NaN / None gives the 'not available' phrase"""
+    if value is None or pd.isna(value):
+        return TRANSLATIONS[language]['not_available']
+    return f"{float(value):.{decimals}f}".translate(digit_table(language, numerals))
+
+
+def translate_status(status, language):
+    """AQI_Bucket label in the language; unknown labels give the 'unknown' phrase"""
+    key = STATUS_KEYS.get(status) if isinstance(status, str) else None
+    return TRANSLATIONS[language][key or 'unknown']
+
+
+class NarrationTemplate:
+    """
+    The report for one language, compiled once: translated phrases are baked in
+    and the rest is split into alternating literal text and field names, so
+    rendering is plain concatenation (one row, or whole columns at a time).
+    """
+
+    def __init__(self, language, template=REPORT_TEMPLATE, numerals=NARRATION_NUMERALS):
+        trans = TRANSLATIONS[language]
+        text = template
+        for key, phrase in trans.items():
+            # Phrases may contain the {city} field themselves (city_report)
+            text = text.replace(f"[{key}]", phrase)
+        self.language = language
+        self.numerals = numerals
+        self.table = digit_table(language, numerals)
+        self.parts = [(literal, field) for literal, field, _, _ in Formatter().parse(text)]
+
+    def render(self, values):
+        """Text for one report; values maps field -> raw value (city name, AQI, status label, ...)"""
+        out = []
+        for literal, field in self.parts:
+            out.append(literal)
+            if field is None:
+                continue
+            decimals = FIELDS[field][1]
+            if field == 'status':
+                out.append(translate_status(values.get(field), self.language))
+            elif decimals is None:
+                out.append(str(values.get(field, '')))
+            else:
+                out.append(format_number(values.get(field), self.language, decimals, self.numerals))
+        return ''.join(out)
+
+    def render_columns(self, columns):
+        """Texts for many reports; columns maps field -> formatted string Series (same index)"""
+        index = next(iter(columns.values())).index
+        text = pd.Series('', index=index, dtype=object)
+        for literal, field in self.parts:
+            text = text + literal
+            if field is not None:
+                text = text + columns[field]
+        return text
+
+
+_compiled = {}
+
+
+def get_template(language, numerals=NARRATION_NUMERALS):
+    """Compiled template for a language, built on first use"""
+    key = (language, numerals)
+    if key not in _compiled:
+        _compiled[key] = NarrationTemplate(language, numerals=numerals)
+    return _compiled[key]
+
+
+def render_report(city, data, language, numerals=NARRATION_NUMERALS):
+    """Narration text for one city; data has aqi, status, pm25 and pm10 like the dashboard's current_data"""
+    values = {'city': city, 'aqi': data.get('aqi'), 'status': data.get('status'),
+              'pm25': data.get('pm25'), 'pm10': data.get('pm10')}
+    return get_template(language, numerals).render(values)
+
+
+def _ascii_numbers(values, decimals):
+    """Formatted numbers as an object array, None where the value is NaN"""
+    values = np.asarray(values, dtype='float64')
+    missing = np.isnan(values)
+    formatted = np.char.mod(f"%.{decimals}f", np.where(missing, 0.0, values)).astype(object)
+    formatted[missing] = None
+    return formatted
+
+
+def render_batch(frame, languages=LANGUAGES, numerals=NARRATION_NUMERALS):
+    """
+    Narration for every row of frame (City, AQI, AQI_Bucket, PM2.5, PM10; e.g. the
+    latest row per city) in every language: a long frame of City, Language, Text.
+    Numbers are formatted once for all languages and only re-scripted per language,
+    statuses are mapped per distinct label, and each text column is built with one
+    vectorized concatenation per template part.
+    """
+    index = pd.RangeIndex(len(frame))
+    numbers = {
+        field: _ascii_numbers(frame[column].to_numpy(dtype='float64'), decimals)
+        for field, (column, decimals) in FIELDS.items() if decimals is not None and column in frame
+    }
+    buckets = pd.Series(frame['AQI_Bucket'].to_numpy(dtype=object), index=index) if 'AQI_Bucket' in frame \
+        else pd.Series(None, index=index, dtype=object)
+    cities = pd.Series(frame['City'].astype(str).to_numpy(dtype=object), index=index)
+
+    rendered = []
+    for language in languages:
+        template = get_template(language, numerals)
+        not_available = TRANSLATIONS[language]['not_available']
+        columns = {'city': cities}
+        for field, values in numbers.items():
+            column = pd.Series(values, index=index, dtype=object)
+            if template.table:
+                column = column.str.translate(template.table)
+            columns[field] = column.fillna(not_available)
+        for field, (column, decimals) in FIELDS.items():
+            if decimals is not None and field not in columns:
+                columns[field] = pd.Series(not_available, index=index, dtype=object)
+        statuses = {label: translate_status(label, language) for label in pd.unique(buckets.dropna())}
+        columns['status'] = buckets.map(statuses).fillna(TRANSLATIONS[language]['unknown'])
+        rendered.append(pd.DataFrame({
+            'City': cities.to_numpy(),
+            'Language': language,
+            'Text': template.render_columns(columns).to_numpy()
+        }))
+    if not rendered:
+        return pd.DataFrame(columns=['City', 'Language', 'Text'])
+    return pd.concat(rendered, ignore_index=True)
@@ -0,0 +1,359 @@
+import os
+import time
+import datetime
+import threading
+from collections import OrderedDict
+import pandas as pd
+from anomaly import describe_flag
+from data_quality import OBSERVED
+from rollups import TIME_FORMATS, periods_for_days
+
+# Comma-separated fallback order; the provider picked in the sidebar is always asked first
+PROVIDER_ORDER = os.environ.get('AQ_PROVIDERS', 'store,openweather')
+
+# Seconds a live OpenWeather answer is reused (its readings are hourly)
+OPENWEATHER_TTL = int(os.environ.get('AQ_OPENWEATHER_TTL', '600'))
+
+# Rows of recent data behind the Real-time trend charts
+TREND_ROWS = 24
+TREND_DAYS = 30
+
+# Cached answers kept per process (city x provider x data version)
+CACHE_ENTRIES = 2048
+
+# OpenWeather's 1-5 index on the Indian AQI scale
+OPENWEATHER_AQI = {1: 50, 2: 100, 3: 200, 4: 300, 5: 400}
+
+# Columns of OpenWeather forecast frames and their trend-chart names
+TREND_NAMES = {'aqi': 'AQI', 'pm25': 'PM2.5', 'pm10': 'PM10', 'no2': 'NO2', 'o3': 'O3'}
+
+
+def parse_openweather_data(ow_data):
+    """Parse OpenWeatherMap data into our format"""
+    if not ow_data or 'current' not in ow_data:
+        return None
+
+    current = ow_data['current']
+    if 'list' not in current or len(current['list']) == 0:
+        return None
+
+    components = current['list'][0]['components']
+    aqi = current['list'][0]['main']['aqi']
+
+    # Convert OpenWeather AQI (1-5) to Indian AQI scale (0-500)
+    indian_aqi = OPENWEATHER_AQI.get(aqi, 100)
+
+    # Get status
+    if indian_aqi <= 50:
+        status = 'Good'
+    elif indian_aqi <= 100:
+        status = 'Satisfactory'
+    elif indian_aqi <= 200:
+        status = 'Moderate'
+    elif indian_aqi <= 300:
+        status = 'Poor'
+    elif indian_aqi <= 400:
+        status = 'Very Poor'
+    else:
+        status = 'Severe'
+
+    return {
+        'aqi': indian_aqi,
+        'status': status,
+        'pm25': components.get('pm2_5', 0),
+        'pm10': components.get('pm10', 0),
+        'no2': components.get('no2', 0),
+        'so2': components.get('so2', 0),
+        'co': components.get('co', 0),
+        'o3': components.get('o3', 0),
+        'nh3': components.get('nh3', 0),
+        'timestamp': datetime.datetime.fromtimestamp(current['list'][0]['dt'])
+    }
+
+
+def get_openweather_forecast(ow_data):
+    """Parse OpenWeatherMap forecast data"""
+    if not ow_data or 'forecast' not in ow_data or not ow_data['forecast']:
+        return None
+
+    forecast = ow_data['forecast']
+    if 'list' not in forecast:
+        return None
+
+    forecast_list = []
+    for item in forecast['list']:
+        components = item['components']
+
+        forecast_list.append({
+            'datetime': datetime.datetime.fromtimestamp(item['dt']),
+            'aqi': OPENWEATHER_AQI.get(item['main']['aqi'], 100),
+            'pm25': components.get('pm2_5', 0),
+            'pm10': components.get('pm10', 0),
+            'no2': components.get('no2', 0),
+            'o3': components.get('o3', 0)
+        })
+
+    return pd.DataFrame(forecast_list)
+
+
+def latest_reading(latest, imputed=None, anomalies=None):
+    """Dashboard dict of a city's latest city_day row"""
+    return {
+        'date': latest['Date'],
+        'pm25': latest.get('PM2.5', 0),
+        'pm10': latest.get('PM10', 0),
+        'no2': latest.get('NO2', 0),
+        'so2': latest.get('SO2', 0),
+        'co': latest.get('CO', 0),
+        'o3': latest.get('O3', 0),
+        'nh3': latest.get('NH3', 0),
+        'aqi': latest.get('AQI', 0),
+        'aqi_bucket': latest.get('AQI_Bucket', 'Unknown'),
+        'imputed': imputed or [],
+        'anomalies': anomalies or {}
+    }
+
+
+def store_latest_data(store, city_name, clean=False):
+    """Latest reading of a city from a CityDayStore / LazyCityDayStore, or None"""
+    latest = store.latest_row(city_name, clean=clean)
+    if latest is None:
+        return None
+    imputed = []
+    if clean:
+        flags = store.latest_flags(city_name)
+        imputed = [column for column, flag in flags.items() if flag != OBSERVED]
+    anomaly_flags = store.latest_anomalies(city_name)
+    anomalies = {column: describe_flag(flag) for column, flag in anomaly_flags.items() if flag}
+    return latest_reading(latest, imputed, anomalies)
+
+
+class DataProvider:
+    """
+    One source of per-city readings. fetch(city) returns a snapshot dict or None:
+        current   current_data dict (aqi, status, pm25, ..., timestamp)
+        trend     recent rows for the trend charts (Time, AQI, PM2.5, PM10, NO2, O3), or None
+        forecast  the source's own forecast frame (datetime, aqi, pm25, ...), or None
+    key() identifies the data version; answers are cached until it changes or
+    `ttl` seconds pass (ttl None: only the key expires them).
+    """
+    name = ''
+    label = ''
+    indicator = ''
+    ttl = None
+
+    def available(self):
+        return True
+
+    def key(self):
+        return None
+
+    def fetch(self, city):
+        raise NotImplementedError
+
+
+class StoreProvider(DataProvider):
+    """
+    The shared city_day store (Kaggle CSV, files ingested from the drop folder,
+    or station rollups at the selected granularity). Answers stay valid until
+    the store version changes.
+    """
+    name = 'store'
+    label = 'Kaggle Dataset'
+    indicator = '📊 KAGGLE DATA'
+
+    def __init__(self, store, clean=False):
+        self.store = store
+        self.clean = clean
+
+    def available(self):
+        return self.store is not None
+
+    def key(self):
+        return (id(self.store), self.store.version, self.store.granularity, self.clean)
+
+    def fetch(self, city):
+        latest = store_latest_data(self.store, city, self.clean)
+        if latest is None:
+            return None
+        current = {
+            'aqi': latest['aqi'],
+            'status': latest['aqi_bucket'],
+            'pm25': latest['pm25'],
+            'pm10': latest['pm10'],
+            'no2': latest['no2'],
+            'so2': latest['so2'],
+            'co': latest['co'],
+            'o3': latest['o3'],
+            'nh3': latest.get('nh3', 0),
+            'timestamp': latest['date'],
+            'imputed': latest['imputed'],
+            'anomalies': latest['anomalies'],
+            'clean': self.clean
+        }
+        periods = periods_for_days(TREND_DAYS, self.store.granularity)
+        history = self.store.city_history(city, periods, clean=self.clean).head(TREND_ROWS).iloc[::-1]
+        trend = None
+        if len(history):
+            trend = history[['Date'] + [c for c in TREND_NAMES.values() if c in history]].copy()
+            trend['Time'] = trend['Date'].dt.strftime(TIME_FORMATS[self.store.granularity])
+        return {'current': current, 'trend': trend, 'forecast': None}
+
+
+class OpenWeatherProvider(DataProvider):
+    """
+    Live readings and the hourly forecast from the OpenWeather air pollution API.
+    fetch_fn(city, api_key) returns the raw responses (app.get_openweather_data);
+    the three requests it makes are shared by every view and reused for `ttl` seconds.
+    """
+    name = 'openweather'
+    label = 'Live OpenWeather API'
+    indicator = '🟢 LIVE'
+
+    def __init__(self, api_key, fetch_fn, ttl=OPENWEATHER_TTL):
+        self.api_key = api_key
+        self.fetch_fn = fetch_fn
+        self.ttl = ttl
+
+    def available(self):
+        return bool(self.api_key)
+
+    def key(self):
+        return self.api_key
+
+    def fetch(self, city):
+        ow_data = self.fetch_fn(city, self.api_key)
+        current = parse_openweather_data(ow_data)
+        if current is None:
+            return None
+        forecast = get_openweather_forecast(ow_data)
+        trend = None
+        if forecast is not None and len(forecast) > 0:
+            trend = forecast.head(TREND_ROWS).rename(columns=TREND_NAMES)
+            trend['Time'] = trend['datetime'].dt.strftime('%H:%M')
+        return {'current': current, 'trend': trend, 'forecast': forecast}
+
+
+class SimulationProvider(DataProvider):
+    """
+    Seeded synthetic streams from a simulation.Simulator: offline, reproducible
+    readings for any city, with a trend of recent steps and the simulated future
+    as forecast. Answers stay valid until the simulated clock moves a step.
+    """
+    name = 'simulation'
+    label = 'Simulated Stream'
+    indicator = '🧪 SIMULATED'
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+
+    def available(self):
+        return self.simulator is not None
+
+    def key(self):
+        return (self.simulator.seed, self.simulator.tick())
+
+    def fetch(self, city):
+        history = self.simulator.history(city, TREND_ROWS)
+        latest = history.iloc[-1]
+        current = {
+            'aqi': latest['AQI'],
+            'status': latest['AQI_Bucket'],
+            'pm25': latest['PM2.5'],
+            'pm10': latest['PM10'],
+            'no2': latest['NO2'],
+            'so2': latest['SO2'],
+            'co': latest['CO'],
+            'o3': latest['O3'],
+            'nh3': latest['NH3'],
+            'timestamp': latest['Date']
+        }
+        trend = history[['Date'] + list(TREND_NAMES.values())].copy()
+        trend['Time'] = trend['Date'].dt.strftime('%H:%M' if self.simulator.step < pd.Timedelta(days=1) else '%Y-%m-%d')
+        forecast = self.simulator.forecast(city, TREND_ROWS * 4)
+        forecast = forecast[['Date'] + list(TREND_NAMES.values())].rename(
+            columns={'Date': 'datetime', **{name: key for key, name in TREND_NAMES.items()}}
+        )
+        return {'current': current, 'trend': trend, 'forecast': forecast}
+
+
+PROVIDER_TYPES = {'store': StoreProvider, 'openweather': OpenWeatherProvider, 'simulation': SimulationProvider}
+
+
+class ProviderCache:
+    """
+    Thread-safe LRU of provider answers keyed by (provider, data version, city),
+    shared by every session of the process. Concurrent misses for the same key
+    wait for the first fetch instead of repeating it. Empty answers of providers
+    with a TTL (failed live requests) are not kept, so the next rerun retries.
+    """
+
+    def __init__(self, max_entries=CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._fetching = {}
+
+    def get(self, provider, city):
+        """Cached or fresh answer; returns (snapshot, hit)"""
+        key = (provider.name, provider.key(), city)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and (provider.ttl is None or time.time() - entry[0] < provider.ttl):
+                self.entries.move_to_end(key)
+                return entry[1], True
+            key_lock = self._fetching.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self.entries.get(key)
+                if entry is not None and (provider.ttl is None or time.time() - entry[0] < provider.ttl):
+                    return entry[1], True
+            snapshot = provider.fetch(city)
+            with self._lock:
+                if snapshot is not None or provider.ttl is None:
+                    self.entries[key] = (time.time(), snapshot)
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+                self._fetching.pop(key, None)
+        return snapshot, False
+
+    def invalidate(self, name, city=None):
+        """Drop the answers of one provider (for one city, or all)"""
+        with self._lock:
+            for key in [k for k in self.entries if k[0] == name and (city is None or k[2] == city)]:
+                del self.entries[key]
+
+
+class ProviderChain:
+    """Providers in priority order; resolve() returns the first one with data for a city"""
+
+    def __init__(self, providers, cache=None):
+        self.providers = list(providers)
+        self.cache = cache or ProviderCache()
+
+    def ordered(self, preferred=None):
+        """Available providers, the preferred one (by name) first"""
+        providers = [p for p in self.providers if p.available()]
+        return sorted(providers, key=lambda p: p.name != preferred)
+
+    def resolve(self, city, preferred=None):
+        """
+        Snapshot from the first provider that has data, with 'provider' and
+        'indicator' added (None when no provider has the city). Each provider is
+        fetched at most once per data version / TTL, however many views use it.
+        """
+        for provider in self.ordered(preferred):
+            snapshot, _ = self.cache.get(provider, city)
+            if snapshot is not None and snapshot.get('current') is not None:
+                return {**snapshot, 'provider': provider.name, 'indicator': provider.indicator}
+        return None
+
+
+def provider_order(spec=PROVIDER_ORDER):
+    """Provider names from the AQ_PROVIDERS spec; raises ValueError for unknown names"""
+    names = [name.strip() for name in spec.split(',') if name.strip()]
+    for name in names:
+        if name not in PROVIDER_TYPES:
+            raise ValueError(f"Unknown provider '{name}' (expected one of {', '.join(PROVIDER_TYPES)})")
+    return names
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+from data_quality import aqi_bucket
+
+# Supported time granularities, finest first
+GRANULARITIES = ['hourly', 'daily', 'monthly']
+
+# numpy datetime unit each granularity truncates to
+GRANULARITY_UNITS = {'hourly': 'h', 'daily': 'D', 'monthly': 'M'}
+
+# Periods per day, used to turn "last N days" into a row count at each granularity
+PERIODS_PER_DAY = {'hourly': 24, 'daily': 1, 'monthly': 1 / 30}
+
+# Axis label formats for short trend charts
+TIME_FORMATS = {'hourly': '%m-%d %H:%M', 'daily': '%m-%d', 'monthly': '%Y-%m'}
+
+# Values averaged by a rollup
+ROLLUP_COLUMNS = [
+    'PM2.5', 'PM10', 'NO', 'NO2', 'NOx', 'NH3', 'CO', 'SO2',
+    'O3', 'Benzene', 'Toluene', 'Xylene', 'AQI'
+]
+
+
+def periods_for_days(days, granularity):
+    """Number of rows covering the last `days` days at a granularity"""
+    return max(1, int(np.ceil(days * PERIODS_PER_DAY[granularity])))
+
+
+def truncate_dates(dates, granularity):
+    """Start of the hour, day or month each timestamp falls in"""
+    values = np.asarray(dates, dtype='datetime64[ns]')
+    return values.astype(f"datetime64[{GRANULARITY_UNITS[granularity]}]").astype('datetime64[ns]')
+
+
+def partial_rollup(frame, granularity, date_column='Date', columns=ROLLUP_COLUMNS):
+    """
+    Sum and count of every column per (City, period).
+    Partials of different chunks combine by addition, so rollups can be built
+    chunk by chunk and coarser rollups derived from finer ones exactly.
+    """
+    columns = [c for c in columns if c in frame.columns]
+    values = frame[columns].astype('float64')
+    keys = [frame['City'].to_numpy(), truncate_dates(frame[date_column], granularity)]
+    grouped = values.groupby(keys, sort=False)
+    partial = pd.concat([grouped.sum().add_prefix('sum:'), grouped.count().add_prefix('count:')], axis=1)
+    partial.index.names = ['City', 'Date']
+    return partial
+
+
+def combine_partials(partials):
+    """Add up partial rollups of the same granularity"""
+    partials = [p for p in partials if p is not None and len(p)]
+    if not partials:
+        return None
+    if len(partials) == 1:
+        return partials[0]
+    return pd.concat(partials).groupby(level=['City', 'Date'], sort=False).sum()
+
+
+def coarsen(partial, granularity):
+    """Roll a finer partial (e.g. hourly) up to a coarser granularity (e.g. daily)"""
+    dates = truncate_dates(partial.index.get_level_values('Date'), granularity)
+    cities = partial.index.get_level_values('City')
+    coarse = partial.groupby([cities, dates], sort=False).sum()
+    coarse.index.names = ['City', 'Date']
+    return coarse
+
+
+def finalize(partial):
+    """City_day-shaped frame of period means (NaN where a period had no readings)"""
+    if partial is None:
+        return None
+    data = {'City': partial.index.get_level_values('City').astype('string'),
+            'Date': partial.index.get_level_values('Date')}
+    for column in ROLLUP_COLUMNS:
+        if f"sum:{column}" in partial.columns:
+            counts = partial[f"count:{column}"].to_numpy()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                data[column] = np.where(counts > 0, partial[f"sum:{column}"].to_numpy() / counts, np.nan)
+    frame = pd.DataFrame(data)
+    frame['AQI_Bucket'] = pd.array(aqi_bucket(frame['AQI'].to_numpy()), dtype='string')
+    return frame.sort_values(['City', 'Date'], kind='stable').reset_index(drop=True)
+
+
+def rollup_store_frame(store, granularity):
+    """
+    Roll a city_day store up to a coarser granularity.
+    Lazy stores are read batch by batch from their dataset, so memory stays bounded.
+    """
+    batches = store.scan(['City', 'Date'] + ROLLUP_COLUMNS)
+    return finalize(combine_partials(partial_rollup(batch, granularity) for batch in batches))
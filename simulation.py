@@ -0,0 +1,183 @@
+import os
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from data_quality import aqi_bucket
+
+# Offline mode: OpenWeather and gTTS calls are answered by the simulator instead of the network
+SIMULATION_ENABLED = os.environ.get('AQ_SIMULATION', '') not in ('', '0')
+
+# Same seed, same streams: every reading is a pure function of (seed, city, station, time step)
+SIMULATION_SEED = int(os.environ.get('AQ_SIM_SEED', '42'))
+
+# Resolution of the streams, simulated start time and how fast the clock runs
+# (simulated seconds per wall-clock second; 0 freezes it for reproducible runs)
+SIMULATION_STEP_MINUTES = int(os.environ.get('AQ_SIM_STEP_MINUTES', '60'))
+SIMULATION_START = os.environ.get('AQ_SIM_START', '2024-11-15 08:00')
+SIMULATION_SPEED = float(os.environ.get('AQ_SIM_SPEED', '0'))
+
+# Stations averaged into each city reading (the cost of a fetch grows with it)
+SIMULATION_STATIONS = int(os.environ.get('AQ_SIM_STATIONS', '3'))
+
+# Share of days with a pollution episode (stubble burning, festival fireworks, dust storms)
+EPISODE_RATE = 0.06
+
+# Hours of simulated forecast, like OpenWeather's
+FORECAST_HOURS = 96
+
+# A few hundred bytes standing in for an MP3 clip
+STUB_AUDIO = b'ID3' + bytes(509)
+
+# CPCB sub-index breakpoints (concentration -> index) of the particulate matter
+AQI_INDEX = [0, 50, 100, 200, 300, 400, 500]
+PM25_BREAKPOINTS = [0, 30, 60, 90, 120, 250, 380]
+PM10_BREAKPOINTS = [0, 50, 100, 250, 350, 430, 510]
+
+# OpenWeather 1-5 index from PM2.5
+OPENWEATHER_PM25_BANDS = [10, 25, 50, 75]
+
+_EPOCH = pd.Timestamp('2000-01-01')
+_MASK = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def _hash(*keys):
+    """splitmix64 of the keys, broadcast over array keys; uint64"""
+    with np.errstate(over='ignore'):
+        state = np.uint64(0x9E3779B97F4A7C15)
+        for key in keys:
+            z = (np.asarray(key).astype(np.uint64) + state) & _MASK
+            z = ((z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)) & _MASK
+            z = ((z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)) & _MASK
+            state = z ^ (z >> np.uint64(31))
+    return state
+
+
+def hashed_uniform(*keys):
+    """Uniform [0, 1) values that depend only on the keys"""
+    return (_hash(*keys) >> np.uint64(11)).astype('float64') / float(1 << 53)
+
+
+def hashed_normal(*keys):
+    """Standard normal values that depend only on the keys (Box-Muller)"""
+    u1 = np.maximum(hashed_uniform(*keys, 1), 1e-12)
+    u2 = hashed_uniform(*keys, 2)
+    return np.sqrt(-2 * np.log(u1)) * np.cos(2 * np.pi * u2)
+
+
+def indian_aqi(pm25, pm10):
+    """AQI from the PM2.5 and PM10 sub-indices (the larger one)"""
+    return np.maximum(np.interp(pm25, PM25_BREAKPOINTS, AQI_INDEX), np.interp(pm10, PM10_BREAKPOINTS, AQI_INDEX))
+
+
+class Simulator:
+    """
+    Seeded synthetic air quality streams for any city name. A city has its own
+    pollution level, seasonal swing and episode days, all derived from the seed
+    and the name; each of its stations adds an offset and noise. Readings follow
+    the winter peak and monsoon trough, the morning and evening traffic peaks and
+    the afternoon ozone maximum. Nothing is stored: any time step can be
+    regenerated, so runs with the same settings see the same numbers.
+    """
+
+    def __init__(self, seed=SIMULATION_SEED, step_minutes=SIMULATION_STEP_MINUTES, stations=SIMULATION_STATIONS,
+                 start=SIMULATION_START, speed=SIMULATION_SPEED, episode_rate=EPISODE_RATE):
+        self.seed = seed
+        self.step = pd.Timedelta(minutes=step_minutes)
+        self.stations = max(1, stations)
+        self.start = pd.Timestamp(start)
+        self.speed = speed
+        self.episode_rate = episode_rate
+        self._started = time.time()
+
+    def now(self):
+        """Current simulated time, on the step grid"""
+        elapsed = pd.Timedelta(seconds=(time.time() - self._started) * self.speed)
+        return (self.start + elapsed).floor(self.step)
+
+    def tick(self):
+        """Index of the current step (changes whenever new readings appear)"""
+        return int((self.now() - _EPOCH) // self.step)
+
+    def _city_key(self, city):
+        return zlib.crc32(str(city).encode('utf-8'))
+
+    def readings(self, city, times):
+        """Frame with Date, pollutants, AQI and AQI_Bucket for one city at the given times"""
+        times = pd.DatetimeIndex(times)
+        key = self._city_key(city)
+        steps = ((times - _EPOCH) // self.step).to_numpy()
+        hours = (times.hour + times.minute / 60).to_numpy()
+        days = ((times - _EPOCH).days).to_numpy()
+
+        level = 25 + 85 * hashed_uniform(self.seed, key, 0)
+        swing = 0.3 + 0.3 * hashed_uniform(self.seed, key, 1)
+        seasonal = 1 + swing * np.cos(2 * np.pi * (times.dayofyear.to_numpy() - 15) / 365.25)
+        diurnal = 1 + 0.25 * np.cos(2 * np.pi * (hours - 8) / 12) + 0.1 * np.cos(2 * np.pi * (hours - 2) / 24)
+
+        # Day-to-day weather (wind, mixing height) moves the whole city
+        weather = np.exp(0.3 * hashed_normal(self.seed, key, days, 10))
+
+        # Episodes raise a day's levels and fade over the next two days
+        episode = np.ones(len(times))
+        for lag in range(3):
+            day = days - lag
+            hit = hashed_uniform(self.seed, key, day, 3) < self.episode_rate
+            intensity = 1.5 + 2 * hashed_uniform(self.seed, key, day, 4)
+            episode += np.where(hit, (intensity - 1) * 0.5 ** lag, 0.0)
+
+        # Stations: own offset and noise, averaged into the city reading
+        station = np.arange(self.stations)[:, None]
+        offset = 0.8 + 0.4 * hashed_uniform(self.seed, key, station, 5)
+        noise = np.exp(0.15 * hashed_normal(self.seed, key, station, steps[None, :], 6))
+        pm25 = (level * seasonal * diurnal * weather * episode * offset * noise).mean(axis=0)
+
+        traffic = diurnal * (0.9 + 0.2 * hashed_uniform(self.seed, key, steps, 7))
+        sunlight = np.clip(np.sin(np.pi * (hours - 6) / 12), 0, None)
+        frame = pd.DataFrame({
+            'PM2.5': pm25,
+            'PM10': pm25 * (1.6 + 0.4 * hashed_uniform(self.seed, key, 8)),
+            'NO2': (15 + 0.3 * level) * traffic,
+            'SO2': (6 + 0.15 * level) * (0.8 + 0.4 * hashed_uniform(self.seed, key, steps, 9)),
+            'CO': (0.4 + 0.02 * level) * traffic * episode ** 0.5,
+            'O3': 20 + 60 * sunlight * (1.3 - 0.3 * seasonal / (1 + swing)),
+            'NH3': (10 + 0.2 * level) * seasonal
+        }).round(2)
+        frame.insert(0, 'Date', times)
+        frame['AQI'] = np.round(indian_aqi(frame['PM2.5'].to_numpy(), frame['PM10'].to_numpy()))
+        frame['AQI_Bucket'] = aqi_bucket(frame['AQI'].to_numpy())
+        return frame
+
+    def history(self, city, periods):
+        """The last `periods` steps up to now, oldest first"""
+        return self.readings(city, pd.date_range(end=self.now(), periods=periods, freq=self.step))
+
+    def forecast(self, city, periods):
+        """The next `periods` steps after now (the simulator's future is known)"""
+        return self.readings(city, pd.date_range(self.now() + self.step, periods=periods, freq=self.step))
+
+    def openweather(self, city, lat=None, lon=None, hours=FORECAST_HOURS):
+        """Responses shaped like get_openweather_data's: current reading and hourly forecast"""
+        def payload(frame):
+            items = []
+            for row in frame.to_dict('records'):
+                components = {
+                    'co': round(row['CO'] * 1000, 2), 'no2': row['NO2'], 'o3': row['O3'], 'so2': row['SO2'],
+                    'pm2_5': row['PM2.5'], 'pm10': row['PM10'], 'nh3': row['NH3']
+                }
+                items.append({
+                    # Naive simulated times are local, like the datetime.fromtimestamp that decodes them
+                    'dt': int(time.mktime(row['Date'].timetuple())),
+                    'main': {'aqi': int(np.searchsorted(OPENWEATHER_PM25_BANDS, row['PM2.5'], side='right')) + 1},
+                    'components': components
+                })
+            return {'coord': {'lon': lon, 'lat': lat}, 'list': items}
+
+        now = self.now()
+        forecast = self.readings(city, pd.date_range(now, periods=hours, freq='h'))
+        return {'current': payload(forecast.iloc[:1]), 'forecast': payload(forecast), 'lat': lat, 'lon': lon}
+
+
+def synthesize(text, language='en'):
+    """Offline stand-in for gTTS: the same short clip for every text"""
+    return STUB_AUDIO
@@ -0,0 +1,177 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# Optional administrative boundaries (GeoJSON) and the feature property naming each region
+REGIONS_PATH = os.environ.get('AQ_REGIONS_PATH', '')
+REGION_PROPERTY = os.environ.get('AQ_REGION_PROPERTY', 'name')
+
+# Hex cell size (centre to corner, km)
+HEX_SIZE_KM = float(os.environ.get('AQ_HEX_SIZE_KM', '100'))
+
+# Equirectangular projection around the middle of India, so cells are fixed in space
+KM_PER_DEGREE = 111.32
+PROJECTION_LAT = 20.5937
+
+# Points tested against a polygon per batch (bounds the points x edges arrays)
+PIP_BATCH = 4096
+
+SQRT3 = np.sqrt(3)
+
+
+def hex_cells(lats, lngs, size_km=HEX_SIZE_KM):
+    """Axial (q, r) coordinates of the pointy-top hexagons containing each point"""
+    x = np.asarray(lngs, dtype='float64') * KM_PER_DEGREE * np.cos(np.radians(PROJECTION_LAT)) / size_km
+    y = np.asarray(lats, dtype='float64') * KM_PER_DEGREE / size_km
+    q = (SQRT3 / 3) * x - y / 3
+    r = 2 * y / 3
+    # Cube rounding: round all three cube coordinates, then fix the one that moved most
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def hex_boundary(q, r, size_km=HEX_SIZE_KM):
+    """Closed [lng, lat] ring of one hex cell"""
+    x = size_km * SQRT3 * (q + r / 2)
+    y = size_km * 1.5 * r
+    angles = np.radians(60 * np.arange(7) - 30)
+    xs = (x + size_km * np.cos(angles)) / (KM_PER_DEGREE * np.cos(np.radians(PROJECTION_LAT)))
+    ys = (y + size_km * np.sin(angles)) / KM_PER_DEGREE
+    return [[round(float(lng), 5), round(float(lat), 5)] for lng, lat in zip(xs, ys)]
+
+
+class PolygonIndex:
+    """
+    Point-in-polygon lookup over GeoJSON (Multi)Polygon features. Every
+    feature's rings are flattened once into edge arrays with a bounding box;
+    a batch of points is tested against a feature with one even-odd crossing
+    count over all its edges (holes included), after the box filter.
+    """
+
+    def __init__(self, features, key=REGION_PROPERTY):
+        self.names, self.boxes, self.edges, self.geometries = [], [], [], []
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') == 'Polygon':
+                polygons = [geometry['coordinates']]
+            elif geometry.get('type') == 'MultiPolygon':
+                polygons = geometry['coordinates']
+            else:
+                continue
+            rings = [np.asarray(ring, dtype='float64')[:, :2] for polygon in polygons for ring in polygon]
+            starts = np.concatenate([ring[:-1] for ring in rings])
+            ends = np.concatenate([ring[1:] for ring in rings])
+            self.names.append(str(feature.get('properties', {}).get(key, len(self.names))))
+            self.boxes.append((starts[:, 0].min(), starts[:, 1].min(), starts[:, 0].max(), starts[:, 1].max()))
+            self.edges.append((starts, ends))
+            self.geometries.append(geometry)
+
+    def locate(self, lats, lngs):
+        """Region name of every point (None outside all features); the first match wins"""
+        lats = np.asarray(lats, dtype='float64')
+        lngs = np.asarray(lngs, dtype='float64')
+        found = np.full(len(lats), None, dtype=object)
+        for name, (min_x, min_y, max_x, max_y), (starts, ends) in zip(self.names, self.boxes, self.edges):
+            candidates = np.flatnonzero(
+                (found == None) & (lngs >= min_x) & (lngs <= max_x) & (lats >= min_y) & (lats <= max_y)  # noqa: E711
+            )
+            x1, y1, x2, y2 = starts[:, 0], starts[:, 1], ends[:, 0], ends[:, 1]
+            for batch in range(0, len(candidates), PIP_BATCH):
+                points = candidates[batch:batch + PIP_BATCH]
+                px, py = lngs[points, None], lats[points, None]
+                spans = (y1 > py) != (y2 > py)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    crossing = px < (x2 - x1) * (py - y1) / (y2 - y1) + x1
+                inside = (spans & crossing).sum(axis=1) % 2 == 1
+                found[points[inside]] = name
+        return found
+
+    def geometry(self, name):
+        return self.geometries[self.names.index(name)]
+
+
+def load_regions(path=REGIONS_PATH, key=REGION_PROPERTY):
+    """PolygonIndex of a GeoJSON FeatureCollection, or None when no file is configured"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as fp:
+        return PolygonIndex(json.load(fp).get('features', []), key)
+
+
+class SpatialIndex:
+    """
+    Precomputed assignment of a fixed set of points (cities or stations with
+    coordinates) to hex cells and regions, so aggregating a new set of values
+    is a group-by over integer codes. Regions come from the boundary polygons
+    when given, otherwise from each point's `state`.
+    """
+
+    LEVELS = ['hex', 'region']
+
+    def __init__(self, points, size_km=HEX_SIZE_KM, regions=None):
+        self.points = points.reset_index(drop=True)
+        self.size_km = size_km
+        self.regions = regions
+        q, r = hex_cells(self.points['lat'], self.points['lng'], size_km)
+        if regions is not None:
+            region = regions.locate(self.points['lat'], self.points['lng'])
+        else:
+            region = self.points.get('state', pd.Series(None, index=self.points.index)).to_numpy(dtype=object)
+        labels = {'hex': pd.Series([f"{a},{b}" for a, b in zip(q, r)]), 'region': pd.Series(region)}
+        self.codes, self.labels = {}, {}
+        for level, label in labels.items():
+            codes, uniques = pd.factorize(label)
+            self.codes[level], self.labels[level] = codes, np.asarray(uniques, dtype=object)
+
+    def aggregate(self, values, level='hex'):
+        """
+        Per-cell or per-region summary of point values (a Series indexed by point
+        name): mean, max, number of points, and the worst point. Points without a
+        value or outside every region are left out.
+        """
+        codes = self.codes[level]
+        value = self.points['name'].map(values).to_numpy(dtype='float64')
+        keep = (codes >= 0) & ~np.isnan(value)
+        codes, value, names = codes[keep], value[keep], self.points['name'].to_numpy()[keep]
+        size = len(self.labels[level])
+        count = np.bincount(codes, minlength=size)
+        total = np.bincount(codes, weights=value, minlength=size)
+        order = np.lexsort((-value, codes))
+        first = np.unique(codes[order], return_index=True)[1]
+        worst = pd.Series(names[order][first], index=codes[order][first])
+        worst_value = pd.Series(value[order][first], index=codes[order][first])
+        present = count > 0
+        table = pd.DataFrame({
+            'Region': self.labels[level][present],
+            'Mean AQI': total[present] / count[present],
+            'Max AQI': worst_value.reindex(np.flatnonzero(present)).to_numpy(),
+            'Points': count[present],
+            'Worst': worst.reindex(np.flatnonzero(present)).to_numpy()
+        })
+        return table.sort_values('Mean AQI', ascending=False).reset_index(drop=True)
+
+    def geometry(self, level, region):
+        """GeoJSON geometry of a hex cell or region (None for regions without polygons)"""
+        if level == 'hex':
+            q, r = map(int, region.split(','))
+            return {'type': 'Polygon', 'coordinates': [hex_boundary(q, r, self.size_km)]}
+        if self.regions is None:
+            return None
+        return self.regions.geometry(region)
+
+    def geojson(self, summary, level='hex'):
+        """FeatureCollection of the summary rows that have a geometry, rows as properties"""
+        features = []
+        for row in summary.to_dict('records'):
+            geometry = self.geometry(level, row['Region'])
+            if geometry is not None:
+                features.append({'type': 'Feature', 'geometry': geometry,
+                                 'properties': {k: (round(v, 1) if isinstance(v, float) else v) for k, v in row.items()}})
+        return {'type': 'FeatureCollection', 'features': features}
@@ -0,0 +1,118 @@
+import os
+import pandas as pd
+from datastore import (
+    CACHE_DIR, CHUNK_ROWS, FLOAT_COLUMNS, CityDayStore, cache_name, prune_cache, source_key,
+    frame_to_table, iter_csv_chunks, load_clean_frame, read_arrow_mmap, write_arrow
+)
+from rollups import combine_partials, coarsen, finalize, partial_rollup
+
+# Hourly station-level data from the same Kaggle release (station_hour.csv + stations.csv)
+STATION_HOUR_PATH = os.environ.get('AQ_STATION_HOUR_PATH', 'station_hour.csv')
+STATIONS_PATH = os.environ.get('AQ_STATIONS_PATH', 'stations.csv')
+
+# Explicit dtypes for station_hour.csv (Datetime is parsed separately)
+STATION_HOUR_DTYPES = {'StationId': 'string', 'AQI_Bucket': 'string'}
+STATION_HOUR_DTYPES.update({column: 'float64' for column in FLOAT_COLUMNS})
+
+STATIONS_DTYPES = {
+    'StationId': 'string', 'StationName': 'string', 'City': 'string',
+    'State': 'string', 'Status': 'string'
+}
+
+
+def station_data_available(station_hour_path=STATION_HOUR_PATH, stations_path=STATIONS_PATH):
+    return os.path.exists(station_hour_path) and os.path.exists(stations_path)
+
+
+def load_stations(path=STATIONS_PATH):
+    """stations.csv indexed by StationId"""
+    return pd.read_csv(path, dtype=STATIONS_DTYPES).set_index('StationId', drop=False)
+
+
+def _rollup_name(station_hour_path, stations_path):
+    """Named from both CSVs (path, size, mtime), so a changed file never reuses another's rollups"""
+    return f"{cache_name(station_hour_path)}-{source_key(stations_path)}"
+
+
+def _rollup_cache_path(station_hour_path, stations_path, cache_dir, granularity):
+    return os.path.join(cache_dir, f"{_rollup_name(station_hour_path, stations_path)}.rollup-{granularity}.arrow")
+
+
+def _read_partial(path):
+    return read_arrow_mmap(path).to_pandas().set_index(['City', 'Date'])
+
+
+def _write_partial(partial, path):
+    try:
+        write_arrow(frame_to_table(partial.reset_index()), path)
+    except OSError:
+        pass  # Read-only deployments rebuild the rollups per process
+
+
+class StationRollups:
+    """
+    City-level hourly, daily and monthly rollups of station_hour.csv.
+
+    Built in one streaming pass over the hourly file (stations are mapped to
+    their city and averaged per hour), then coarsened hourly -> daily -> monthly
+    from the cached sums and counts, never from the raw rows again. Each
+    granularity is served as a CityDayStore so the dashboard views work on it
+    unchanged.
+    """
+
+    def __init__(self, partials, stations, cache_paths=None):
+        self.partials = partials
+        self.stations = stations
+        self.cache_paths = cache_paths or {}
+        self._stores = {}
+
+    @classmethod
+    def open(cls, station_hour_path=STATION_HOUR_PATH, stations_path=STATIONS_PATH,
+             cache_dir=CACHE_DIR, chunksize=CHUNK_ROWS):
+        """Load the cached rollups, building them (and dropping older versions) when there are none for these two CSVs"""
+        stations = load_stations(stations_path)
+        paths = {
+            g: _rollup_cache_path(station_hour_path, stations_path, cache_dir, g) for g in ('hourly', 'daily', 'monthly')
+        }
+        if all(os.path.exists(p) for p in paths.values()):
+            return cls({g: _read_partial(p) for g, p in paths.items()}, stations, paths)
+
+        partials = build_station_rollups(station_hour_path, stations, chunksize)
+        for granularity, partial in partials.items():
+            _write_partial(partial, paths[granularity])
+        prune_cache(station_hour_path, cache_dir, keep=_rollup_name(station_hour_path, stations_path))
+        return cls(partials, stations, paths)
+
+    def store(self, granularity):
+        """CityDayStore over the rollup at this granularity, built on first use"""
+        if granularity not in self._stores:
+            frame = finalize(self.partials[granularity])
+            clean = flags = anomalies = None
+            rollup_path = self.cache_paths.get(granularity)
+            if rollup_path:
+                clean, flags, anomalies = load_clean_frame(
+                    frame, rollup_path.replace('.arrow', '.clean.arrow'), [rollup_path]
+                )
+            self._stores[granularity] = CityDayStore(
+                frame, clean=clean, quality_flags=flags, granularity=granularity, anomaly_flags=anomalies
+            )
+        return self._stores[granularity]
+
+    def city_stations(self, city):
+        return self.stations[self.stations['City'] == city]
+
+
+def build_station_rollups(station_hour_path, stations, chunksize=CHUNK_ROWS):
+    """Hourly city partials from station_hour.csv, chunk by chunk, plus daily and monthly coarsenings"""
+    station_city = stations['City']
+    hourly_parts = []
+    for chunk in iter_csv_chunks(station_hour_path, STATION_HOUR_DTYPES, chunksize, date_column='Datetime'):
+        chunk['City'] = chunk['StationId'].map(station_city)
+        chunk = chunk[chunk['City'].notna()]
+        hourly_parts.append(partial_rollup(chunk, 'hourly', date_column='Datetime'))
+    hourly = combine_partials(hourly_parts)
+    if hourly is None:
+        raise ValueError(f"No station rows in {station_hour_path} match {len(stations)} known stations")
+    daily = coarsen(hourly, 'daily')
+    monthly = coarsen(daily, 'monthly')
+    return {'hourly': hourly, 'daily': daily, 'monthly': monthly}
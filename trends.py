@@ -0,0 +1,165 @@
+import warnings
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+# Months of data a city needs before a trend or seasonal cycle is reported
+MIN_MONTHS = 24
+
+# Two-sided Mann-Kendall significance level
+SIGNIFICANCE = 0.05
+
+# Change points: shortest segment (months), most points per series, penalty in units of log(n) * noise variance
+MIN_SEGMENT = 6
+MAX_CHANGE_POINTS = 3
+CHANGE_PENALTY = 3.0
+
+
+def monthly_means(matrix):
+    """Calendar-month means of a date x city matrix (months without readings stay NaN)"""
+    return matrix.resample('MS').mean()
+
+
+def decompose(monthly):
+    """
+    Classical additive decomposition of month x city matrices, all cities at
+    once: trend is the centered 2x12 moving average, the seasonal cycle is the
+    mean detrended value per calendar month (centered to sum to zero), the
+    residual is what is left. Returns (trend, seasonal, residual).
+    """
+    trend = monthly.rolling(12, center=True, min_periods=6).mean()
+    trend = (trend + trend.shift(-1)) / 2
+    detrended = monthly - trend
+    cycle = detrended.groupby(detrended.index.month).mean()
+    cycle = cycle - cycle.mean()
+    seasonal = cycle.reindex(monthly.index.month).fillna(0.0)
+    seasonal.index = monthly.index
+    return trend, seasonal, monthly - trend - seasonal
+
+
+def theil_sen_mann_kendall(values):
+    """
+    Theil-Sen slope (per row) and Mann-Kendall Z score for every column of a
+    rows x series array, from all row pairs at once. Pairs with a missing value
+    are skipped; the variance of S ignores ties. Returns (slope, z, p_value, n).
+    """
+    n_rows = values.shape[0]
+    i, j = np.triu_indices(n_rows, 1)
+    diffs = values[j] - values[i]
+    with warnings.catch_warnings():
+        # Series without any complete pair get a NaN slope
+        warnings.simplefilter('ignore', RuntimeWarning)
+        slope = np.nanmedian(diffs / (j - i)[:, None], axis=0) if len(i) else np.full(values.shape[1], np.nan)
+    s = np.nansum(np.sign(diffs), axis=0)
+    n = (~np.isnan(values)).sum(axis=0)
+    variance = n * (n - 1) * (2 * n + 5) / 18.0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.where(variance > 0, (s - np.sign(s)) / np.sqrt(variance), np.nan)
+    return slope, z, 2 * norm.sf(np.abs(z)), n
+
+
+def change_points(values, min_size=MIN_SEGMENT, max_points=MAX_CHANGE_POINTS, penalty=CHANGE_PENALTY):
+    """
+    Shifts in the mean of a 1-D series by binary segmentation: a segment is
+    split where the drop in squared error is largest, if that drop beats
+    penalty * log(n) * noise variance. Each candidate split of a segment is
+    scored from cumulative sums in one pass. Returns sorted split positions.
+    """
+    values = np.asarray(values, dtype='float64')
+    n = len(values)
+    if n < 2 * min_size:
+        return []
+    # Noise variance from first differences (robust to the shifts themselves)
+    sigma = np.median(np.abs(np.diff(values))) / (0.6745 * np.sqrt(2))
+    if not sigma:
+        sigma = np.std(values) or 1.0
+    threshold = penalty * np.log(n) * sigma ** 2
+    segments, points = [(0, n)], []
+    while segments and len(points) < max_points:
+        best = None
+        for start, end in segments:
+            length = end - start
+            if length < 2 * min_size:
+                continue
+            sums = np.cumsum(values[start:end])
+            k = np.arange(min_size, length - min_size + 1)
+            left = sums[k - 1] / k
+            right = (sums[-1] - sums[k - 1]) / (length - k)
+            gain = k * (length - k) / length * (left - right) ** 2
+            at = int(np.argmax(gain))
+            if best is None or gain[at] > best[0]:
+                best = (gain[at], start, end, start + int(k[at]))
+        if best is None or best[0] <= threshold:
+            break
+        _, start, end, split = best
+        points.append(split)
+        segments.remove((start, end))
+        segments += [(start, split), (split, end)]
+    return sorted(points)
+
+
+class TrendAnalysis:
+    """
+    Long-term statistics of every city and pollutant in the comparison cube,
+    computed once per data version: the monthly decomposition, the Theil-Sen
+    slope and Mann-Kendall significance of the deseasonalized series, and the
+    months where its mean shifts. Monthly means keep the pair-wise statistics
+    small whatever the store's granularity.
+    """
+
+    def __init__(self, matrices, min_months=MIN_MONTHS):
+        self.min_months = min_months
+        self.components = {}
+        rows = []
+        for column, matrix in matrices.items():
+            monthly = monthly_means(matrix)
+            if not len(monthly):
+                continue
+            trend, seasonal, residual = decompose(monthly)
+            self.components[column] = {'observed': monthly, 'trend': trend, 'seasonal': seasonal,
+                                       'residual': residual}
+            adjusted = monthly - seasonal
+            slope, z, p_value, n = theil_sen_mann_kendall(adjusted.to_numpy())
+            mean = adjusted.mean().to_numpy()
+            for index, city in enumerate(monthly.columns):
+                enough = n[index] >= min_months
+                series = adjusted[city].interpolate(limit_direction='both') if enough else None
+                shifts = change_points(series.to_numpy()) if enough else []
+                bounds = [0] + shifts + [len(monthly)]
+                means = [series.iloc[a:b].mean() for a, b in zip(bounds, bounds[1:])] if enough else []
+                rows.append({
+                    'City': city,
+                    'Pollutant': column,
+                    'Months': int(n[index]),
+                    'Slope per year': slope[index] * 12 if enough else np.nan,
+                    'Percent per year': slope[index] * 12 / mean[index] * 100 if enough and mean[index] else np.nan,
+                    'Z': z[index] if enough else np.nan,
+                    'P value': p_value[index] if enough else np.nan,
+                    'Direction': self._direction(slope[index], p_value[index]) if enough else 'not enough data',
+                    'Change points': [monthly.index[point] for point in shifts],
+                    'Shifts': [after - before for before, after in zip(means, means[1:])]
+                })
+        self.summary = pd.DataFrame(rows).set_index(['City', 'Pollutant']) if rows else pd.DataFrame()
+
+    @classmethod
+    def from_cube(cls, cube, min_months=MIN_MONTHS):
+        return cls(cube.matrices, min_months)
+
+    @staticmethod
+    def _direction(slope, p_value):
+        if np.isnan(p_value) or p_value >= SIGNIFICANCE:
+            return 'no clear trend'
+        return 'improving' if slope < 0 else 'worsening'
+
+    def city(self, city):
+        """Summary rows of one city (one per pollutant); empty when unknown"""
+        if city not in self.summary.index.get_level_values('City'):
+            return self.summary.iloc[0:0]
+        return self.summary.loc[city]
+
+    def decomposition(self, city, column='AQI'):
+        """Month-indexed frame with Observed, Trend, Seasonal and Residual for one city, or None"""
+        parts = self.components.get(column)
+        if parts is None or city not in parts['observed'].columns:
+            return None
+        return pd.DataFrame({name.title(): frame[city] for name, frame in parts.items()})
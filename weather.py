@@ -0,0 +1,343 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import requests
+from datastore import CACHE_DIR, source_key
+
+# Where weather comes from: '' (off), 'openweather', or the path of a local CSV
+# (City or lat/lon, Date, and any of RAW_COLUMNS)
+WEATHER_SOURCE = os.environ.get('AQ_WEATHER_SOURCE', '')
+
+# Cached daily weather, shared by every session and process
+WEATHER_DB = os.environ.get('AQ_WEATHER_DB', os.path.join(CACHE_DIR, 'weather.sqlite'))
+
+# Server-side key for backfills (the sidebar key is per session)
+OPENWEATHER_API_KEY = os.environ.get('OPENWEATHER_API_KEY', '')
+
+# Days per city, counted back from its last observation, fetched from OpenWeather on backfill
+BACKFILL_DAYS = int(os.environ.get('AQ_WEATHER_BACKFILL_DAYS', '30'))
+
+# Concurrent requests during a backfill
+FETCH_WORKERS = 8
+
+# A day that failed to fetch is retried after RETRY_BASE seconds, doubling per failure up to RETRY_MAX
+RETRY_BASE = 300
+RETRY_MAX = 24 * 3600
+
+# Coordinates are rounded to this many decimals (about 1 km) in cache keys
+COORD_DECIMALS = 2
+
+# Daily values stored per (lat, lon, date)
+RAW_COLUMNS = ['temp_min', 'temp_max', 'humidity', 'wind_speed', 'pressure', 'cloud_cover', 'precipitation']
+
+# Model features derived from them. temp_range and ventilation (wind x daytime heating)
+# stand in for mixing-layer depth; stagnation marks calm, dry days when pollution builds up
+WEATHER_FEATURES = ['temp_mean', 'temp_range', 'humidity', 'wind_speed', 'pressure', 'ventilation', 'stagnation']
+
+# Stagnation: daily max wind below this (m/s) and precipitation below STAGNATION_RAIN_MM
+STAGNATION_WIND = 3.2
+STAGNATION_RAIN_MM = 1.0
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS weather (
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    date TEXT NOT NULL,
+    {', '.join(f'{c} REAL' for c in RAW_COLUMNS)},
+    PRIMARY KEY (lat, lon, date)
+)
+"""
+
+# Days whose fetch failed, and when they may be requested again
+FAILURES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS failures (
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    date TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    retry_after REAL NOT NULL,
+    PRIMARY KEY (lat, lon, date)
+)
+"""
+
+# Version of each CSV source last imported, so an unchanged file is not read again
+IMPORTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    version TEXT NOT NULL
+)
+"""
+
+
+def weather_enabled(source=WEATHER_SOURCE):
+    return bool(source)
+
+
+def round_coords(lat, lon):
+    return round(float(lat), COORD_DECIMALS), round(float(lon), COORD_DECIMALS)
+
+
+def parse_day_summary(payload):
+    """Raw columns from an OpenWeather One Call /day_summary response"""
+    temperature = payload.get('temperature', {})
+    return {
+        'temp_min': temperature.get('min'),
+        'temp_max': temperature.get('max'),
+        'humidity': payload.get('humidity', {}).get('afternoon'),
+        'wind_speed': payload.get('wind', {}).get('max', {}).get('speed'),
+        'pressure': payload.get('pressure', {}).get('afternoon'),
+        'cloud_cover': payload.get('cloud_cover', {}).get('afternoon'),
+        'precipitation': payload.get('precipitation', {}).get('total')
+    }
+
+
+def derive_features(raw):
+    """WEATHER_FEATURES from a frame of RAW_COLUMNS (vectorized)"""
+    wind = raw['wind_speed'].to_numpy(dtype='float64')
+    rain = raw['precipitation'].to_numpy(dtype='float64')
+    temp_range = raw['temp_max'].to_numpy(dtype='float64') - raw['temp_min'].to_numpy(dtype='float64')
+    stagnation = np.where(np.isnan(wind), np.nan, (wind < STAGNATION_WIND) & ~(rain >= STAGNATION_RAIN_MM))
+    return pd.DataFrame({
+        'temp_mean': (raw['temp_max'] + raw['temp_min']).to_numpy(dtype='float64') / 2,
+        'temp_range': temp_range,
+        'humidity': raw['humidity'].to_numpy(dtype='float64'),
+        'wind_speed': wind,
+        'pressure': raw['pressure'].to_numpy(dtype='float64'),
+        'ventilation': wind * temp_range,
+        'stagnation': stagnation.astype('float64')
+    }, index=raw.index)
+
+
+class WeatherCache:
+    """
+    Daily weather per (lat, lon, date) in SQLite (WAL mode, shared across processes).
+    Rows are written once and never expire: past weather does not change. Days that
+    failed to fetch are kept with a retry time, so failing requests back off.
+    """
+
+    def __init__(self, path=WEATHER_DB):
+        self.path = path
+        self._local = threading.local()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute(SCHEMA)
+            db.execute(FAILURES_SCHEMA)
+            db.execute(IMPORTS_SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def read(self, locations, start=None, end=None):
+        """Cached rows (lat, lon, Date + RAW_COLUMNS) for the (lat, lon) pairs, optionally in a date range"""
+        query = f"SELECT lat, lon, date, {', '.join(RAW_COLUMNS)} FROM weather WHERE lat = ? AND lon = ?"
+        if start is not None:
+            query += " AND date >= ?"
+        if end is not None:
+            query += " AND date <= ?"
+        db = self._connect()
+        rows = []
+        for lat, lon in dict.fromkeys(round_coords(*pair) for pair in locations):
+            params = [lat, lon]
+            params += [pd.Timestamp(start).strftime('%Y-%m-%d')] if start is not None else []
+            params += [pd.Timestamp(end).strftime('%Y-%m-%d')] if end is not None else []
+            rows.extend(db.execute(query, params).fetchall())
+        frame = pd.DataFrame(rows, columns=['lat', 'lon', 'Date'] + RAW_COLUMNS)
+        frame['Date'] = pd.to_datetime(frame['Date'])
+        frame[RAW_COLUMNS] = frame[RAW_COLUMNS].astype('float64')
+        return frame
+
+    def write(self, frame):
+        """Insert rows with lat, lon, Date and RAW_COLUMNS (missing columns are stored as NULL)"""
+        frame = frame.reindex(columns=['lat', 'lon', 'Date'] + RAW_COLUMNS)
+        lat = frame['lat'].astype('float64').round(COORD_DECIMALS)
+        lon = frame['lon'].astype('float64').round(COORD_DECIMALS)
+        dates = pd.to_datetime(frame['Date']).dt.strftime('%Y-%m-%d')
+        values = frame[RAW_COLUMNS].astype('float64').astype(object)
+        values = values.where(values.notna(), None)
+        rows = list(zip(lat, lon, dates, *(values[c] for c in RAW_COLUMNS)))
+        with self._connect() as db:
+            db.executemany(f"INSERT OR REPLACE INTO weather VALUES ({', '.join('?' * (3 + len(RAW_COLUMNS)))})", rows)
+            db.executemany("DELETE FROM failures WHERE lat = ? AND lon = ? AND date = ?", [row[:3] for row in rows])
+
+    def record_failures(self, keys, now=None):
+        """Push back the next attempt of each failed (lat, lon, Date), doubling the wait per failure"""
+        now = time.time() if now is None else now
+        db = self._connect()
+        rows = []
+        for lat, lon, date in keys:
+            key = (round(float(lat), COORD_DECIMALS), round(float(lon), COORD_DECIMALS),
+                   pd.Timestamp(date).strftime('%Y-%m-%d'))
+            row = db.execute("SELECT attempts FROM failures WHERE lat = ? AND lon = ? AND date = ?", key).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            rows.append(key + (attempts, now + min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)))
+        with db:
+            db.executemany("INSERT OR REPLACE INTO failures VALUES (?, ?, ?, ?, ?)", rows)
+
+    def backing_off(self, requests_frame, now=None):
+        """Boolean mask of the (lat, lon, Date) rows whose last fetch failed and may not be retried yet"""
+        now = time.time() if now is None else now
+        waiting = set(self._connect().execute(
+            "SELECT lat, lon, date FROM failures WHERE retry_after > ?", (now,)
+        ).fetchall())
+        if not waiting:
+            return np.zeros(len(requests_frame), dtype=bool)
+        dates = pd.to_datetime(requests_frame['Date']).dt.strftime('%Y-%m-%d')
+        keys = zip(requests_frame['lat'].round(COORD_DECIMALS), requests_frame['lon'].round(COORD_DECIMALS), dates)
+        return np.array([key in waiting for key in keys], dtype=bool)
+
+    def imported_version(self, source):
+        """Version recorded by the last import of `source`, or None"""
+        row = self._connect().execute("SELECT version FROM imports WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+
+    def mark_imported(self, source, version):
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO imports VALUES (?, ?)", (source, version))
+
+    def missing(self, requests_frame):
+        """Rows of (lat, lon, Date) not in the cache yet"""
+        keys = requests_frame[['lat', 'lon', 'Date']].copy()
+        keys['lat'], keys['lon'] = keys['lat'].round(COORD_DECIMALS), keys['lon'].round(COORD_DECIMALS)
+        cached = self.read(zip(keys['lat'], keys['lon']), keys['Date'].min(), keys['Date'].max())
+        merged = keys.merge(cached[['lat', 'lon', 'Date']].assign(_cached=True), how='left', on=['lat', 'lon', 'Date'])
+        return keys[merged['_cached'].isna().to_numpy()]
+
+
+class OpenWeatherSource:
+    """Daily weather from OpenWeather's One Call day_summary endpoint (one request per location and date)"""
+
+    def __init__(self, base_url, api_key=OPENWEATHER_API_KEY, timeout=10):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def fetch(self, lat, lon, date):
+        response = self._session.get(f"{self.base_url}/data/3.0/onecall/day_summary", params={
+            'lat': lat, 'lon': lon, 'date': pd.Timestamp(date).strftime('%Y-%m-%d'),
+            'units': 'metric', 'appid': self.api_key
+        }, timeout=self.timeout)
+        response.raise_for_status()
+        return parse_day_summary(response.json())
+
+
+class FileWeatherSource:
+    """Daily weather from a local CSV; rows keyed by City are placed at the city's coordinates"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, locations):
+        frame = pd.read_csv(self.path)
+        frame['Date'] = pd.to_datetime(frame['Date'])
+        if 'lat' not in frame or 'lon' not in frame:
+            known = frame['City'].isin(list(locations))
+            frame = frame[known].copy()
+            frame['lat'] = frame['City'].map(lambda city: locations[city][0])
+            frame['lon'] = frame['City'].map(lambda city: locations[city][1])
+        return frame
+
+
+def backfill(cache, source, wanted, workers=FETCH_WORKERS):
+    """
+    Make sure every (lat, lon, Date) row of `wanted` is cached. Only the missing
+    keys are fetched, concurrently, and written in one batch; keys that already
+    are in the cache never reach the network. Failed keys back off (see
+    WeatherCache.record_failures) and are counted as deferred until they are due.
+    Returns {'fetched', 'failed', 'deferred'}.
+    """
+    missing = cache.missing(wanted)
+    waiting = cache.backing_off(missing) if len(missing) else np.zeros(0, dtype=bool)
+    deferred = int(waiting.sum())
+    missing = missing[~waiting]
+    if not len(missing):
+        return {'fetched': 0, 'failed': 0, 'deferred': deferred}
+
+    def fetch(key):
+        try:
+            return {'lat': key[0], 'lon': key[1], 'Date': key[2], **source.fetch(*key)}
+        except Exception:
+            return None
+
+    keys = list(zip(missing['lat'], missing['lon'], missing['Date']))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(fetch, keys))
+    rows = [row for row in results if row is not None]
+    if rows:
+        cache.write(pd.DataFrame(rows))
+    failed = [key for key, row in zip(keys, results) if row is None]
+    if failed:
+        cache.record_failures(failed)
+    return {'fetched': len(rows), 'failed': len(failed), 'deferred': deferred}
+
+
+def backfill_requests(last_dates, locations, days=BACKFILL_DAYS):
+    """(lat, lon, Date) rows covering the last `days` days of every located city"""
+    frames = []
+    for city, last_date in last_dates.items():
+        if city in locations:
+            dates = pd.date_range(end=pd.Timestamp(last_date).normalize(), periods=days, freq='D')
+            lat, lon = round_coords(*locations[city])
+            frames.append(pd.DataFrame({'lat': lat, 'lon': lon, 'Date': dates}))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['lat', 'lon', 'Date'])
+
+
+def load_weather(cache, locations, source=WEATHER_SOURCE, base_url=None, last_dates=None):
+    """
+    Fill the cache from the configured source: a CSV is imported whole, once per
+    file version and set of located cities (recorded in the imports table);
+    OpenWeather is backfilled for the last BACKFILL_DAYS of each city.
+    """
+    if not weather_enabled(source):
+        return {'fetched': 0, 'failed': 0, 'deferred': 0}
+    if source == 'openweather':
+        if last_dates is None or base_url is None:
+            return {'fetched': 0, 'failed': 0, 'deferred': 0}
+        return backfill(cache, OpenWeatherSource(base_url), backfill_requests(last_dates, locations))
+    # The file's path, size and mtime plus the located cities (rows keyed by City need coordinates)
+    located = '|'.join(f"{city}:{lat},{lon}" for city, (lat, lon) in sorted(locations.items()))
+    version = f"{source_key(source)}-{hashlib.sha1(located.encode('utf-8')).hexdigest()[:12]}"
+    if cache.imported_version(os.path.abspath(source)) == version:
+        return {'fetched': 0, 'failed': 0, 'deferred': 0}
+    frame = FileWeatherSource(source).load(locations)
+    if len(frame):
+        missing = cache.missing(frame)
+        if len(missing):
+            cache.write(frame)
+    cache.mark_imported(os.path.abspath(source), version)
+    return {'fetched': len(frame), 'failed': 0, 'deferred': 0}
+
+
+def enrich(frame, locations, cache):
+    """
+    frame (City, Date, ...) with WEATHER_FEATURES joined from the cache by each
+    city's coordinates and the date; NaN where the city has no coordinates or the
+    day is not cached. One cache read per location and a single vectorized merge.
+    """
+    coords = {city: round_coords(*locations[city]) for city in pd.unique(frame['City']) if city in locations}
+    keys = pd.DataFrame({
+        'lat': frame['City'].map(lambda city: coords.get(city, (np.nan, np.nan))[0]).to_numpy(dtype='float64'),
+        'lon': frame['City'].map(lambda city: coords.get(city, (np.nan, np.nan))[1]).to_numpy(dtype='float64'),
+        'Date': pd.to_datetime(frame['Date']).dt.normalize().to_numpy()
+    })
+    cached = cache.read(coords.values(), keys['Date'].min(), keys['Date'].max()) if coords else None
+    if cached is None or not len(cached):
+        features = pd.DataFrame(np.nan, index=frame.index, columns=WEATHER_FEATURES)
+    else:
+        joined = keys.merge(cached, how='left', on=['lat', 'lon', 'Date'])
+        features = derive_features(joined).set_axis(frame.index)
+    enriched = frame.copy(deep=False)
+    for column in WEATHER_FEATURES:
+        enriched[column] = features[column].to_numpy()
+    return enriched